@@ -10,16 +10,22 @@ assumed_death_age = 120
 
 # static data and functions
 import math
+import functools
 import matplotlib
 import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 
-data_interest_rate_meta = []
-for interest_rate in np.linspace(1.00001, 1.2, 1001):
-    print(f'processing {interest_rate}')
-    data_interest_rate_meta.append([])
-    data_interest_rate_meta[-1].append(interest_rate - 1)  # 0
+import instrumentation
+import inverse_solvers
+from sweep import run_sweep
+
+
+def simulate_goal_ages(interest_rate, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, assumed_death_age):
+    # ages at which each financial goal is achieved, at one interest rate
+    data_interest_rate_meta_entry = []
+    data_interest_rate_meta_entry.append(interest_rate - 1)  # 0
 
     program_descriptor = f'''interest_rate = {interest_rate}, inflation_rate = {inflation_rate}
     initial_money = {initial_money}, annual_gross_earn_rate = {annual_gross_earn_rate}, annual_cost_of_living = {annual_cost_of_living}
@@ -122,6 +128,9 @@ for interest_rate in np.linspace(1.00001, 1.2, 1001):
         data_summary[-1].append(age_run_out_of_money)           # 1
         data_summary[-1].append(years_survive_after_retiring)   # 2
 
+    if instrumentation.enabled:
+        instrumentation.count('runs', len(data_runs))
+        instrumentation.count('simulated_years', sum(len(run) for run in data_runs))
 
     # stats about runs
     max_age_across_runs = 0
@@ -155,10 +164,10 @@ for interest_rate in np.linspace(1.00001, 1.2, 1001):
         raise AttributeError('shouldn\'t be possible to get to this statement')
 
     if not possible_to_breakeven_with_inflation:
-        data_interest_rate_meta[-1].append(float('inf'))                                   # 1
+        data_interest_rate_meta_entry.append(float('inf'))                                   # 1
     else:
-        data_interest_rate_meta[-1].append(age_breakeven_with_inflation or float('inf'))   # 1
-    data_interest_rate_meta[-1].append(retirement_age_for_survival_to_assumed_death_age)   # 2
+        data_interest_rate_meta_entry.append(age_breakeven_with_inflation or float('inf'))   # 1
+    data_interest_rate_meta_entry.append(retirement_age_for_survival_to_assumed_death_age)   # 2
 
 
     # stats agnostic to which data run it is
@@ -210,21 +219,41 @@ for interest_rate in np.linspace(1.00001, 1.2, 1001):
     # plt.legend(loc=1)
     # plt.title(program_descriptor)
 
+    return data_interest_rate_meta_entry
+
+
+if __name__ == '__main__':
+    interest_rates = np.linspace(1.00001, 1.2, 1001)
+    data_interest_rate_meta = run_sweep(functools.partial(simulate_goal_ages,
+                                                          initial_age = initial_age,
+                                                          initial_money = initial_money,
+                                                          annual_cost_of_living = annual_cost_of_living,
+                                                          annual_gross_earn_rate = annual_gross_earn_rate,
+                                                          inflation_rate = inflation_rate,
+                                                          assumed_death_age = assumed_death_age),
+                                        interest_rates,
+                                        description = 'goal ages',
+                                        scenarios_per_chunk = assumed_death_age - initial_age + 1)
 
-zd_interest_rate_meta = list(zip(*data_interest_rate_meta))
+    zd_interest_rate_meta = list(zip(*data_interest_rate_meta))
 
-program_descriptor = f'''Age to achieve various financial goals as a function of savings interest rate. (evaluated at 1-year intervals)
+    program_descriptor = f'''Age to achieve various financial goals as a function of savings interest rate. (evaluated at 1-year intervals)
 inflation_rate = {(inflation_rate-1)*100:.3}% (annual)
 initial_money = {initial_money}, annual_gross_earn_rate = {annual_gross_earn_rate}, annual_cost_of_living = {annual_cost_of_living}
 initial_age = {initial_age}, assumed_death_age = {assumed_death_age}'''
-plt.figure()
-plt.plot(zd_interest_rate_meta[0], zd_interest_rate_meta[1], c='red', marker='x', markersize=2, label='retirement age for savings interest to breakeven with cost of living and inflation')
-plt.plot([inflation_rate - 1, inflation_rate - 1], [initial_age, assumed_death_age], c='red', linestyle='--', label='inflation rate (annual)')
-plt.plot(zd_interest_rate_meta[0], zd_interest_rate_meta[2], c='green', marker='x', markersize=2, label='retirement age for savings to last until assumed death age')
-plt.gca().xaxis.set_major_formatter(matplotlib.ticker.PercentFormatter(xmax=1.0))
-plt.xlabel('savings interest rate (annual)')
-plt.ylabel('age')
-plt.title(program_descriptor)
-plt.legend(loc=1)
-
-plt.show()
+    plt.figure()
+    plt.plot(zd_interest_rate_meta[0], zd_interest_rate_meta[1], c='red', marker='x', markersize=2, label='retirement age for savings interest to breakeven with cost of living and inflation')
+    plt.plot([inflation_rate - 1, inflation_rate - 1], [initial_age, assumed_death_age], c='red', linestyle='--', label='inflation rate (annual)')
+    plt.plot(zd_interest_rate_meta[0], zd_interest_rate_meta[2], c='green', marker='x', markersize=2, label='retirement age for savings to last until assumed death age')
+    # the inverse, solved for each retirement age. Unlike the runs above, this keeps working until retirement age even once savings break even with inflation
+    retirement_ages = np.arange(initial_age, assumed_death_age + 1)
+    minimum_interest_rates = inverse_solvers.calc_minimum_interest_rate(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate,
+                                                                        retirement_ages, assumed_death_age, interest_rate_bracket=(interest_rates[0], interest_rates[-1]))
+    plt.plot(minimum_interest_rates - 1, retirement_ages, c='blue', linestyle='--', label='minimum interest rate for savings to last until assumed death age, retiring at each age')
+    plt.gca().xaxis.set_major_formatter(matplotlib.ticker.PercentFormatter(xmax=1.0))
+    plt.xlabel('savings interest rate (annual)')
+    plt.ylabel('age')
+    plt.title(program_descriptor)
+    plt.legend(loc=1)
+
+    figure_output.show(__file__)
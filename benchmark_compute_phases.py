@@ -0,0 +1,184 @@
+'''Benchmarks the compute portion (no plotting) of each analysis at small, medium and full grid sizes.
+
+Reports wall time, scenarios/sec (simulation runs) and simulated-years/sec, writes the results as JSON,
+and optionally compares them against a previously written JSON baseline to catch regressions.
+
+    python benchmark_compute_phases.py --sizes small medium --output benchmark_results.json
+    python benchmark_compute_phases.py --baseline benchmark_baseline.json
+
+Full grid sizes match the grids the scripts themselves plot, and take several minutes for the late retirement sweep.'''
+import sys
+import json
+import time
+import argparse
+import platform
+import functools
+import numpy as np
+from collections import defaultdict
+
+import instrumentation
+from sweep import run_sweep
+import optimal_retirement_strategy_via_integrated_happiness_least_squares_regression as least_squares
+import ratio_num_years_survive_vs_age_of_retirement_and_interest_rate2 as ratio_with_breakeven
+import ratio_num_years_survive_vs_age_of_retirement_and_interest_rate2_1 as ratio_without_breakeven
+import age_to_achieve_various_financial_goals_as_a_function_of_savings_interest_rate as goal_ages
+
+
+# parameters of each script's __main__, checked against the scripts by golden_output_equivalence_harness.py
+least_squares_params = {'initial_age': 29,
+                        'initial_money': 300000,
+                        'annual_cost_of_living': 38000,
+                        'annual_gross_earn_rate': 69000,
+                        'inflation_rate': 1.0323,
+                        'maximum_death_age': 124,
+                        'working_happiness': -0.7971938776,
+                        'free_happiness': 0.6653911565}
+
+ratio_params = {'initial_age': 28,
+                'initial_money': 300000,
+                'annual_cost_of_living': 38000,
+                'annual_gross_earn_rate': 75000,
+                'inflation_rate': 1.0323,
+                'likely_death_age': 120,
+                'free_happiness': 7.665391156}
+
+goal_ages_params = {'initial_age': goal_ages.initial_age,
+                    'initial_money': goal_ages.initial_money,
+                    'annual_cost_of_living': goal_ages.annual_cost_of_living,
+                    'annual_gross_earn_rate': goal_ages.annual_gross_earn_rate,
+                    'inflation_rate': goal_ages.inflation_rate,
+                    'assumed_death_age': goal_ages.assumed_death_age}
+
+# number of interest rates (and working happinesses, for the ratio sweeps) at each grid size
+grid_sizes = {'least_squares': {'small': 30, 'medium': 300, 'full': 3000},
+              'ratio': {'small': (2, 10), 'medium': (5, 40), 'full': (10, 100)},
+              'goal_ages': {'small': 30, 'medium': 300, 'full': 1001}}
+
+
+def least_squares_interest_rates(num_interest_rates):
+    return list(sorted(np.linspace(0.7, 1.30, num_interest_rates)))
+
+
+def setup_immediate_retirement(grid_size):
+    interest_rates = least_squares_interest_rates(grid_sizes['least_squares'][grid_size])
+    return functools.partial(least_squares.simulate_immediate_retirement, interest_rates=interest_rates, **least_squares_params), len(interest_rates)
+
+
+def setup_optimal_retirement(grid_size):
+    interest_rates = least_squares_interest_rates(grid_sizes['least_squares'][grid_size])
+    return functools.partial(least_squares.simulate_optimal_retirement, interest_rates=interest_rates, **least_squares_params), len(interest_rates)
+
+
+def setup_double_retirement(grid_size):
+    interest_rates = least_squares_interest_rates(grid_sizes['least_squares'][grid_size])
+    return functools.partial(least_squares.simulate_double_retirement, interest_rates=interest_rates, **least_squares_params), len(interest_rates)
+
+
+def run_late_retirement_least_squares(interest_rates, optimal_max_happiness):
+    initial_age, maximum_death_age = least_squares_params['initial_age'], least_squares_params['maximum_death_age']
+    return run_sweep(functools.partial(least_squares.simulate_late_retirement, interest_rates=interest_rates, **least_squares_params),
+                     range(initial_age, maximum_death_age + 1),
+                     reduce_chunk=functools.partial(least_squares.reduce_late_retirement_least_squares, optimal_max_happiness=optimal_max_happiness),
+                     state={'initial_retirement_age_meta': defaultdict(list),
+                            'data_optimal_late_retirement_interest_rate_meta': None,
+                            'optimal_late_retirement_age': None,
+                            'least_squared_distance_to_optimal': float('inf')},
+                     progress=False)
+
+
+def setup_late_retirement_least_squares(grid_size):
+    # the optimal retirement sweep the least squares fit is measured against is benchmarked separately, so it's computed here untimed
+    interest_rates = least_squares_interest_rates(grid_sizes['least_squares'][grid_size])
+    data_optimal_retirement_interest_rate_meta = least_squares.simulate_optimal_retirement(interest_rates=interest_rates, **least_squares_params)
+    optimal_max_happiness = np.array(data_optimal_retirement_interest_rate_meta['max_happiness'])
+    return functools.partial(run_late_retirement_least_squares, interest_rates, optimal_max_happiness), len(interest_rates)
+
+
+def setup_ratio_sweep(ratio_script, grid_size):
+    num_interest_rates, num_working_happinesses = grid_sizes['ratio'][grid_size]
+    interest_rates = list(reversed(sorted(np.geomspace(1, 1.04, num_interest_rates))))
+    working_happinesses = list(reversed(sorted(np.linspace(0.0, 10.0, num_working_happinesses))))
+    compute_chunk = functools.partial(ratio_script.simulate_working_happiness_sweep, working_happinesses=working_happinesses, **ratio_params)
+    return functools.partial(run_sweep, compute_chunk, interest_rates, progress=False), len(interest_rates)
+
+
+def setup_goal_ages(grid_size):
+    interest_rates = np.linspace(1.00001, 1.2, grid_sizes['goal_ages'][grid_size])
+    compute_chunk = functools.partial(goal_ages.simulate_goal_ages, **goal_ages_params)
+    return functools.partial(run_sweep, compute_chunk, interest_rates, progress=False), len(interest_rates)
+
+
+benchmarks = {'immediate_retirement': setup_immediate_retirement,
+              'optimal_retirement': setup_optimal_retirement,
+              'double_retirement': setup_double_retirement,
+              'late_retirement_least_squares': setup_late_retirement_least_squares,
+              'ratio_sweep_with_breakeven': functools.partial(setup_ratio_sweep, ratio_with_breakeven),
+              'ratio_sweep_without_breakeven': functools.partial(setup_ratio_sweep, ratio_without_breakeven),
+              'goal_ages': setup_goal_ages}
+
+
+def run_benchmark(name, grid_size):
+    run, num_interest_rates = benchmarks[name](grid_size)
+
+    instrumentation.reset()
+    instrumentation.enable()
+    time_start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - time_start
+    instrumentation.disable()
+
+    counters = dict(instrumentation.counters)
+    return {'analysis': name,
+            'grid_size': grid_size,
+            'num_interest_rates': num_interest_rates,
+            'seconds': seconds,
+            'scenarios': counters.get('runs', 0),
+            'simulated_years': counters.get('simulated_years', 0),
+            'scenarios_per_second': counters.get('runs', 0) / seconds,
+            'simulated_years_per_second': counters.get('simulated_years', 0) / seconds}
+
+
+def find_regressions(results, baseline, tolerance):
+    baseline_results = {(result['analysis'], result['grid_size']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        baseline_result = baseline_results.get((result['analysis'], result['grid_size']))
+        if baseline_result is None:
+            continue
+        if result['scenarios_per_second'] < baseline_result['scenarios_per_second'] * (1.0 - tolerance):
+            regressions.append((result, baseline_result))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--analyses', nargs='+', choices=list(benchmarks), default=list(benchmarks))
+    parser.add_argument('--sizes', nargs='+', choices=['small', 'medium', 'full'], default=['small', 'medium', 'full'])
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write this run\'s results, usable as a later baseline')
+    parser.add_argument('--baseline', default=None, help='JSON results of an earlier run to compare scenarios/sec against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='fractional slowdown versus the baseline that counts as a regression')
+    args = parser.parse_args()
+
+    results = []
+    for name in args.analyses:
+        for grid_size in args.sizes:
+            result = run_benchmark(name, grid_size)
+            results.append(result)
+            print(f'{name:32} {grid_size:7} {result["num_interest_rates"]:5} rates  {result["seconds"]:10.3f} s  '
+                  f'{result["scenarios_per_second"]:12.1f} scenarios/s  {result["simulated_years_per_second"]:12.1f} simulated-years/s', flush=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({'python': platform.python_version(),
+                   'numpy': np.__version__,
+                   'platform': platform.platform(),
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'results': results}, f, indent=4)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for result, baseline_result in regressions:
+            print(f'regression: {result["analysis"]} {result["grid_size"]} ran at {result["scenarios_per_second"]:.1f} scenarios/s, baseline {baseline_result["scenarios_per_second"]:.1f} scenarios/s')
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,170 @@
+'''Regenerates the figure PNGs, rebuilding only the figures whose inputs changed since they were last built.
+
+A figure's inputs are stamped as its script's source hash, the hashes of the local modules the script imports, the script's parameter assignments,
+the simulation ENGINE_VERSION, and the rendering setup (matplotlib version, figure size and DPI). A script is rerun, headless, if its stamp differs
+from the one recorded at its last successful build, or if any PNG it wrote is missing. Independent scripts run in parallel.
+
+Scripts run with the simulation cache enabled, so a rerun whose numeric inputs are unchanged (e.g. only plotting code was edited)
+reuses the cached results of its sweeps instead of simulating again.
+
+    python build_figures.py                      # rebuild whatever is stale
+    python build_figures.py --dry-run            # list what is stale, and why
+    python build_figures.py integrated_happiness_late_retirement.py --force'''
+import os
+import re
+import ast
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+import concurrent.futures
+import matplotlib
+
+import figure_output
+from simulation_cache import find_local_dependencies
+from vectorized_engine import ENGINE_VERSION
+
+
+repository_dir = os.path.dirname(os.path.abspath(__file__))
+stamps_file_name = 'build_figures.stamps.json'
+
+
+def discover_scripts():
+    # every script that renders its figures through figure_output
+    scripts = []
+    for file_name in sorted(os.listdir(repository_dir)):
+        if file_name.endswith('.py'):
+            with open(os.path.join(repository_dir, file_name)) as f:
+                if re.search(r'^\s*figure_output\.show\(__file__\)$', f.read(), flags=re.MULTILINE):
+                    scripts.append(file_name)
+    return scripts
+
+
+def calc_file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def extract_parameters(script_name):
+    # the script's top level assignments, in the module body and in its __main__ block, as source text (the last assignment wins)
+    with open(os.path.join(repository_dir, script_name)) as f:
+        source = f.read()
+    tree = ast.parse(source)
+
+    statements = list(tree.body)
+    for node in tree.body:
+        if isinstance(node, ast.If) and '__main__' in ast.get_source_segment(source, node.test):
+            statements.extend(node.body)
+
+    parameters = {}
+    for node in statements:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            parameters[node.targets[0].id] = ast.get_source_segment(source, node.value)
+    return parameters
+
+
+def calc_stamp(script_name):
+    return {'script_hash': calc_file_hash(os.path.join(repository_dir, script_name)),
+            'dependency_hashes': {dependency: calc_file_hash(os.path.join(repository_dir, dependency))
+                                  for dependency in sorted(find_local_dependencies(script_name))},
+            'parameters': extract_parameters(script_name),
+            'engine_version': ENGINE_VERSION,
+            'rendering': {'matplotlib': matplotlib.__version__, 'figure_size': list(figure_output.FIGURE_SIZE), 'dpi': figure_output.DPI}}
+
+
+def load_stamps(output_dir):
+    path = os.path.join(output_dir, stamps_file_name)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_stamps(output_dir, stamps):
+    path = os.path.join(output_dir, stamps_file_name)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(stamps, f, indent=4, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def find_stale_reasons(stamp, recorded, output_dir):
+    # why a script needs rebuilding, empty if it's up to date
+    if recorded is None:
+        return ['never built']
+
+    reasons = []
+    for key in ['script_hash', 'engine_version', 'rendering']:
+        if stamp[key] != recorded['stamp'][key]:
+            reasons.append(f'{key} changed')
+    for dependency in sorted(set(stamp['dependency_hashes']) | set(recorded['stamp']['dependency_hashes'])):
+        if stamp['dependency_hashes'].get(dependency) != recorded['stamp']['dependency_hashes'].get(dependency):
+            reasons.append(f'{dependency} changed')
+    for parameter in sorted(set(stamp['parameters']) | set(recorded['stamp']['parameters'])):
+        if stamp['parameters'].get(parameter) != recorded['stamp']['parameters'].get(parameter):
+            reasons.append(f'parameter {parameter} changed')
+    for png_name in recorded['outputs']:
+        if not os.path.exists(os.path.join(output_dir, png_name)):
+            reasons.append(f'{png_name} missing')
+    return reasons
+
+
+def build(script_name, output_dir, cache_dir):
+    # runs the script headless, returning (return code, names of the PNGs it saved, seconds, stderr)
+    environment = dict(os.environ, HEADLESS_FIGURE_DIR=output_dir, SIMULATION_CACHE_DIR=cache_dir, MPLBACKEND='Agg')
+    time_start = time.perf_counter()
+    process = subprocess.run([sys.executable, script_name], cwd=repository_dir, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - time_start
+    png_names = [os.path.basename(path) for path in re.findall(r'^saved (.+)$', process.stderr, flags=re.MULTILINE)]
+    return process.returncode, png_names, seconds, process.stderr
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scripts', nargs='*', help='scripts to consider, default all of them')
+    parser.add_argument('--output-dir', default=repository_dir, help='where to write the PNGs, default alongside the scripts like the committed ones')
+    parser.add_argument('--cache-dir', default=os.path.join(repository_dir, '.simulation_cache'), help='simulation result cache, shared by all scripts')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of scripts to run at once')
+    parser.add_argument('--force', action='store_true', help='rebuild even if up to date')
+    parser.add_argument('--dry-run', action='store_true', help='only report what is stale')
+    args = parser.parse_args()
+
+    output_dir = os.path.abspath(args.output_dir)
+    cache_dir = os.path.abspath(args.cache_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    scripts = [os.path.basename(script) for script in args.scripts] or discover_scripts()
+
+    stamps = load_stamps(output_dir)
+    stale_scripts = {}
+    for script_name in scripts:
+        stamp = calc_stamp(script_name)
+        reasons = ['forced'] if args.force else find_stale_reasons(stamp, stamps.get(script_name), output_dir)
+        if reasons:
+            stale_scripts[script_name] = stamp
+            print(f'stale    {script_name}: {", ".join(reasons)}')
+        else:
+            print(f'current  {script_name}')
+
+    if args.dry_run or not stale_scripts:
+        sys.exit(0)
+
+    num_failed = 0
+    time_start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(build, script_name, output_dir, cache_dir): script_name for script_name in stale_scripts}
+        for future in concurrent.futures.as_completed(futures):
+            script_name = futures[future]
+            return_code, png_names, seconds, stderr = future.result()
+            if return_code != 0:
+                num_failed += 1
+                print(f'FAILED   {script_name} ({seconds:.1f} s), exit status {return_code}:\n{stderr[-2000:]}')
+                continue
+            print(f'built    {script_name} ({seconds:.1f} s): {", ".join(png_names)}')
+            # recorded as each script finishes, so an interrupted build keeps the figures already done
+            stamps[script_name] = {'stamp': stale_scripts[script_name], 'outputs': png_names}
+            save_stamps(output_dir, stamps)
+
+    print(f'{len(stale_scripts) - num_failed} of {len(stale_scripts)} stale scripts rebuilt in {time.perf_counter() - time_start:.1f} s')
+    if num_failed:
+        sys.exit(1)
@@ -2,9 +2,12 @@ import math
 import matplotlib
 import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
+import decimation
+
 
 def calc_x_inflation(x_n, n, interest_rate, annual_gross_earn_rate, annual_cost_of_living, inflation_rate, earning=False):
     # x_n+1 = x_n * 1.01 - 70000*1.03^n
@@ -265,7 +268,10 @@ if __name__ == '__main__':
         data_optimal_retirement_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
         data_optimal_retirement_interest_rate_meta['death_age'].append(death_age)
 
-    # plot data
+    # plot data, decimated keeping every step in age
+    data_immediate_retirement_interest_rate_meta = decimation.decimate_meta(data_immediate_retirement_interest_rate_meta)
+    data_optimal_retirement_interest_rate_meta = decimation.decimate_meta(data_optimal_retirement_interest_rate_meta)
+
     plt.plot([inflation_rate, inflation_rate], plt.gca().get_ybound(), c='magenta', linestyle='--', linewidth=3, label=f'inflation_rate')
     plt.plot([1.2232, 1.2232], plt.gca().get_ybound(), c='black', linestyle='--', linewidth=3, label=f'SpaceX stock value rate of change, 4-pt fit 3/2018 to 7/2020')
     plt.plot([1.2888, 1.2888], plt.gca().get_ybound(), c='grey', linestyle='--', linewidth=3, label=f'SpaceX stock value rate of change, 17-pt fit 6/2014 to 7/2020')
@@ -321,4 +327,4 @@ if __name__ == '__main__':
 
     # handles, labels = plt.gca().get_legend_handles_labels()
     # plt.legend(loc=1, handles = region_patches + handles)
-    plt.show()
+    figure_output.show(__file__)
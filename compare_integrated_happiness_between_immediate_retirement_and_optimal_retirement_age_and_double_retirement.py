@@ -2,6 +2,7 @@ import math
 import matplotlib
 import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
@@ -426,4 +427,4 @@ if __name__ == '__main__':
     # ', at interest_rate = {(interest_rate-1)*100:.3}%'
     # colors[i_plot%len(colors)]
 
-    plt.show()
+    figure_output.show(__file__)
@@ -0,0 +1,95 @@
+'''Decimation of the dense interest rate sweeps before plotting, so 3000-point line and fill_between plots render faster and save smaller,
+without visibly changing.
+
+Every series of a data_*_meta dataset is decimated with the same kept indices, so series drawn against each other
+(fill_between between two series, where= masks built from a series) stay aligned. The kept indices are the union of:
+    - for piecewise constant series (ints, bools and None, e.g. ages and broke_even_with_inflation), the points on either side of each change.
+      The series is constant between them, so its polyline, fill regions and where= runs are drawn exactly as before,
+      including every step in optimal retirement age
+    - for float series (e.g. happiness), largest-triangle-three-buckets (LTTB), keeping the most visually significant point of each bucket,
+      plus the ends of any flat runs (float staircases, such as happiness stepping with death age) and any non-finite points, with their neighbours'''
+import numbers
+import numpy as np
+from collections import defaultdict
+
+
+DEFAULT_NUM_BUCKETS = 500
+
+
+def lttb_indices(x, y, num_buckets):
+    # indices of the points kept by largest-triangle-three-buckets, always including the first and last points
+    num_points = len(x)
+    if num_points <= num_buckets + 2:
+        return np.arange(num_points)
+
+    bucket_edges = np.linspace(1, num_points - 1, num_buckets + 1).astype(int)
+    indices = [0]
+    for i_bucket in range(num_buckets):
+        start, end = bucket_edges[i_bucket], bucket_edges[i_bucket + 1]
+        if i_bucket + 1 < num_buckets:
+            next_start, next_end = end, bucket_edges[i_bucket + 2]
+            x_next, y_next = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            x_next, y_next = x[-1], y[-1]
+
+        # the point forming the largest triangle with the previously kept point and the next bucket's average
+        x_previous, y_previous = x[indices[-1]], y[indices[-1]]
+        areas = np.abs((x_previous - x_next) * (y[start:end] - y_previous) - (x_previous - x[start:end]) * (y_next - y_previous))
+        indices.append(start + int(np.argmax(areas)))
+    indices.append(num_points - 1)
+    return np.array(indices)
+
+
+def step_edge_indices(values):
+    # indices on either side of every change in a piecewise constant series, plus the first and last points
+    values = np.array(values, dtype=object)
+    changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+    return np.concatenate([[0, len(values) - 1], changes - 1, changes])
+
+
+def flat_run_edge_indices(y):
+    # the ends of runs of equal values, and their neighbours
+    equal_to_next = np.concatenate([y[1:] == y[:-1], [False]])
+    equal_to_previous = np.concatenate([[False], y[1:] == y[:-1]])
+    ends = np.flatnonzero(equal_to_next != equal_to_previous)
+    return np.concatenate([ends - 1, ends, ends + 1])
+
+
+def is_piecewise_constant(values):
+    return not any(isinstance(value, numbers.Real) and not isinstance(value, numbers.Integral) for value in values)
+
+
+def decimate_indices(data_meta, x_key='interest_rate', num_buckets=DEFAULT_NUM_BUCKETS):
+    x = np.asarray(data_meta[x_key], dtype=float)
+    kept = [np.array([0, len(x) - 1])]
+    for key, values in data_meta.items():
+        if key == x_key:
+            continue
+        assert len(values) == len(x), f'{key} has {len(values)} values, {x_key} has {len(x)}'
+
+        if is_piecewise_constant(values):
+            kept.append(step_edge_indices(values))
+        else:
+            y = np.asarray(values, dtype=float)
+            finite = np.isfinite(y)
+            kept.append(flat_run_edge_indices(y))
+            if finite.all():
+                kept.append(lttb_indices(x, y, num_buckets))
+            else:
+                kept.append(lttb_indices(x, np.where(finite, y, 0.0), num_buckets))
+                kept.append(step_edge_indices(finite))
+                kept.append(np.flatnonzero(~finite))
+    indices = np.unique(np.concatenate(kept))
+    return indices[(indices >= 0) & (indices < len(x))]
+
+
+def decimate_meta(data_meta, x_key='interest_rate', num_buckets=DEFAULT_NUM_BUCKETS):
+    # a copy of data_meta keeping only the points needed to draw it, every series keeps the same indices
+    if len(data_meta[x_key]) <= num_buckets + 2:
+        return data_meta
+
+    indices = decimate_indices(data_meta, x_key, num_buckets)
+    decimated_meta = defaultdict(list)
+    for key, values in data_meta.items():
+        decimated_meta[key] = [values[i] for i in indices]
+    return decimated_meta
@@ -0,0 +1,91 @@
+'''Shows a script's figures interactively, or in headless mode renders them straight to PNG files.
+
+Headless mode is enabled by setting HEADLESS_FIGURE_DIR to the directory to write the PNGs to, e.g. from cron on a server without a display:
+
+    HEADLESS_FIGURE_DIR=. python integrated_happiness_late_retirement.py
+
+It selects matplotlib's Agg backend, so no GUI toolkit is started. That only works if the backend is chosen before pyplot is imported,
+so scripts import this module ahead of pyplot. Otherwise matplotlib isn't imported until a figure is shown or rendered, so modules importing this one
+for their compute code alone start without it. Figures are rendered at a fixed size and DPI, matching the committed PNGs (3072 x 1671 pixels).
+Scripts with several independent figures draw them through render(), which headless renders each figure in its own process.'''
+import os
+import sys
+import concurrent.futures
+
+
+FIGURE_SIZE = (15.36, 8.355)  # inches
+DPI = 200
+
+# committed PNG names of scripts whose figures aren't named after the script, the first figure a script opens is saved as the first name, and so on
+# figures without a name here are saved as <script>.png, <script>_2.png, <script>_3.png, ...
+png_names = {
+    'average_happiness_over_lifetime': ['average_happiness_as_a_function_of_age_of_retirement_and_annual_interest_rate.png'],
+    'average_happiness_over_remaining_lifetime': ['average_happiness_over_remaining_lifetime_as_a_function_of_age_of_retirement_and_annual_interest_rate.png'],
+    'integrated_happiness_over_lifetime': ['integrated_happiness_as_a_function_of_age_of_retirement_and_annual_interest_rate.png'],
+    'num_years_survive_vs_age_of_retirement_and_interest_rate': ['Years_of_survival_after_retirement_as_a_function_of_age_of_retirement_and_annual_interest_rate.png'],
+    'optimal_retirement_age_and_average_happiness_vs_interest_rate': ['maximim_average_happiness_over_lifetime_and_optimal_retirement_age_as_a_function_of_interest_rate.png'],
+    'optimal_retirement_age_and_integrated_happiness_vs_interest_rate': ['maximim_integrated_happiness_over_lifetime_and_optimal_retirement_age_as_a_function_of_interest_rate.png'],
+    'optimal_retirement_strategy_via_integrated_happiness_least_squares_regression': ['optimal_retirement_strategy_via_integrated_happiness_least_squares_regression.png',
+                                                                                      'least_squares_distance_to_optimal_integrated_happiness.png'],
+}
+
+headless_figure_dir = os.environ.get('HEADLESS_FIGURE_DIR') or None
+if headless_figure_dir is not None:
+    import matplotlib
+    matplotlib.use('Agg')
+    matplotlib.rcParams['figure.figsize'] = FIGURE_SIZE
+
+
+def calc_png_names(script_path, num_figures):
+    script_name = os.path.splitext(os.path.basename(script_path))[0]
+    names = list(png_names.get(script_name, []))
+    for i_figure in range(len(names), num_figures):
+        names.append(f'{script_name}.png' if i_figure == 0 else f'{script_name}_{i_figure + 1}.png')
+    return names[:num_figures]
+
+
+def show(script_path):
+    # in place of plt.show() at the end of a script, script_path is the script's __file__
+    # returns the paths of the PNGs written, none unless headless
+    from matplotlib import pyplot as plt
+    if headless_figure_dir is None:
+        plt.show()
+        return []
+
+    figure_numbers = plt.get_fignums()
+    paths = []
+    for figure_number, png_name in zip(figure_numbers, calc_png_names(script_path, len(figure_numbers))):
+        path = os.path.join(headless_figure_dir, png_name)
+        plt.figure(figure_number).savefig(path, dpi=DPI)
+        paths.append(path)
+        print(f'saved {path}', file=sys.stderr)
+    plt.close('all')
+    return paths
+
+
+def render_figure(plot_function, path):
+    # draws and saves one figure, in a process pool worker
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    plot_function()
+    plt.gcf().savefig(path, dpi=DPI)
+    plt.close('all')
+    print(f'saved {path}', file=sys.stderr, flush=True)
+    return path
+
+
+def render(script_path, plot_functions, workers=None):
+    '''Draws one figure per plot function, each of which opens a figure with plt.figure() and draws onto it.
+    Interactively the figures are drawn in this process, to be shown by show().
+    Headless, each figure is drawn and saved by a process pool worker with its own Agg backend, so the figures render in about the time of the slowest one.
+    The plot functions must then be picklable, e.g. module level functions or functools.partials of them.
+    Returns the paths of the PNGs written, none unless headless.'''
+    if headless_figure_dir is None:
+        for plot_function in plot_functions:
+            plot_function()
+        return []
+
+    paths = [os.path.join(headless_figure_dir, png_name) for png_name in calc_png_names(script_path, len(plot_functions))]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers or len(plot_functions)) as executor:
+        return list(executor.map(render_figure, plot_functions, paths))
@@ -0,0 +1,459 @@
+'''Checks that every fast engine reproduces the reference simulate_until_end_condition loops exactly.
+
+Runs each script's own simulate_until_end_condition, and each fast engine, on randomized and edge case parameter sets,
+and diffs every summary field: the end condition, the number of years (and retired years) logged, and the last logged value of each per-year field.
+Floats must match bitwise, so a fast engine that reorders arithmetic fails here even when it's close.
+Closed form engines only solve the runs ending out of money or at end_at_age, and only give the fields they solve for, so they're diffed on those.
+
+    python golden_output_equivalence_harness.py
+    python golden_output_equivalence_harness.py --num-random 2000 --seed 3
+    python golden_output_equivalence_harness.py --untabulated-inflation-powers     # the engine's path for populations of many inflation rates
+    python golden_output_equivalence_harness.py --report-fast-inflation-powers     # how far exact_inflation_powers=False strays, without failing
+
+inverse_solvers.py's required initial_money and minimum interest rate are checked against the scripts' yearly recurrence,
+which must find savings lasting just above them and running out just below them.
+It also checks that the scripts' __main__ parameters copied into retirement_cli.py's and benchmark_compute_phases.py's tables
+still have the scripts' values, for each parameter a script assigns a literal.
+
+Exits with status 1 if any engine differs from any reference, an inverse solver from the recurrence, or any copied parameter from its script.'''
+import ast
+import sys
+import math
+import random
+import argparse
+import functools
+import importlib
+import numpy as np
+
+import build_figures
+import monte_carlo
+import inverse_solvers
+import retirement_cli
+import vectorized_engine
+import benchmark_compute_phases
+
+earn_rate_script = importlib.import_module('optimal_retirement_age_and_integrated_happiness_vs_interest_rate_and_earn_rate')
+
+
+# scripts whose simulate_until_end_condition is each variant of the reference loop
+reference_scripts = {
+    'retire_after_step_truthy_ends': ['average_happiness_over_lifetime',
+                                      'average_happiness_over_remaining_lifetime',
+                                      'integrated_happiness_over_lifetime',
+                                      'integrated_happiness_over_remaining_lifetime',
+                                      'num_years_survive_vs_age_of_retirement_and_interest_rate',
+                                      'ratio_num_years_survive_vs_age_of_retirement_and_interest_rate'],
+    'retire_after_step': ['integrated_happiness_over_lifetime_and_death_age_as_a_function_of_savings_value_rate_of_change,_assuming_immediate_retirement',
+                          'optimal_retirement_age_and_average_happiness_vs_interest_rate',
+                          'optimal_retirement_age_and_average_happiness_vs_interest_rate_assuming_immortality',
+                          'optimal_retirement_age_and_integrated_happiness_vs_interest_rate',
+                          'optimal_retirement_age_and_integrated_happiness_vs_interest_rate_assuming_immortality',
+                          'ratio_num_years_survive_vs_age_of_retirement_and_interest_rate2',
+                          'ratio_num_years_survive_vs_age_of_retirement_and_interest_rate2_1',
+                          'ratio_num_years_survive_vs_age_of_retirement_and_interest_rate2_2',
+                          'ratio_num_years_survive_vs_age_of_retirement_and_interest_rate3',
+                          'ratio_num_years_survive_vs_age_of_retirement_and_interest_rate4'],
+    'retire_before_step': ['compare_integrated_happiness_between_immediate_retirement_and_optimal_retirement_age',
+                           'immediate_retirement_multiplot'],
+    'retire_before_step_recheck_out_of_money': ['compare_integrated_happiness_between_immediate_retirement_and_optimal_retirement_age_and_double_retiremen_and_late_retirement',
+                                                'compare_integrated_happiness_between_immediate_retirement_and_optimal_retirement_age_and_double_retirement',
+                                                'integrated_happiness_late_retirement',
+                                                'optimal_retirement_strategy_via_integrated_happiness_least_squares_regression'],
+}
+
+# (script, table name, table) of the tables holding copies of a script's __main__ parameters
+goal_ages_script = 'age_to_achieve_various_financial_goals_as_a_function_of_savings_interest_rate.py'
+copied_parameter_tables = [
+    (retirement_cli.least_squares_script + '.py', 'retirement_cli.least_squares_parameters', retirement_cli.least_squares_parameters),
+    (goal_ages_script, "retirement_cli.analysis_parameters['goal-ages']", retirement_cli.analysis_parameters['goal-ages']),
+    (goal_ages_script, "retirement_cli.analysis_parameters['required-savings']", retirement_cli.analysis_parameters['required-savings']),
+    (goal_ages_script, "retirement_cli.analysis_parameters['minimum-rate']", retirement_cli.analysis_parameters['minimum-rate']),
+    ('num_years_survive_vs_age_of_retirement_and_interest_rate.py', "retirement_cli.analysis_parameters['survival']", retirement_cli.analysis_parameters['survival']),
+    (retirement_cli.least_squares_script + '.py', 'benchmark_compute_phases.least_squares_params', benchmark_compute_phases.least_squares_params),
+    ('ratio_num_years_survive_vs_age_of_retirement_and_interest_rate2.py', 'benchmark_compute_phases.ratio_params', benchmark_compute_phases.ratio_params),
+    ('ratio_num_years_survive_vs_age_of_retirement_and_interest_rate2_1.py', 'benchmark_compute_phases.ratio_params', benchmark_compute_phases.ratio_params),
+]
+
+summary_fields = ('end_condition', 'num_years', 'num_years_retired', 'n', 'x', 'age', 'retired',
+                  'num_years_after_retirement', 'x_breakeven_with_inflation', 'broke_even_with_inflation')
+
+
+def summarize_reference(end_condition, data):
+    summary = {'end_condition': end_condition,
+               'num_years': len(data['age']),
+               'num_years_retired': sum(data['retired'])}
+    for key, values in data.items():
+        summary[key] = math.nan if values[-1] is None else values[-1]
+    return summary
+
+
+def run_reference(module, case):
+    end_condition, data = module.simulate_until_end_condition(**case)
+    return summarize_reference(end_condition, data)
+
+
+def run_vectorized_engine(variant, cases, **engine_options):
+    # all cases in one call, as parameter arrays, so the engine's masking of finished scenarios is exercised too
+    # engine_options are passed on, e.g. max_tabulated_inflation_rates=0 or exact_inflation_powers=False
+    def stack(key, default, disabled=None):
+        return np.array([disabled if case.get(key, default) is None else case.get(key, default) for case in cases])
+
+    result = vectorized_engine.simulate_until_end_condition(
+        initial_age=stack('initial_age', None),
+        initial_money=stack('initial_money', None),
+        annual_cost_of_living=stack('annual_cost_of_living', None),
+        annual_gross_earn_rate=stack('annual_gross_earn_rate', None),
+        interest_rate=stack('interest_rate', None),
+        inflation_rate=stack('inflation_rate', None),
+        retirement_age=stack('retirement_age', None),
+        end_num_years_after_retirement=stack('end_num_years_after_retirement', None, math.inf),
+        end_after_num_years_sim_time=stack('end_after_num_years_sim_time', 300, math.inf),
+        end_if_out_of_money=stack('end_if_out_of_money', True),
+        end_if_breakeven_with_inflation=stack('end_if_breakeven_with_inflation', True),
+        end_at_age=stack('end_at_age', None, math.inf),
+        n=stack('n', None, 0) if variant == 'retire_before_step_recheck_out_of_money' else None,
+        variant=variant,
+        **engine_options)
+
+    summaries = []
+    for i_case in range(len(cases)):
+        summary = {key: result[key][i_case] for key in summary_fields}
+        summary['end_condition'] = vectorized_engine.END_CONDITIONS[summary['end_condition']]
+        summaries.append(summary)
+    return summaries
+
+
+def in_closed_form_scope(case):
+    # runs ending only out of money or at end_at_age, from n = 0 and retiring before end_at_age, which the closed forms solve
+    return (case.get('end_if_out_of_money', True) and not case.get('end_if_breakeven_with_inflation', True)
+            and case.get('end_num_years_after_retirement') is None and case.get('end_after_num_years_sim_time', 300) is None
+            and case.get('end_at_age') is not None and case.get('n') in (None, 0)
+            and case['initial_age'] <= case['retirement_age'] < case['end_at_age'])
+
+
+def run_monte_carlo_zero_volatility(variant, cases):
+    # monte_carlo.simulate_monte_carlo with a single path at volatility 0, i.e. a constant interest_rate, solves the recheck variant
+    summaries = []
+    for case in cases:
+        if variant != 'retire_before_step_recheck_out_of_money' or not in_closed_form_scope(case):
+            summaries.append(None)
+            continue
+        result = monte_carlo.simulate_monte_carlo(initial_age=case['initial_age'],
+                                                  initial_money=case['initial_money'],
+                                                  annual_cost_of_living=case['annual_cost_of_living'],
+                                                  annual_gross_earn_rate=case['annual_gross_earn_rate'],
+                                                  interest_rate=case['interest_rate'],
+                                                  inflation_rate=case['inflation_rate'],
+                                                  maximum_death_age=case['end_at_age'] - 1,
+                                                  volatility=0.0,
+                                                  num_paths=1,
+                                                  progress=False)
+        i_retirement_age = case['retirement_age'] - case['initial_age']
+        death_age = result['death_age'][np.argmax(result['death_age_counts'][i_retirement_age])]
+        summaries.append({'end_condition': 'out_of_money' if result['probability_out_of_money'][i_retirement_age] else 'age',
+                          'num_years': death_age - case['initial_age'] + 1,
+                          'age': death_age})
+    return summaries
+
+
+def run_earn_rate_closed_form(variant, cases):
+    # the earn rate heatmap's calc_death_ages, one case at a time, solves the retire after step variant
+    summaries = []
+    for case in cases:
+        if variant != 'retire_after_step' or not in_closed_form_scope(case):
+            summaries.append(None)
+            continue
+        death_ages, out_of_money = earn_rate_script.calc_death_ages(annual_gross_earn_rate=case['annual_gross_earn_rate'],
+                                                                    initial_age=case['initial_age'],
+                                                                    initial_money=case['initial_money'],
+                                                                    annual_cost_of_living=case['annual_cost_of_living'],
+                                                                    inflation_rate=case['inflation_rate'],
+                                                                    maximum_death_age=case['end_at_age'] - 1,
+                                                                    interest_rates=[case['interest_rate']],
+                                                                    retirement_ages=np.array([case['retirement_age']]))
+        death_age = death_ages[0, 0]
+        num_years_after_retirement = death_age - case['retirement_age'] - 1
+        summaries.append({'end_condition': 'out_of_money' if out_of_money[0, 0] else 'age',
+                          'num_years': death_age - case['initial_age'] + 1,
+                          'age': death_age,
+                          'num_years_after_retirement': num_years_after_retirement if num_years_after_retirement >= 0 else math.nan})
+    return summaries
+
+
+# each fast engine runs a list of cases of one variant, returning a summary per case, or None for a case outside what the engine solves
+fast_engines = {'vectorized': run_vectorized_engine,
+                'monte_carlo_zero_volatility': run_monte_carlo_zero_volatility,
+                'earn_rate_closed_form': run_earn_rate_closed_form}
+
+
+def values_identical(reference_value, value):
+    if isinstance(reference_value, str):
+        return reference_value == value
+    if isinstance(reference_value, (bool, np.bool_)):
+        return bool(reference_value) == bool(value)
+    # repr distinguishes -0.0 from 0.0 and matches NaN to NaN, so this is a bitwise comparison
+    return repr(float(reference_value)) == repr(float(value))
+
+
+def diff_summaries(reference_summary, summary):
+    # the fields the reference logged and the engine gives, that differ
+    return [key for key in summary_fields if key in reference_summary and key in summary and not values_identical(reference_summary[key], summary[key])]
+
+
+def draw_random_case(rng, variant):
+    initial_age = rng.randint(18, 70)
+    inflation_rate = rng.uniform(1.0, 1.06)
+    interest_rate = rng.choice([rng.uniform(0.7, 1.3),
+                                rng.uniform(0.95, 1.1),
+                                inflation_rate + rng.choice([-1e-3, -1e-9, 0.0, 1e-9, 1e-3])])
+    if variant.startswith('retire_before_step'):
+        retirement_age = rng.randint(initial_age - 10, initial_age + 80)
+    else:
+        # the reference raises TypeError for a retirement age before the initial age
+        retirement_age = rng.randint(initial_age, initial_age + 80)
+
+    case = {'initial_age': initial_age,
+            'initial_money': rng.choice([0, rng.randint(1, 2000000), rng.uniform(-1000.0, 2000000.0)]),
+            'annual_cost_of_living': rng.choice([rng.randint(10000, 100000), rng.uniform(10000.0, 100000.0)]),
+            'annual_gross_earn_rate': rng.choice([0, rng.randint(20000, 200000), rng.uniform(20000.0, 200000.0)]),
+            'interest_rate': interest_rate,
+            'inflation_rate': inflation_rate,
+            'retirement_age': retirement_age,
+            'end_num_years_after_retirement': rng.choice([None, 0, rng.randint(1, 60)]),
+            'end_after_num_years_sim_time': rng.choice([None, 0, rng.randint(1, 300), 300]),
+            'end_if_out_of_money': rng.random() < 0.9,
+            'end_if_breakeven_with_inflation': rng.random() < 0.7,
+            'end_at_age': rng.choice([None, 0, rng.randint(initial_age, 130)])}
+    if variant == 'retire_before_step_recheck_out_of_money':
+        case['n'] = rng.choice([None, 0, rng.randint(1, 40)])
+    if rng.random() < 0.3:
+        # integrated happiness style, running to a death age, which the closed form engines solve too
+        case.update(end_num_years_after_retirement=None, end_after_num_years_sim_time=None, end_if_out_of_money=True, end_if_breakeven_with_inflation=False,
+                    end_at_age=rng.randint(initial_age + 1, 130))
+
+    # every run must end, so keep at least one of the time limits enabled
+    if not case['end_after_num_years_sim_time'] and not case['end_at_age']:
+        case['end_after_num_years_sim_time'] = 300
+    return case
+
+
+def edge_cases(variant):
+    # the grids the scripts sweep, at the boundaries where the loop's behaviour changes
+    cases = []
+    inflation_rate = 1.0323
+    base = {'initial_age': 28, 'initial_money': 300000, 'annual_cost_of_living': 38000, 'annual_gross_earn_rate': 75000, 'inflation_rate': inflation_rate}
+    interest_rates = [0.7, 0.7000001, 0.9, 1.0, 1.00001, inflation_rate, 1.3,
+                      np.nextafter(inflation_rate, 0.0), np.nextafter(inflation_rate, 2.0), inflation_rate - 1e-12, inflation_rate + 1e-12]
+    for interest_rate in interest_rates:
+        for retirement_age in [28, 29, 40, 65, 120]:
+            # ratio_num_years_survive_..._rate2 style: no time limit but a far off end_at_age
+            cases.append(dict(base, interest_rate=float(interest_rate), retirement_age=retirement_age,
+                              end_num_years_after_retirement=None, end_after_num_years_sim_time=None,
+                              end_if_out_of_money=True, end_if_breakeven_with_inflation=True, end_at_age=10000))
+            # integrated happiness style: run to a death age regardless of breaking even
+            cases.append(dict(base, interest_rate=float(interest_rate), retirement_age=retirement_age,
+                              end_num_years_after_retirement=None, end_after_num_years_sim_time=None,
+                              end_if_out_of_money=True, end_if_breakeven_with_inflation=False, end_at_age=124))
+            # survival style: a number of years after retirement
+            cases.append(dict(base, interest_rate=float(interest_rate), retirement_age=retirement_age,
+                              end_num_years_after_retirement=30, end_after_num_years_sim_time=300,
+                              end_if_out_of_money=False, end_if_breakeven_with_inflation=True, end_at_age=None))
+    if variant == 'retire_before_step_recheck_out_of_money':
+        # the double retirement second leg, starting part way through with the first leg's money
+        for n in [1, 10, 60]:
+            cases.append(dict(base, interest_rate=1.01, retirement_age=28 + n, initial_money=1000.0, n=n,
+                              end_num_years_after_retirement=None, end_after_num_years_sim_time=None,
+                              end_if_out_of_money=True, end_if_breakeven_with_inflation=False, end_at_age=124))
+    return cases
+
+
+def lasts_reference(case, initial_money, interest_rate, retirement_age):
+    # the scripts' calc_x_inflation, year by year, savings lasting if above 0 every year before death_age
+    x = initial_money
+    for n in range(case['death_age'] - case['initial_age'] - 1):
+        earning = n + case['initial_age'] < retirement_age
+        x = x * interest_rate + ((case['annual_gross_earn_rate'] if earning else 0.0) - case['annual_cost_of_living']) * math.pow(case['inflation_rate'], n)
+        if x <= 0:
+            return False
+    return True
+
+
+def calc_money_scale(case, interest_rate):
+    # the size of the discounted yearly flows summed by the closed form, which its rounding errors scale with
+    return sum((case['annual_gross_earn_rate'] + case['annual_cost_of_living']) * math.pow(case['inflation_rate'], n) / math.pow(interest_rate, n + 1)
+               for n in range(case['death_age'] - case['initial_age']))
+
+
+def draw_inverse_case(rng):
+    initial_age = rng.randint(18, 70)
+    return {'initial_age': initial_age,
+            'initial_money': rng.choice([0.0, rng.uniform(0, 2e6)]),
+            'annual_cost_of_living': rng.uniform(10000, 100000),
+            'annual_gross_earn_rate': rng.choice([0.0, rng.uniform(0, 200000)]),
+            'inflation_rate': rng.uniform(1.0, 1.06),
+            'interest_rates': [rng.uniform(0.9, 1.15) for i_rate in range(5)],
+            'retirement_ages': sorted(rng.sample(range(initial_age, initial_age + 100), 4)),
+            'death_age': initial_age + rng.choice([1, 2, rng.randint(1, 80)])}
+
+
+def check_inverse_solvers(rng, num_cases, epsilon=1e-9):
+    '''inverse_solvers' answers against lasts_reference epsilon (relatively) to either side: savings last with epsilon more than the
+    required initial_money but not with epsilon less, and at epsilon above the minimum interest rate but not epsilon below it.'''
+    num_mismatches = 0
+    num_compared = 0
+    for i_case in range(num_cases):
+        case = draw_inverse_case(rng)
+        parameters = {name: case[name] for name in ('initial_age', 'annual_cost_of_living', 'annual_gross_earn_rate', 'inflation_rate')}
+        required_initial_money = inverse_solvers.calc_required_initial_money(interest_rates=case['interest_rates'], retirement_ages=case['retirement_ages'],
+                                                                             death_ages=case['death_age'], **parameters)
+        minimum_interest_rates = inverse_solvers.calc_minimum_interest_rate(initial_money=case['initial_money'], retirement_ages=case['retirement_ages'],
+                                                                            death_ages=case['death_age'], **parameters)
+        lo, hi = 0.5, 2.0  # calc_minimum_interest_rate's default interest_rate_bracket
+
+        for i_retirement_age, retirement_age in enumerate(case['retirement_ages']):
+            for i_rate, interest_rate in enumerate(case['interest_rates']):
+                required = float(required_initial_money[i_rate, i_retirement_age])
+                margin = epsilon * max(required, calc_money_scale(case, interest_rate))
+                errors = []
+                if not lasts_reference(case, required + margin, interest_rate, retirement_age):
+                    errors.append(f'runs out with {required + margin!r}')
+                if required > 0 and lasts_reference(case, required - margin, interest_rate, retirement_age):
+                    errors.append(f'lasts with {required - margin!r}')
+                num_compared += 1
+                if errors:
+                    num_mismatches += 1
+                    if num_mismatches <= 10:
+                        print(f'MISMATCH calc_required_initial_money {required!r} at interest_rate {interest_rate!r}, retirement_age {retirement_age}, case {case}: {", ".join(errors)}')
+
+            minimum_interest_rate = float(minimum_interest_rates[i_retirement_age])
+            errors = []
+            if math.isnan(minimum_interest_rate):
+                if lasts_reference(case, case['initial_money'], hi, retirement_age):
+                    errors.append(f'lasts at {hi!r}')
+            else:
+                if not lasts_reference(case, case['initial_money'], minimum_interest_rate * (1 + epsilon), retirement_age):
+                    errors.append(f'runs out at {minimum_interest_rate * (1 + epsilon)!r}')
+                if minimum_interest_rate > lo and lasts_reference(case, case['initial_money'], minimum_interest_rate * (1 - epsilon), retirement_age):
+                    errors.append(f'lasts at {minimum_interest_rate * (1 - epsilon)!r}')
+            num_compared += 1
+            if errors:
+                num_mismatches += 1
+                if num_mismatches <= 10:
+                    print(f'MISMATCH calc_minimum_interest_rate {minimum_interest_rate!r} at retirement_age {retirement_age}, case {case}: {", ".join(errors)}')
+    print(f'{"inverse_solvers":40} {num_compared} answers compared')
+    return num_mismatches
+
+
+def check_copied_parameters():
+    # parameters the script computes, like its interest rate grid, aren't checked
+    num_mismatches = 0
+    for script_name, table_name, table in copied_parameter_tables:
+        script_parameters = build_figures.extract_parameters(script_name)
+        num_compared = 0
+        for name, value in table.items():
+            if name not in script_parameters:
+                continue
+            try:
+                script_value = ast.literal_eval(script_parameters[name])
+            except ValueError:
+                continue
+            num_compared += 1
+            # the same type too, ints staying ints like the scripts' parameters, so results and cache keys match theirs
+            if type(value) is not type(script_value) or value != script_value:
+                num_mismatches += 1
+                print(f'MISMATCH {table_name}[{name!r}] is {value!r}, {script_name} has {script_value!r}')
+        print(f'{table_name:60} {num_compared} parameters compared with {script_name}')
+    return num_mismatches
+
+
+def report_deviations(variant, name, cases, reference_summaries, summaries):
+    # how many cases and which fields differ from the reference, and the largest relative difference in each float field, without failing
+    differing_key_counts = {}
+    max_relative_differences = {}
+    num_differing = 0
+    for reference_summary, summary in zip(reference_summaries, summaries):
+        if reference_summary is None or summary is None:
+            continue
+        differing_keys = diff_summaries(reference_summary, summary)
+        num_differing += bool(differing_keys)
+        for key in differing_keys:
+            differing_key_counts[key] = differing_key_counts.get(key, 0) + 1
+            if key in ('x', 'x_breakeven_with_inflation') and np.isfinite(float(reference_summary[key])) and float(reference_summary[key]) != 0.0:
+                relative_difference = abs(float(summary[key]) - float(reference_summary[key])) / abs(float(reference_summary[key]))
+                max_relative_differences[key] = max(max_relative_differences.get(key, 0.0), relative_difference)
+    num_compared = sum(reference_summary is not None for reference_summary in reference_summaries)
+    print(f'{variant:40} {name} differs in {num_differing} of {num_compared} cases, fields {differing_key_counts}, '
+          f'max relative differences {max_relative_differences}')
+
+
+def check_variant(variant, cases, reported_engines=None):
+    # reported_engines' differences from the reference are reported, not counted as mismatches
+    num_mismatches = 0
+    engine_summaries = {name: run_engine(variant, cases) for name, run_engine in fast_engines.items()}
+    for name, run_engine in (reported_engines or {}).items():
+        # against the first reference script, the others running the same loop
+        module = importlib.import_module(reference_scripts[variant][0])
+        reference_summaries = []
+        for case in cases:
+            try:
+                reference_summaries.append(run_reference(module, case))
+            except OverflowError:
+                reference_summaries.append(None)
+        report_deviations(variant, name, cases, reference_summaries, run_engine(variant, cases))
+    for name, summaries in engine_summaries.items():
+        if name != 'vectorized' and any(summary is not None for summary in summaries):
+            print(f'{variant:40} {name} solves {sum(summary is not None for summary in summaries)} of {len(cases)} cases')
+
+    for module_name in reference_scripts[variant]:
+        module = importlib.import_module(module_name)
+        num_compared = 0
+        for i_case, case in enumerate(cases):
+            try:
+                reference_summary = run_reference(module, case)
+            except OverflowError:
+                # math.pow overflowed in the reference, there's no reference result to compare against
+                continue
+            num_compared += 1
+            for name, summaries in engine_summaries.items():
+                if summaries[i_case] is None:
+                    continue
+                differing_keys = diff_summaries(reference_summary, summaries[i_case])
+                if differing_keys:
+                    num_mismatches += 1
+                    if num_mismatches <= 10:
+                        print(f'MISMATCH {name} vs {module_name}, case {case}')
+                        for key in differing_keys:
+                            print(f'\t{key}: reference {reference_summary[key]!r}, {name} {summaries[i_case][key]!r}')
+        print(f'{variant:40} {module_name[:60]:60} {num_compared} cases compared')
+
+    return num_mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-random', type=int, default=300, help='number of random cases per variant, in addition to the edge cases')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--variants', nargs='+', choices=vectorized_engine.VARIANTS, default=list(vectorized_engine.VARIANTS))
+    parser.add_argument('--untabulated-inflation-powers', action='store_true',
+                        help='run the vectorized engine with max_tabulated_inflation_rates=0, computing each scenario\'s inflation powers, which must still match exactly')
+    parser.add_argument('--report-fast-inflation-powers', action='store_true',
+                        help='also report, without failing, how the untabulated engine with exact_inflation_powers=False differs from the reference')
+    args = parser.parse_args()
+
+    if args.untabulated_inflation_powers:
+        fast_engines['vectorized'] = functools.partial(run_vectorized_engine, max_tabulated_inflation_rates=0)
+    reported_engines = {}
+    if args.report_fast_inflation_powers:
+        reported_engines['vectorized_fast_inflation_powers'] = functools.partial(run_vectorized_engine, max_tabulated_inflation_rates=0, exact_inflation_powers=False)
+
+    rng = random.Random(args.seed)
+    num_mismatches = check_copied_parameters()
+    num_mismatches += check_inverse_solvers(rng, args.num_random)
+    for variant in args.variants:
+        cases = edge_cases(variant) + [draw_random_case(rng, variant) for i_case in range(args.num_random)]
+        num_mismatches += check_variant(variant, cases, reported_engines)
+
+    if num_mismatches:
+        print(f'{num_mismatches} mismatches')
+        sys.exit(1)
+    print(f'all fast engines match the reference loops ({", ".join(fast_engines)}), the inverse solvers the yearly recurrence, and all copied parameters their scripts')
@@ -0,0 +1,95 @@
+'''Integrated happiness with happiness as a function of age, instead of the scripts' constant working_happiness and free_happiness.
+
+A happiness curve gives the happiness of each year of age from 0: a constant, a function of an array of ages, or a sequence with a value per age.
+With P_working[a] and P_free[a] the prefix sums of the working and free curves over the years before age a, working until retirement age r
+and living free until death age d integrates to P_working[r] + P_free[d] - P_free[r], two lookups per (retirement age, death age) pair,
+with no loop over the years in between. Constant curves give the scripts' r * working_happiness + (d - r) * free_happiness, computed as they do.
+
+    free_happiness = happiness_curves.linear_decline(0.6653911565, start_age=85, end_age=110, end_happiness=0.0)
+    integrate_happiness = happiness_curves.IntegratedHappiness(-0.7971938776, free_happiness, maximum_age=125)
+    integrate_happiness(retirement_age, death_age)'''
+import functools
+import numpy as np
+
+
+def tabulate(happiness, num_ages):
+    # (num_ages,) happiness at each age from 0, a sequence shorter than num_ages continuing at its last value
+    if callable(happiness):
+        return np.broadcast_to(np.asarray(happiness(np.arange(num_ages)), dtype=float), (num_ages,)).copy()
+    happiness = np.asarray(happiness, dtype=float)
+    if happiness.ndim == 0:
+        return np.full(num_ages, happiness.item())
+    return np.concatenate([happiness[:num_ages], np.full(max(num_ages - len(happiness), 0), happiness[-1])])
+
+
+def calc_prefix_sums(values):
+    # P[..., a], the sum of values[..., b] over b < a, for a from 0 to values.shape[-1]
+    values = np.asarray(values, dtype=float)
+    prefix_sums = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+    np.cumsum(values, axis=-1, out=prefix_sums[..., 1:])
+    return prefix_sums
+
+
+def calc_linear_decline(ages, happiness, start_age, end_age, end_happiness):
+    return happiness + (end_happiness - happiness) * np.clip((ages - start_age) / (end_age - start_age), 0.0, 1.0)
+
+
+def linear_decline(happiness, start_age, end_age, end_happiness):
+    # a curve at happiness until start_age, declining linearly to end_happiness at end_age and staying there, e.g. free time's value at very old ages
+    return functools.partial(calc_linear_decline, happiness=happiness, start_age=start_age, end_age=end_age, end_happiness=end_happiness)
+
+
+def calc_discount_factors(discount_rates, initial_age, num_ages):
+    # (discount rates..., num_ages) weight of a year of happiness at each age from 0, discount_rate**-(age - initial_age) after initial_age, 1 until then
+    exponents = np.maximum(np.arange(num_ages) - initial_age, 0)
+    return np.power(np.asarray(discount_rates, dtype=float)[..., np.newaxis], -exponents)
+
+
+class IntegratedHappiness:
+    '''Integrated happiness of working from start_age to retirement age r, then free until death age d, for r and d up to maximum_age.
+    weights, per age from 0, optionally scale each year's happiness (e.g. by the probability of being alive), and must cover maximum_age years.
+    discount_rates (e.g. 1.03 for 3% a year) discount each year's happiness after initial_age, and with more than one
+    give integrated happiness over an extra leading axis, one per discount rate. Any rate other than 1 integrates every rate, 1 included, with the prefix sums,
+    which for constant happiness can differ in the last bits from the scripts' arithmetic that discount_rates=1.0 keeps.
+    never_retiring is the scripts' working_happiness >= free_happiness, where they integrate working until death, i.e. retiring at d.'''
+    def __init__(self, working_happiness, free_happiness, maximum_age, weights=None, start_age=0, discount_rates=1.0, initial_age=0):
+        self.start_age = start_age
+        working_curve, free_curve = tabulate(working_happiness, maximum_age), tabulate(free_happiness, maximum_age)
+        self.never_retiring = bool((working_curve >= free_curve).all())
+        if np.any(np.asarray(discount_rates) != 1.0):
+            discount_factors = calc_discount_factors(discount_rates, initial_age, maximum_age)
+            weights = discount_factors if weights is None else np.asarray(weights, dtype=float)[..., :maximum_age] * discount_factors
+        self.constants = None
+        if weights is None and np.ndim(working_happiness) == 0 and np.ndim(free_happiness) == 0 and not callable(working_happiness) and not callable(free_happiness):
+            self.constants = (float(working_happiness), float(free_happiness))
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)[..., :maximum_age]
+            working_curve, free_curve = weights * working_curve, weights * free_curve
+        self.working_prefix_sums = calc_prefix_sums(working_curve)
+        self.free_prefix_sums = calc_prefix_sums(free_curve)
+
+    @staticmethod
+    def integrate(prefix_sums, start_ages, end_ages):
+        # broadcasting start_ages against end_ages first, so the discount rate axis leads both lookups
+        start_ages, end_ages = np.broadcast_arrays(np.asarray(start_ages).astype(np.int64), np.asarray(end_ages).astype(np.int64))
+        return prefix_sums[..., end_ages] - prefix_sums[..., start_ages]
+
+    def working(self, start_ages, end_ages):
+        # working from start_ages until end_ages
+        if self.constants is not None:
+            return (end_ages - start_ages) * self.constants[0]
+        return self.integrate(self.working_prefix_sums, start_ages, end_ages)
+
+    def free(self, start_ages, end_ages):
+        # free from start_ages until end_ages
+        if self.constants is not None:
+            return (end_ages - start_ages) * self.constants[1]
+        return self.integrate(self.free_prefix_sums, start_ages, end_ages)
+
+    def __call__(self, retirement_ages, death_ages):
+        # broadcasting over retirement_ages and death_ages
+        if np.ndim(retirement_ages) or np.ndim(death_ages):
+            years_worked_end = np.minimum(retirement_ages, death_ages)
+        else:
+            years_worked_end = min(retirement_ages, death_ages)
+        return self.working(self.start_age, years_worked_end) + self.free(years_worked_end, death_ages)
@@ -0,0 +1,75 @@
+'''Backtests every retirement age against actual historical annual returns, starting the simulation in every historical start year.
+
+The returns are read from a CSV with a row per year:
+    year            e.g. 1928
+    interest_rate   that year's return on savings, as a multiplier like the scripts' interest_rate (1.07 for +7%)
+    inflation_rate  optional, that year's inflation, also a multiplier. Without it the fixed inflation_rate parameter is used every year
+
+Each start year's window of returns (and inflation) over the simulated horizon is a zero-copy sliding_window_view of the series,
+and all windows and retirement ages are evaluated in one pass with monte_carlo's closed form, as if each window were a Monte Carlo path.
+A series shorter than the horizon can only be backtested with wrap, which continues each window from the start of the series.
+
+    python retirement_cli.py backtest --returns annual_returns.csv --wrap'''
+import csv
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import monte_carlo
+
+
+def read_annual_returns(path):
+    # (years, interest_rates, inflation_rates or None), sorted by year
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError(f'{path} has no rows')
+    rows.sort(key=lambda row: int(row['year']))
+    years = np.array([int(row['year']) for row in rows])
+    if (np.diff(years) != 1).any():
+        raise ValueError(f'{path} must have one row for each consecutive year')
+    interest_rates = np.array([float(row['interest_rate']) for row in rows])
+    inflation_rates = None
+    if 'inflation_rate' in rows[0]:
+        inflation_rates = np.array([float(row['inflation_rate']) for row in rows])
+    return years, interest_rates, inflation_rates
+
+
+def calc_windows(series, num_years, wrap):
+    # (start years, num_years) windows of series, a view without wrap, a view of the series continued once from its start with wrap
+    if wrap:
+        series = np.concatenate([series, np.resize(series, num_years - 1)])
+    elif len(series) < num_years:
+        raise ValueError(f'{len(series)} years of returns can\'t cover the {num_years} year horizon, use wrap')
+    return sliding_window_view(series, num_years)[:len(series) - num_years + 1]
+
+
+def backtest(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+             years, interest_rates, inflation_rates=None, wrap=False):
+    '''Simulates every retirement age from initial_age to maximum_death_age starting in each historical year.
+    Returns a dict of
+        start_year                  (start years,)
+        retirement_age              (retirement ages,)
+        death_age                   (start years, retirement ages), maximum_death_age + 1 where the money lasted
+        out_of_money                (start years, retirement ages)
+        probability_out_of_money    (retirement ages,) fraction of start years running out of money'''
+    num_years_end = maximum_death_age + 1 - initial_age
+    returns = calc_windows(np.asarray(interest_rates, dtype=float), num_years_end, wrap)
+    if inflation_rates is None:
+        inflation_powers = np.power(float(inflation_rate), np.arange(num_years_end, dtype=float))
+    else:
+        # inflation accrued before each year of each window, the first year of a window at 1
+        inflation_windows = calc_windows(np.asarray(inflation_rates, dtype=float), num_years_end, wrap)
+        inflation_powers = np.ones(inflation_windows.shape)
+        np.cumprod(inflation_windows[:, :-1], axis=1, out=inflation_powers[:, 1:])
+
+    sums = monte_carlo.calc_discounted_inflation_sums(returns, inflation_powers)
+    death_year, out_of_money = monte_carlo.calc_death_year_indices(sums, initial_money, annual_cost_of_living, annual_gross_earn_rate, np.arange(num_years_end))
+    if wrap:
+        start_years = np.asarray(years)
+    else:
+        start_years = np.asarray(years)[:len(returns)]
+    return {'start_year': start_years,
+            'retirement_age': np.arange(initial_age, maximum_death_age + 1),
+            'death_age': initial_age + death_year,
+            'out_of_money': out_of_money,
+            'probability_out_of_money': out_of_money.mean(axis=0)}
@@ -12,6 +12,7 @@ assumed_death_age = 120
 import math
 import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 
 
@@ -188,4 +189,4 @@ plt.title(program_descriptor)
 
 
 
-plt.show()
+figure_output.show(__file__)
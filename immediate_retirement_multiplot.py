@@ -1,10 +1,14 @@
 import math
+import functools
 import matplotlib
 import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
+import decimation
+
 
 def calc_x_inflation(x_n, n, interest_rate, annual_gross_earn_rate, annual_cost_of_living, inflation_rate, earning=False):
     # x_n+1 = x_n * 1.01 - 70000*1.03^n
@@ -107,22 +111,102 @@ def simulate_until_end_condition(initial_age, initial_money, annual_cost_of_livi
 
     return end_condition, data
 
-if __name__ == '__main__':
-    # params
-    initial_age = 29
-    retirement_age = initial_age
-    # initial_money = 435000
-    initial_money = 300000
-    annual_cost_of_living = 38000  # at time of initial design, and sustained *times inflation rates*
-    annual_gross_earn_rate = 69000 # while working, and sustained *times inflation rates*
-    # annual_gross_earn_rate = 38000 # while working, and sustained *times inflation rates*
-    # annual_gross_earn_rate = 100000 # while working, and sustained *times inflation rates*
-    inflation_rate = 1.0323
-    # inflation_rate = 1.0
-    maximum_death_age = 124
-    # interest_rate = 1.02  # earned on savings
-    working_happiness = -0.7971938776 # on a 0-10 scale, minus 7 to center scale at 0
-    free_happiness = 0.6653911565
+def simulate_immediate_retirement(initial_age, retirement_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                                  working_happiness, free_happiness, interest_rates):
+    # death age and integrated happiness at each interest rate, retiring at retirement_age
+    data_interest_rate_meta = defaultdict(list)
+    for interest_rate in interest_rates:
+        end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
+                                                                initial_money = initial_money,
+                                                                annual_cost_of_living = annual_cost_of_living,
+                                                                annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                interest_rate = interest_rate,
+                                                                inflation_rate = inflation_rate,
+                                                                retirement_age = retirement_age,
+                                                                end_num_years_after_retirement = None,
+                                                                end_after_num_years_sim_time = None, 
+                                                                end_if_out_of_money = True,
+                                                                end_if_breakeven_with_inflation = False,
+                                                                end_at_age = maximum_death_age + 1)
+                                                                # end_at_age = 10000)
+
+        # log data
+        # print(f'\tinterest_rate {interest_rate} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
+        data_interest_rate_meta['interest_rate'].append(interest_rate)
+        data_interest_rate_meta['retirement_age'].append(retirement_age)
+        data_interest_rate_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
+        data_interest_rate_meta['death_age'].append(run_data['age'][-1])
+        # data_interest_rate_meta['num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1])
+        # data_interest_rate_meta['ratio_num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1]/float(retirement_age))
+
+        if working_happiness >= free_happiness:
+            data_interest_rate_meta['integrated_happiness'].append(working_happiness*run_data['age'][-1])
+        # elif run_data['broke_even_with_inflation'][-1]:
+        #     data_interest_rate_meta['integrated_happiness'].append(free_happiness)
+        else:
+            data_interest_rate_meta['integrated_happiness'].append(float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness)
+
+    return data_interest_rate_meta
+
+
+def simulate_optimal_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                                working_happiness, free_happiness, interest_rates):
+    # retirement age maximizing integrated happiness at each interest rate
+    data_interest_rate_meta = defaultdict(list)
+    for interest_rate in interest_rates:
+        data_run_meta = defaultdict(list)
+
+        for retirement_age in range(initial_age, maximum_death_age + 1):
+            end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
+                                                                    initial_money = initial_money,
+                                                                    annual_cost_of_living = annual_cost_of_living,
+                                                                    annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                    interest_rate = interest_rate,
+                                                                    inflation_rate = inflation_rate,
+                                                                    retirement_age = retirement_age,
+                                                                    end_num_years_after_retirement = None,
+                                                                    end_after_num_years_sim_time = None, 
+                                                                    end_if_out_of_money = True,
+                                                                    end_if_breakeven_with_inflation = False,
+                                                                    end_at_age = maximum_death_age + 1)
+                                                                    # end_at_age = 10000)
+
+            # log data
+            # print(f'\tretirement_age {retirement_age} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
+            data_run_meta['retirement_age'].append(retirement_age)
+            data_run_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
+            data_run_meta['death_age'].append(run_data['age'][-1])
+
+            if working_happiness >= free_happiness:
+                data_run_meta['integrated_happiness'].append(working_happiness*run_data['age'][-1])
+            # elif run_data['broke_even_with_inflation'][-1]:
+            #     data_run_meta['integrated_happiness'].append(free_happiness)
+            else:
+                data_run_meta['integrated_happiness'].append(float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness)
+
+        # compute optimal retirement age
+        max_happiness, retirement_age_for_max_happiness = -float('inf'), None
+        broke_even_with_inflation = None
+        death_age = None
+        for i_integrated_happiness, integrated_happiness in enumerate(data_run_meta['integrated_happiness']):
+            if integrated_happiness >= max_happiness or math.isclose(integrated_happiness, max_happiness):  # prefer latest retirement to maximize secondary oppurtunities
+                max_happiness = integrated_happiness
+                retirement_age_for_max_happiness = data_run_meta['retirement_age'][i_integrated_happiness]
+                broke_even_with_inflation = data_run_meta['broke_even_with_inflation'][i_integrated_happiness]
+                death_age = data_run_meta['death_age'][i_integrated_happiness]
+
+        data_interest_rate_meta['interest_rate'].append(interest_rate)
+        data_interest_rate_meta['max_happiness'].append(max_happiness)
+        data_interest_rate_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
+        data_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
+        data_interest_rate_meta['death_age'].append(death_age)
+
+    return data_interest_rate_meta
+
+
+def plot_immediate_retirement(data_interest_rate_meta, initial_age, retirement_age, initial_money, annual_cost_of_living, inflation_rate, maximum_death_age,
+                              working_happiness, free_happiness):
+    data_interest_rate_meta = decimation.decimate_meta(data_interest_rate_meta)  # keeps every step in age
 
     # plot setup
     descriptor = (f'Integrated happiness over lifetime and death age as a function of savings value rate of change, assuming immediate retirement. (evaluated at discrete 1-year intervals)\n' +
@@ -166,55 +250,6 @@ if __name__ == '__main__':
     #     # slope is years free / years worked
     #     plt.plot([initial_age, maximum_death_age], [8, 8 + slope * (maximum_death_age - initial_age)], c=colors[(i_plot+1)%len(colors)], marker=None, linestyle='--', label=f'reference slope {slope:.3}')
 
-    # siumulation setup
-    # interest_rates = [1.035]
-    # interest_rates = np.linspace(1, 1.13, 14)
-    # interest_rates = np.geomspace(1, 1.13, 15)
-    # interest_rates = list(interest_rates) + [inflation_rate, 1.046]
-    # interest_rates = list(np.geomspace(1, inflation_rate, 4, endpoint=False)) + list(np.geomspace(inflation_rate, 1.045, 6, endpoint=False)) + list(np.geomspace(1.045, 1.13, 4))
-    # interest_rates = [1.04 - x for x in np.geomspace(1, 1.04, 11)]
-    # interest_rates = [1.04-(x-1)*10/9.0*0.004 for x in np.geomspace(1,10,20)]
-    # interest_rates = [1.023]
-    interest_rates = list(np.linspace(0.7, 1.30, 3000))
-    interest_rates = list(reversed(sorted(interest_rates)))
-
-    # working_happinesses = list(np.linspace(0.0, 10.0, 100))
-    # working_happinesses = list(reversed(sorted(working_happinesses)))
-
-    # siumulation
-    data_interest_rate_meta = defaultdict(list)
-    for interest_rate in interest_rates:
-        end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
-                                                                initial_money = initial_money,
-                                                                annual_cost_of_living = annual_cost_of_living,
-                                                                annual_gross_earn_rate = annual_gross_earn_rate,
-                                                                interest_rate = interest_rate,
-                                                                inflation_rate = inflation_rate,
-                                                                retirement_age = retirement_age,
-                                                                end_num_years_after_retirement = None,
-                                                                end_after_num_years_sim_time = None, 
-                                                                end_if_out_of_money = True,
-                                                                end_if_breakeven_with_inflation = False,
-                                                                end_at_age = maximum_death_age + 1)
-                                                                # end_at_age = 10000)
-
-        # log data
-        # print(f'\tinterest_rate {interest_rate} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
-        data_interest_rate_meta['interest_rate'].append(interest_rate)
-        data_interest_rate_meta['retirement_age'].append(retirement_age)
-        data_interest_rate_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
-        data_interest_rate_meta['death_age'].append(run_data['age'][-1])
-        # data_interest_rate_meta['num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1])
-        # data_interest_rate_meta['ratio_num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1]/float(retirement_age))
-
-        if working_happiness >= free_happiness:
-            data_interest_rate_meta['integrated_happiness'].append(working_happiness*run_data['age'][-1])
-        # elif run_data['broke_even_with_inflation'][-1]:
-        #     data_interest_rate_meta['integrated_happiness'].append(free_happiness)
-        else:
-            data_interest_rate_meta['integrated_happiness'].append(float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness)
-
-
     plt.plot(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['retirement_age'], c='red', marker=None, label=f'retirement age')
     plt.plot(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['death_age'], c='blue', marker=None, label=f'death age, given retirement age and corresponding savings')
     plt.fill_between(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['retirement_age'], data_interest_rate_meta['death_age'], facecolor='blue', alpha=0.1)
@@ -256,7 +291,9 @@ if __name__ == '__main__':
     # plt.show()
 
 
-
+def plot_optimal_retirement(data_interest_rate_meta, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                            working_happiness, free_happiness):
+    data_interest_rate_meta = decimation.decimate_meta(data_interest_rate_meta)  # keeps every step in age
 
     # plot setup
     descriptor = (f'Maximim average happiness over lifetime and optimal retirement age as a function of interest rate. (evaluated at discrete 1-year intervals)\n' +
@@ -278,59 +315,6 @@ if __name__ == '__main__':
     colors = ['red', 'green', 'blue', 'orange', 'black', 'brown', 'gray', 'cyan', 'magenta']
     region_patches = []
 
-    interest_rates = list(np.linspace(0.7, 1.30, 3000))
-    interest_rates = list(reversed(sorted(interest_rates)))
-
-    # siumulation
-    data_interest_rate_meta = defaultdict(list)
-    for interest_rate in interest_rates:
-        data_run_meta = defaultdict(list)
-
-        for retirement_age in range(initial_age, maximum_death_age + 1):
-            end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
-                                                                    initial_money = initial_money,
-                                                                    annual_cost_of_living = annual_cost_of_living,
-                                                                    annual_gross_earn_rate = annual_gross_earn_rate,
-                                                                    interest_rate = interest_rate,
-                                                                    inflation_rate = inflation_rate,
-                                                                    retirement_age = retirement_age,
-                                                                    end_num_years_after_retirement = None,
-                                                                    end_after_num_years_sim_time = None, 
-                                                                    end_if_out_of_money = True,
-                                                                    end_if_breakeven_with_inflation = False,
-                                                                    end_at_age = maximum_death_age + 1)
-                                                                    # end_at_age = 10000)
-
-            # log data
-            # print(f'\tretirement_age {retirement_age} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
-            data_run_meta['retirement_age'].append(retirement_age)
-            data_run_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
-            data_run_meta['death_age'].append(run_data['age'][-1])
-
-            if working_happiness >= free_happiness:
-                data_run_meta['integrated_happiness'].append(working_happiness*run_data['age'][-1])
-            # elif run_data['broke_even_with_inflation'][-1]:
-            #     data_run_meta['integrated_happiness'].append(free_happiness)
-            else:
-                data_run_meta['integrated_happiness'].append(float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness)
-
-        # compute optimal retirement age
-        max_happiness, retirement_age_for_max_happiness = -float('inf'), None
-        broke_even_with_inflation = None
-        death_age = None
-        for i_integrated_happiness, integrated_happiness in enumerate(data_run_meta['integrated_happiness']):
-            if integrated_happiness >= max_happiness or math.isclose(integrated_happiness, max_happiness):  # prefer latest retirement to maximize secondary oppurtunities
-                max_happiness = integrated_happiness
-                retirement_age_for_max_happiness = data_run_meta['retirement_age'][i_integrated_happiness]
-                broke_even_with_inflation = data_run_meta['broke_even_with_inflation'][i_integrated_happiness]
-                death_age = data_run_meta['death_age'][i_integrated_happiness]
-
-        data_interest_rate_meta['interest_rate'].append(interest_rate)
-        data_interest_rate_meta['max_happiness'].append(max_happiness)
-        data_interest_rate_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
-        data_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
-        data_interest_rate_meta['death_age'].append(death_age)
-
     plt.plot(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['retirement_age_for_max_happiness'], c='red', marker=None, label=f'optimal retirement age')
     plt.plot(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['death_age'], c='blue', marker=None, label=f'death age, given retirement age and corresponding savings')
     plt.fill_between(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['retirement_age_for_max_happiness'], data_interest_rate_meta['death_age'], facecolor='blue', alpha=0.1)
@@ -363,4 +347,84 @@ if __name__ == '__main__':
     plt.gca().set_yticks(np.linspace(*plt.gca().get_ybound(), 11))
     plt.legend(loc=1)
 
-    plt.show()
\ No newline at end of file
+
+if __name__ == '__main__':
+    # params
+    initial_age = 29
+    retirement_age = initial_age
+    # initial_money = 435000
+    initial_money = 300000
+    annual_cost_of_living = 38000  # at time of initial design, and sustained *times inflation rates*
+    annual_gross_earn_rate = 69000 # while working, and sustained *times inflation rates*
+    # annual_gross_earn_rate = 38000 # while working, and sustained *times inflation rates*
+    # annual_gross_earn_rate = 100000 # while working, and sustained *times inflation rates*
+    inflation_rate = 1.0323
+    # inflation_rate = 1.0
+    maximum_death_age = 124
+    # interest_rate = 1.02  # earned on savings
+    working_happiness = -0.7971938776 # on a 0-10 scale, minus 7 to center scale at 0
+    free_happiness = 0.6653911565
+
+    # siumulation setup
+    # interest_rates = [1.035]
+    # interest_rates = np.linspace(1, 1.13, 14)
+    # interest_rates = np.geomspace(1, 1.13, 15)
+    # interest_rates = list(interest_rates) + [inflation_rate, 1.046]
+    # interest_rates = list(np.geomspace(1, inflation_rate, 4, endpoint=False)) + list(np.geomspace(inflation_rate, 1.045, 6, endpoint=False)) + list(np.geomspace(1.045, 1.13, 4))
+    # interest_rates = [1.04 - x for x in np.geomspace(1, 1.04, 11)]
+    # interest_rates = [1.04-(x-1)*10/9.0*0.004 for x in np.geomspace(1,10,20)]
+    # interest_rates = [1.023]
+    interest_rates = list(np.linspace(0.7, 1.30, 3000))
+    interest_rates = list(reversed(sorted(interest_rates)))
+
+    # working_happinesses = list(np.linspace(0.0, 10.0, 100))
+    # working_happinesses = list(reversed(sorted(working_happinesses)))
+
+    # simulation
+    data_immediate_retirement_interest_rate_meta = simulate_immediate_retirement(initial_age = initial_age,
+                                                                                 retirement_age = retirement_age,
+                                                                                 initial_money = initial_money,
+                                                                                 annual_cost_of_living = annual_cost_of_living,
+                                                                                 annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                                 inflation_rate = inflation_rate,
+                                                                                 maximum_death_age = maximum_death_age,
+                                                                                 working_happiness = working_happiness,
+                                                                                 free_happiness = free_happiness,
+                                                                                 interest_rates = interest_rates)
+
+    interest_rates = list(np.linspace(0.7, 1.30, 3000))
+    interest_rates = list(reversed(sorted(interest_rates)))
+
+    data_optimal_retirement_interest_rate_meta = simulate_optimal_retirement(initial_age = initial_age,
+                                                                             initial_money = initial_money,
+                                                                             annual_cost_of_living = annual_cost_of_living,
+                                                                             annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                             inflation_rate = inflation_rate,
+                                                                             maximum_death_age = maximum_death_age,
+                                                                             working_happiness = working_happiness,
+                                                                             free_happiness = free_happiness,
+                                                                             interest_rates = interest_rates)
+
+    # plot data, each figure is rendered in its own process when headless
+    figure_output.render(__file__, [functools.partial(plot_immediate_retirement,
+                                                      data_interest_rate_meta = data_immediate_retirement_interest_rate_meta,
+                                                      initial_age = initial_age,
+                                                      retirement_age = retirement_age,
+                                                      initial_money = initial_money,
+                                                      annual_cost_of_living = annual_cost_of_living,
+                                                      inflation_rate = inflation_rate,
+                                                      maximum_death_age = maximum_death_age,
+                                                      working_happiness = working_happiness,
+                                                      free_happiness = free_happiness),
+                                    functools.partial(plot_optimal_retirement,
+                                                      data_interest_rate_meta = data_optimal_retirement_interest_rate_meta,
+                                                      initial_age = initial_age,
+                                                      initial_money = initial_money,
+                                                      annual_cost_of_living = annual_cost_of_living,
+                                                      annual_gross_earn_rate = annual_gross_earn_rate,
+                                                      inflation_rate = inflation_rate,
+                                                      maximum_death_age = maximum_death_age,
+                                                      working_happiness = working_happiness,
+                                                      free_happiness = free_happiness)])
+
+    figure_output.show(__file__)
\ No newline at end of file
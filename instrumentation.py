@@ -0,0 +1,92 @@
+'''Per-phase wall time and counters for the simulation pipeline, exportable as JSON at the end of a run.
+
+Disabled by default. While disabled, phase() hands back a shared no-op context manager and count() returns immediately,
+and hot loops guard their calls with `if instrumentation.enabled:`, so an uninstrumented run pays nothing measurable.
+Only the current process is recorded, chunks computed in process pool workers aren't counted.'''
+import os
+import json
+import time
+import contextlib
+from collections import defaultdict
+
+
+enabled = False
+phase_seconds = defaultdict(float)  # wall time spent in each phase, excluding time spent in phases nested inside it
+phase_calls = defaultdict(int)
+counters = defaultdict(int)
+_phase_stack = []  # [name, start time, seconds spent in nested phases]
+_null_phase = contextlib.nullcontext()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    phase_seconds.clear()
+    phase_calls.clear()
+    counters.clear()
+    _phase_stack.clear()
+
+
+def enable_from_environment(variable='INSTRUMENTATION_JSON'):
+    # enables instrumentation if the environment variable names a JSON file to export to, and returns that path (or None)
+    path = os.environ.get(variable)
+    if path:
+        enable()
+        return path
+    return None
+
+
+class _Phase:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        _phase_stack.append([self.name, time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, *exc_info):
+        name, time_start, nested_seconds = _phase_stack.pop()
+        elapsed = time.perf_counter() - time_start
+        phase_seconds[name] += elapsed - nested_seconds
+        phase_calls[name] += 1
+        if _phase_stack:
+            _phase_stack[-1][2] += elapsed
+        return False
+
+
+def phase(name):
+    # with instrumentation.phase('simulate'): ...
+    if not enabled:
+        return _null_phase
+    return _Phase(name)
+
+
+def count(name, value=1):
+    if enabled:
+        counters[name] += value
+
+
+def count_simulation(end_condition, run_data):
+    # counters for one simulate_until_end_condition run: total runs, simulated years, and exits by end condition
+    counters['runs'] += 1
+    counters['simulated_years'] += len(run_data['age'])
+    counters[f'end_condition.{end_condition}'] += 1
+
+
+def snapshot():
+    return {'phase_seconds': dict(phase_seconds),
+            'phase_calls': dict(phase_calls),
+            'counters': dict(counters)}
+
+
+def export_json(path):
+    with open(path, 'w') as f:
+        json.dump(snapshot(), f, indent=4, sort_keys=True)
@@ -2,6 +2,8 @@ import math
 import matplotlib
 import pprint
 import numpy as np
+import happiness_curves
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
@@ -130,7 +132,8 @@ if __name__ == '__main__':
     maximum_death_age = 124
     # interest_rate = 1.02  # earned on savings
     working_happiness = -0.7971938776 # on a 0-10 scale, minus 7 to center scale at 0
-    free_happiness = 0.6653911565
+    free_happiness = 0.6653911565  # or a per-age curve, e.g. happiness_curves.linear_decline(0.6653911565, start_age=85, end_age=110, end_happiness=0.0)
+    integrated_happiness = happiness_curves.IntegratedHappiness(working_happiness, free_happiness, maximum_age=maximum_death_age + 1)
 
     # plot setup
     descriptor = (f'Integrated happiness over lifetime and death age as a function of savings interest rate and retirement age. (evaluated at discrete 1-year intervals)\n' +
@@ -371,12 +374,12 @@ if __name__ == '__main__':
         data_retirement_at_68_interest_rate_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
         data_retirement_at_68_interest_rate_meta['death_age'].append(run_data['age'][-1])
 
-        if working_happiness >= free_happiness:
-            data_retirement_at_68_interest_rate_meta['integrated_happiness'].append(working_happiness*run_data['age'][-1])
+        if integrated_happiness.never_retiring:
+            data_retirement_at_68_interest_rate_meta['integrated_happiness'].append(integrated_happiness(run_data['age'][-1], run_data['age'][-1]))
         # elif run_data['broke_even_with_inflation'][-1]:
         #     data_retirement_at_68_interest_rate_meta['integrated_happiness'].append(free_happiness)
         else:
-            data_retirement_at_68_interest_rate_meta['integrated_happiness'].append(float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness)
+            data_retirement_at_68_interest_rate_meta['integrated_happiness'].append(integrated_happiness(retirement_age, retirement_age + run_data['num_years_after_retirement'][-1]))
 
     # # plot data
     # plt.plot([inflation_rate, inflation_rate], plt.gca().get_ybound(), c='magenta', linestyle='--', linewidth=3, label=f'inflation_rate')
@@ -481,4 +484,4 @@ if __name__ == '__main__':
     # ', at interest_rate = {(interest_rate-1)*100:.3}%'
     # colors[i_plot%len(colors)]
 
-    plt.show()
+    figure_output.show(__file__)
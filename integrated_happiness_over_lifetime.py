@@ -2,6 +2,8 @@ import math
 import matplotlib
 import pprint
 import numpy as np
+import happiness_curves
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
@@ -119,6 +121,9 @@ if __name__ == '__main__':
     # inflation_rate = 1.0
     likely_death_age = 120
     # interest_rate = earned on savings
+    working_happiness = -0.7971938776 # on a 0-10 scale, minus 7 to center scale at 0
+    free_happiness = 0.6653911565  # or a per-age curve, e.g. happiness_curves.linear_decline(0.6653911565, start_age=85, end_age=110, end_happiness=0.0)
+    integrated_happiness = happiness_curves.IntegratedHappiness(working_happiness, free_happiness, maximum_age=10000)
 
     # plot setup
     descriptor = (f'Intrgrated happiness over lifetime as a function of age of retirement and annual interest rate. (evaluated at 1-year intervals)\n' + 
@@ -193,12 +198,11 @@ if __name__ == '__main__':
             data['retirement_age'].append(retirement_age)
             data['num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1])
             data['ratio_num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1]/float(retirement_age))
-            # data['average_happiness'].append((float(retirement_age)*-0.7971938776 + run_data['num_years_after_retirement'][-1]*0.6653911565))
-            data['average_happiness'].append((float(retirement_age)*-0.7971938776 + run_data['num_years_after_retirement'][-1]*0.6653911565))
+            data['average_happiness'].append(integrated_happiness(retirement_age, retirement_age + run_data['num_years_after_retirement'][-1]))
 
         plt.plot(data['retirement_age'], data['average_happiness'], c=colors[i_plot%len(colors)], marker='x', markersize=2, label=f'average happiness, at interest_rate = {(interest_rate - 1.0) * 100 :.3}%')
 
     handles, labels = plt.gca().get_legend_handles_labels()
     # plt.legend(loc=1, handles = region_patches + handles)
     plt.legend(loc=1)
-    plt.show()
+    figure_output.show(__file__)
@@ -2,9 +2,13 @@ import math
 import matplotlib
 import pprint
 import numpy as np
+import happiness_curves
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
+import decimation
+
 
 def calc_x_inflation(x_n, n, interest_rate, annual_gross_earn_rate, annual_cost_of_living, inflation_rate, earning=False):
     # x_n+1 = x_n * 1.01 - 70000*1.03^n
@@ -125,7 +129,8 @@ if __name__ == '__main__':
     maximum_death_age = 124
     # interest_rate = 1.02  # earned on savings
     working_happiness = -0.7971938776 # on a 0-10 scale, minus 7 to center scale at 0
-    free_happiness = 0.6653911565
+    free_happiness = 0.6653911565  # or a per-age curve, e.g. happiness_curves.linear_decline(0.6653911565, start_age=85, end_age=110, end_happiness=0.0)
+    integrated_happiness = happiness_curves.IntegratedHappiness(working_happiness, free_happiness, maximum_age=maximum_death_age + 1)
 
     # plot setup
     descriptor = (f'Integrated happiness over lifetime and death age as a function of savings value rate of change, assuming immediate retirement. (evaluated at discrete 1-year intervals)\n' +
@@ -210,14 +215,16 @@ if __name__ == '__main__':
         # data_interest_rate_meta['num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1])
         # data_interest_rate_meta['ratio_num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1]/float(retirement_age))
 
-        if working_happiness >= free_happiness:
-            data_interest_rate_meta['integrated_happiness'].append(working_happiness*run_data['age'][-1])
+        if integrated_happiness.never_retiring:
+            data_interest_rate_meta['integrated_happiness'].append(integrated_happiness(run_data['age'][-1], run_data['age'][-1]))
         # elif run_data['broke_even_with_inflation'][-1]:
         #     data_interest_rate_meta['integrated_happiness'].append(free_happiness)
         else:
-            data_interest_rate_meta['integrated_happiness'].append(float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness)
+            data_interest_rate_meta['integrated_happiness'].append(integrated_happiness(retirement_age, retirement_age + run_data['num_years_after_retirement'][-1]))
 
 
+    # decimated, keeping every step in age
+    data_interest_rate_meta = decimation.decimate_meta(data_interest_rate_meta)
     plt.plot(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['retirement_age'], c='red', marker=None, label=f'retirement age')
     plt.plot(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['death_age'], c='blue', marker=None, label=f'death age, given retirement age and corresponding savings')
     plt.fill_between(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['retirement_age'], data_interest_rate_meta['death_age'], facecolor='blue', alpha=0.1)
@@ -256,4 +263,4 @@ if __name__ == '__main__':
 
     # handles, labels = plt.gca().get_legend_handles_labels()
     # plt.legend(loc=1, handles = region_patches + handles)
-    plt.show()
+    figure_output.show(__file__)
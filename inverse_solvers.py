@@ -0,0 +1,97 @@
+'''Inverse questions, solved directly instead of by reading them off sweeps: how much do I need saved to retire at r and have it last to d?
+
+Working the years from initial_age to retirement_age, then retired, savings must stay above 0 every year before death_age
+(running out in the year of death_age itself counts as lasting, like the goal-ages script's survival to assumed_death_age).
+With monte_carlo's closed form, x[n] / G[n] = initial_money + annual_gross_earn_rate * S[min(n, m)] - annual_cost_of_living * S[n] for m years worked,
+which is linear in initial_money. S is increasing, so the year that needs the most savings is the last one worked or the last one lived,
+and the required initial_money is a lookup into S per (interest rate, retirement age, death age), with no simulation.
+
+Savings lasting at an interest rate last at any higher one, so the minimum interest rate for given savings is found by bisection,
+every (retirement age, death age) bisecting its own bracket at once, each evaluation being the same lookup at that pair's midpoint rate.
+
+    required_initial_money = inverse_solvers.calc_required_initial_money(initial_age=28, annual_cost_of_living=38000, annual_gross_earn_rate=75000,
+                                                                         inflation_rate=1.0323, interest_rates=np.linspace(1, 1.1, 3000),
+                                                                         retirement_ages=np.arange(28, 121), death_ages=120)
+    minimum_interest_rate = inverse_solvers.calc_minimum_interest_rate(initial_age=28, initial_money=300000, annual_cost_of_living=38000,
+                                                                       annual_gross_earn_rate=75000, inflation_rate=1.0323,
+                                                                       retirement_ages=np.arange(28, 121), death_ages=120)'''
+import numpy as np
+
+import monte_carlo
+
+
+def calc_constant_return_sums(interest_rates, inflation_rate, num_years):
+    # (interest rates, num_years + 1) monte_carlo's S, each interest rate a path of constant returns
+    returns = np.broadcast_to(np.asarray(interest_rates, dtype=float)[:, np.newaxis], (len(interest_rates), num_years))
+    return monte_carlo.calc_discounted_inflation_sums(returns, np.power(float(inflation_rate), np.arange(num_years, dtype=float)))
+
+
+def calc_worst_year_required_from_sums(sums, annual_cost_of_living, annual_gross_earn_rate, num_years_worked, num_years_lived):
+    '''initial_money keeps x[n] > 0 for 0 < n < num_years_lived exactly when it's more than this, given monte_carlo's S per row of sums.
+    Negative where savings of 0 already last, -inf where no year is checked. num_years_worked and num_years_lived broadcast against (rows, 1),
+    num_years_lived at most sums.shape[1] - 1.'''
+    rows = np.arange(sums.shape[0])[:, np.newaxis]
+    num_years_worked, num_years_lived = np.broadcast_arrays(np.asarray(num_years_worked), np.asarray(num_years_lived))
+    last_year = np.maximum(num_years_lived - 1, 0)
+    last_year_worked = np.minimum(num_years_worked, last_year)
+
+    # while working, x[n] / G[n] = initial_money - (annual_cost_of_living - annual_gross_earn_rate) * S[n], most negative at the first or last year worked
+    net_cost = annual_cost_of_living - annual_gross_earn_rate
+    worst_year_worked = last_year_worked if net_cost > 0 else np.minimum(last_year_worked, 1)
+    required_working = np.where(last_year_worked > 0, net_cost * sums[rows, worst_year_worked], -np.inf)
+    # once retired, x[n] / G[n] = initial_money + annual_gross_earn_rate * S[m] - annual_cost_of_living * S[n], most negative at the last year lived
+    required_retired = np.where(num_years_worked < last_year, annual_cost_of_living * sums[rows, last_year] - annual_gross_earn_rate * sums[rows, last_year_worked], -np.inf)
+    return np.maximum(required_working, required_retired)
+
+
+def calc_required_from_sums(sums, annual_cost_of_living, annual_gross_earn_rate, num_years_worked, num_years_lived):
+    # the least initial_money (any more lasts, never below 0) keeping x[n] > 0 for 0 < n < num_years_lived, see calc_worst_year_required_from_sums
+    return np.maximum(calc_worst_year_required_from_sums(sums, annual_cost_of_living, annual_gross_earn_rate, num_years_worked, num_years_lived), 0.0)
+
+
+def calc_required_initial_money(initial_age, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, interest_rates, retirement_ages, death_ages):
+    '''(interest rates, ...) the least initial_money at initial_age for savings to last from retiring at retirement_age until death_age,
+    for each interest rate, broadcasting retirement_ages against death_ages for the trailing axes. Retirement ages at or after a death age work until it.'''
+    retirement_ages, death_ages = np.broadcast_arrays(np.asarray(retirement_ages), np.asarray(death_ages))
+    if (death_ages <= initial_age).any():
+        raise ValueError(f'death ages must be after initial_age {initial_age}')
+    if (retirement_ages < initial_age).any():
+        raise ValueError(f'retirement ages must be at least initial_age {initial_age}')
+    sums = calc_constant_return_sums(interest_rates, inflation_rate, int(death_ages.max()) - initial_age)
+    required_initial_money = calc_required_from_sums(sums, annual_cost_of_living, annual_gross_earn_rate,
+                                                     (retirement_ages - initial_age).reshape(1, -1), (death_ages - initial_age).reshape(1, -1))
+    return required_initial_money.reshape((len(sums),) + retirement_ages.shape)
+
+
+def calc_minimum_interest_rate(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, retirement_ages, death_ages,
+                               interest_rate_bracket=(0.5, 2.0), tolerance=1e-12):
+    '''The least interest rate within interest_rate_bracket (to within tolerance, erring high) at which initial_money lasts from retiring at
+    retirement_age until death_age, broadcasting retirement_ages against death_ages. The bracket's low end where it lasts even there, nan where not even at its high end.'''
+    retirement_ages, death_ages = np.broadcast_arrays(np.asarray(retirement_ages), np.asarray(death_ages))
+    if (death_ages <= initial_age).any():
+        raise ValueError(f'death ages must be after initial_age {initial_age}')
+    if (retirement_ages < initial_age).any():
+        raise ValueError(f'retirement ages must be at least initial_age {initial_age}')
+    num_years_worked = (retirement_ages - initial_age).reshape(-1, 1)
+    num_years_lived = (death_ages - initial_age).reshape(-1, 1)
+    num_years = int(num_years_lived.max())
+
+    def lasts(interest_rates):
+        # per (retirement age, death age), at its own interest rate
+        sums = calc_constant_return_sums(interest_rates, inflation_rate, num_years)
+        # unclamped, so savings of 0 last wherever no year needs any
+        return initial_money > calc_worst_year_required_from_sums(sums, annual_cost_of_living, annual_gross_earn_rate, num_years_worked, num_years_lived)[:, 0]
+
+    lo = np.full(num_years_worked.shape[0], float(interest_rate_bracket[0]))
+    hi = np.full(num_years_worked.shape[0], float(interest_rate_bracket[1]))
+    lasts_at_lo, lasts_at_hi = lasts(lo), lasts(hi)
+    searching = ~lasts_at_lo & lasts_at_hi
+    # lasts(lo) stays False and lasts(hi) True
+    while searching.any():
+        mid = 0.5 * (lo + hi)
+        lasts_at_mid = lasts(mid)
+        hi = np.where(searching & lasts_at_mid, mid, hi)
+        lo = np.where(searching & ~lasts_at_mid, mid, lo)
+        searching &= hi - lo > tolerance
+    minimum_interest_rate = np.where(lasts_at_lo, lo, np.where(lasts_at_hi, hi, np.nan))
+    return minimum_interest_rate.reshape(retirement_ages.shape)
@@ -0,0 +1,170 @@
+'''Monte Carlo counterpart of the optimal retirement age sweep, with a random return each year instead of a fixed interest_rate, to show sequence-of-returns risk.
+
+Each path draws a return for every year, normal or lognormal around interest_rate (lognormal keeps interest_rate as the mean return),
+and every retirement age from initial_age to maximum_death_age is simulated on the same paths, like the reference loop of the least squares script
+(retire_before_step_recheck_out_of_money, ending when out of money or at maximum_death_age + 1, no break even end).
+
+Rather than stepping every (path, retirement age) pair through every year, the savings recurrence x[n+1] = x[n] * r[n] + c[n] * inflation_rate**n
+is solved in closed form per path. With G[n] = r[0] * ... * r[n-1] and S[n] = sum of inflation_rate**k / G[k+1] over k < n,
+retiring after m years gives x[n] = G[n] * (initial_money + annual_gross_earn_rate * S[min(n, m)] - annual_cost_of_living * S[n]).
+S is increasing, so the year a path runs out of money is found for all retirement ages at once by binary searching S.
+
+    result = simulate_monte_carlo(initial_age=29, initial_money=300000, annual_cost_of_living=38000, annual_gross_earn_rate=69000,
+                                  interest_rate=1.05, inflation_rate=1.0323, maximum_death_age=124, volatility=0.15, num_paths=100000, seed=1)'''
+import functools
+import numpy as np
+
+from sweep import run_sweep
+
+
+DISTRIBUTIONS = ('lognormal', 'normal')
+MINIMUM_RETURN = 1e-9  # normal returns are floored here, a return of 0 loses all savings and a negative one isn't meaningful
+DEFAULT_BLOCK_SIZE = 10000  # paths simulated at once, bounds memory use. Changing it changes which random numbers each path draws
+
+
+def draw_returns(rng, num_paths, num_years, interest_rate, volatility, distribution):
+    # (paths x years) annual returns, as multipliers like interest_rate
+    z = rng.standard_normal((num_paths, num_years))
+    if distribution == 'lognormal':
+        return interest_rate * np.exp(volatility * z - 0.5 * volatility**2)
+    return np.maximum(interest_rate + volatility * z, MINIMUM_RETURN)
+
+
+def calc_discounted_inflation_sums(returns, inflation_powers):
+    # S[:, n], the sum over k < n of inflation_powers[k] / G[k+1], with S[:, 0] = 0
+    # inflation_powers is inflation_rate**k, or cumulative inflation per path (broadcasting against returns) where inflation varies by year
+    num_paths, num_years = returns.shape
+    growth = np.cumprod(returns, axis=1)  # G[k+1]
+    sums = np.zeros((num_paths, num_years + 1))
+    np.cumsum(inflation_powers / growth, axis=1, out=sums[:, 1:])
+    return sums
+
+
+def search_sorted_rows(sums, thresholds, lo):
+    '''For each path (row of sums, which are increasing) and retirement age (column of thresholds and lo),
+    the first year n >= lo with sums[path, n] >= threshold, or sums.shape[1] if there isn't one.'''
+    num_years = sums.shape[1]
+    rows = np.arange(sums.shape[0])[:, np.newaxis]
+    lo = np.broadcast_to(lo, thresholds.shape).copy()
+    hi = np.full(thresholds.shape, num_years)
+    while True:
+        searching = lo < hi
+        if not searching.any():
+            return lo
+        mid = (lo + hi) // 2
+        at_least = sums[rows, np.minimum(mid, num_years - 1)] >= thresholds
+        hi = np.where(searching & at_least, mid, hi)
+        lo = np.where(searching & ~at_least, mid + 1, lo)
+
+
+def calc_death_year_indices(sums, initial_money, annual_cost_of_living, annual_gross_earn_rate, num_retired_years_offsets, recheck_out_of_money=True):
+    '''The year index each path ends on (num_years is the end at maximum_death_age + 1), for each number of years worked m,
+    along with whether it ran out of money. Matches the reference's recheck: running out of money during a year ends the run on the year before.
+    Without recheck_out_of_money, like the other variants, the run ends on the year the money has run out.'''
+    num_years_end = sums.shape[1] - 1
+    m = num_retired_years_offsets[np.newaxis, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # while working, x[n] / G[n] = initial_money - (annual_cost_of_living - annual_gross_earn_rate) * S[n], the same for every retirement age
+        net_cost = annual_cost_of_living - annual_gross_earn_rate
+        working_threshold = initial_money / net_cost if net_cost > 0 else np.inf
+        ruin_working = search_sorted_rows(sums, np.full((sums.shape[0], 1), working_threshold), 1)
+
+        # once retired, x[n] / G[n] = initial_money + annual_gross_earn_rate * S[m] - annual_cost_of_living * S[n]
+        retired_thresholds = (initial_money + annual_gross_earn_rate * sums[:, num_retired_years_offsets]) / annual_cost_of_living if annual_cost_of_living > 0 else \
+            np.full((sums.shape[0], len(num_retired_years_offsets)), np.inf)
+        ruin_retired = search_sorted_rows(sums, retired_thresholds, np.maximum(m + 1, 1))
+
+    ruin = np.where(ruin_working <= m, ruin_working, ruin_retired)
+    if initial_money <= 0:
+        ruin = np.zeros_like(ruin)
+    out_of_money = ruin <= num_years_end
+    if not recheck_out_of_money:
+        return np.where(out_of_money, ruin, num_years_end), out_of_money
+    death_year = np.where(out_of_money, np.maximum(ruin - 1, 0), num_years_end)
+    return death_year, out_of_money
+
+
+def simulate_block(rng, num_paths, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, interest_rate, inflation_rate, maximum_death_age,
+                   volatility, distribution):
+    # (death age counts per retirement age, out of money counts per retirement age) over num_paths paths
+    num_years_end = maximum_death_age + 1 - initial_age
+    returns = draw_returns(rng, num_paths, num_years_end, interest_rate, volatility, distribution)
+    sums = calc_discounted_inflation_sums(returns, np.power(float(inflation_rate), np.arange(num_years_end, dtype=float)))
+    num_retirement_ages = maximum_death_age + 1 - initial_age
+    death_year, out_of_money = calc_death_year_indices(sums, initial_money, annual_cost_of_living, annual_gross_earn_rate, np.arange(num_retirement_ages))
+
+    i_retirement_age = np.broadcast_to(np.arange(num_retirement_ages), death_year.shape)
+    death_age_counts = np.bincount((i_retirement_age * (num_years_end + 1) + death_year).ravel(),
+                                   minlength=num_retirement_ages * (num_years_end + 1)).reshape(num_retirement_ages, num_years_end + 1)
+    return death_age_counts, out_of_money.sum(axis=0)
+
+
+def simulate_seeded_block(block, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, interest_rate, inflation_rate, maximum_death_age,
+                          volatility, distribution):
+    # a sweep chunk, block is (the block's seed sequence, its number of paths)
+    seed_sequence, num_paths = block
+    return simulate_block(np.random.default_rng(seed_sequence), num_paths, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate,
+                          interest_rate, inflation_rate, maximum_death_age, volatility, distribution)
+
+
+def merge_block_counts(state, block, counts):
+    death_age_counts, out_of_money_counts = counts
+    state['death_age_counts'] += death_age_counts
+    state['out_of_money_counts'] += out_of_money_counts
+    return state
+
+
+def simulate_monte_carlo(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, interest_rate, inflation_rate, maximum_death_age,
+                         volatility, num_paths, seed=0, distribution='lognormal', block_size=DEFAULT_BLOCK_SIZE, workers=None, progress=False):
+    '''Simulates num_paths return paths for every retirement age from initial_age to maximum_death_age, seeded for reproducibility.
+
+    Paths are simulated in blocks of block_size, each drawing from its own stream spawned from seed (numpy.random.SeedSequence.spawn),
+    so the paths depend only on seed and block_size. Blocks are spread over a process pool of workers, which send back only their
+    histograms, merged as they arrive. Results are identical for any number of workers.
+
+    Returns a dict of
+        retirement_age              (retirement ages,)
+        death_age                   (death ages,) from initial_age to maximum_death_age + 1, the latter meaning the money lasted
+        death_age_counts            (retirement ages, death ages) number of paths ending at each age
+        probability_out_of_money    (retirement ages,)
+        num_paths'''
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f'unknown distribution {distribution!r}, expected one of {DISTRIBUTIONS}')
+    block_path_counts = [min(block_size, num_paths - block_start) for block_start in range(0, num_paths, block_size)]
+    blocks = list(zip(np.random.SeedSequence(seed).spawn(len(block_path_counts)), block_path_counts))
+
+    num_retirement_ages = maximum_death_age + 1 - initial_age
+    counts = run_sweep(functools.partial(simulate_seeded_block,
+                                         initial_age = initial_age,
+                                         initial_money = initial_money,
+                                         annual_cost_of_living = annual_cost_of_living,
+                                         annual_gross_earn_rate = annual_gross_earn_rate,
+                                         interest_rate = interest_rate,
+                                         inflation_rate = inflation_rate,
+                                         maximum_death_age = maximum_death_age,
+                                         volatility = volatility,
+                                         distribution = distribution),
+                       blocks,
+                       reduce_chunk = merge_block_counts,
+                       state = {'death_age_counts': np.zeros((num_retirement_ages, num_retirement_ages + 1), dtype=np.int64),
+                                'out_of_money_counts': np.zeros(num_retirement_ages, dtype=np.int64)},
+                       workers = workers,
+                       description = 'monte carlo',
+                       scenarios_per_chunk = lambda block: block[1] * num_retirement_ages,
+                       progress = progress)
+
+    return {'retirement_age': np.arange(initial_age, maximum_death_age + 1),
+            'death_age': np.arange(initial_age, maximum_death_age + 2),
+            'death_age_counts': counts['death_age_counts'],
+            'probability_out_of_money': counts['out_of_money_counts'] / num_paths,
+            'num_paths': num_paths}
+
+
+def calc_death_age_percentiles(result, percentiles=(5, 50, 95)):
+    # {percentile: (retirement ages,) death age}, the lowest death age with at least that percent of paths ending by it
+    cumulative_fraction = np.cumsum(result['death_age_counts'], axis=1) / result['num_paths']
+    return {percentile: result['death_age'][np.argmax(cumulative_fraction >= percentile / 100.0 - 1e-12, axis=1)] for percentile in percentiles}
+
+
+def calc_mean_death_age(result):
+    return result['death_age_counts'] @ result['death_age'] / result['num_paths']
@@ -0,0 +1,89 @@
+'''Mortality-weighted expected integrated happiness, with a life table instead of dying at maximum_death_age (or when out of money).
+
+The scripts' integrated happiness of retiring at r and dying at d is r * working_happiness + (d - r) * free_happiness, a year of happiness per year lived.
+Weighting each year of age a by the probability of being alive at a (given alive at initial_age) gives its expected value over the death age,
+from the same single simulated trajectory per (interest rate, retirement age), which still ends when out of money.
+With the prefix sums of happiness_curves, that's a lookup per scenario, and working_happiness and free_happiness may be per-age curves too.
+
+The life table is a CSV with a row per age:
+    age                 e.g. 0 to 119
+    survival            number (or fraction) of people alive at that age, any scale, like a life table's l(x)
+    death_probability   or instead, the probability of dying during that year of age, like a life table's q(x)
+Ages past the table's last are treated as dead.
+
+    python retirement_cli.py expected-retirement --life-table life_table.csv'''
+import csv
+import numpy as np
+from collections import defaultdict
+
+import happiness_curves
+import vectorized_analyses
+
+
+def read_life_table(path):
+    # (ages, survival), survival being l(x), from either column
+    with open(path, newline='') as f:
+        rows = sorted(csv.DictReader(f), key=lambda row: int(row['age']))
+    if not rows:
+        raise ValueError(f'{path} has no rows')
+    ages = np.array([int(row['age']) for row in rows])
+    if (np.diff(ages) != 1).any():
+        raise ValueError(f'{path} must have one row for each consecutive age')
+    if 'survival' in rows[0]:
+        survival = np.array([float(row['survival']) for row in rows])
+    elif 'death_probability' in rows[0]:
+        survival = np.concatenate([[1.0], np.cumprod(1.0 - np.array([float(row['death_probability']) for row in rows]))[:-1]])
+    else:
+        raise ValueError(f'{path} needs a survival or death_probability column')
+    return ages, survival
+
+
+def calc_survival_probabilities(life_table_ages, survival, initial_age, maximum_death_age):
+    # (maximum_death_age + 1,) probability of being alive at each age from 0, given alive at initial_age, 1 before it
+    if not life_table_ages[0] <= initial_age <= life_table_ages[-1]:
+        raise ValueError(f'initial_age {initial_age} outside the life table\'s ages {life_table_ages[0]} to {life_table_ages[-1]}')
+    i_ages = np.arange(maximum_death_age + 1) - life_table_ages[0]
+    probabilities = np.where(i_ages < len(survival), survival[np.clip(i_ages, 0, len(survival) - 1)], 0.0) / survival[initial_age - life_table_ages[0]]
+    probabilities[:initial_age + 1] = 1.0
+    return probabilities
+
+
+def calc_expected_integrated_happiness(survival_probabilities, working_happiness, free_happiness, retirement_ages, death_ages, discount_rate=1.0, initial_age=0):
+    # broadcasting over retirement_ages and death_ages, as integers
+    integrate_happiness = happiness_curves.IntegratedHappiness(working_happiness, free_happiness, len(survival_probabilities), weights=survival_probabilities,
+                                                               discount_rates=discount_rate, initial_age=initial_age)
+    if integrate_happiness.never_retiring:
+        return integrate_happiness(death_ages, death_ages)  # like the scripts, working until death
+    return integrate_happiness(retirement_ages, death_ages)
+
+
+def simulate_expected_optimal_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                                         working_happiness, free_happiness, interest_rates, life_table_ages, survival, discount_rate=1.0):
+    '''vectorized_analyses.simulate_optimal_retirement, maximizing expected integrated happiness instead.
+    death_age is where the money runs out, or maximum_death_age + 1, and expected_death_age is the life expectancy until then.'''
+    retirement_ages = np.arange(initial_age, maximum_death_age + 1)
+    run = vectorized_analyses.simulate_without_breakeven_end(initial_age=initial_age,
+                                                             initial_money=initial_money,
+                                                             annual_cost_of_living=annual_cost_of_living,
+                                                             annual_gross_earn_rate=annual_gross_earn_rate,
+                                                             interest_rate=np.asarray(interest_rates, dtype=float)[:, np.newaxis],
+                                                             inflation_rate=inflation_rate,
+                                                             retirement_age=retirement_ages[np.newaxis, :],
+                                                             end_at_age=maximum_death_age + 1)
+    death_ages = run['age'].astype(np.int64)
+    survival_probabilities = calc_survival_probabilities(life_table_ages, survival, initial_age, maximum_death_age)
+    expected_happiness = calc_expected_integrated_happiness(survival_probabilities, working_happiness, free_happiness, retirement_ages[np.newaxis, :], death_ages,
+                                                            discount_rate, initial_age)
+    expected_death_ages = happiness_curves.calc_prefix_sums(survival_probabilities)[death_ages]
+
+    data_expected_retirement_interest_rate_meta = defaultdict(list)
+    for i_rate, interest_rate in enumerate(interest_rates):
+        max_happiness, retirement_age_for_max_happiness, broke_even_with_inflation, death_age = vectorized_analyses.select_max_happiness(
+            retirement_ages.tolist(), expected_happiness[i_rate].tolist(), run['broke_even_with_inflation'][i_rate].tolist(), death_ages[i_rate].tolist())
+        data_expected_retirement_interest_rate_meta['interest_rate'].append(interest_rate)
+        data_expected_retirement_interest_rate_meta['max_expected_happiness'].append(max_happiness)
+        data_expected_retirement_interest_rate_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
+        data_expected_retirement_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
+        data_expected_retirement_interest_rate_meta['death_age'].append(death_age)
+        data_expected_retirement_interest_rate_meta['expected_death_age'].append(expected_death_ages[i_rate, retirement_ages == retirement_age_for_max_happiness][0].item())
+    return data_expected_retirement_interest_rate_meta
@@ -2,6 +2,7 @@ import math
 import matplotlib
 import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
@@ -107,6 +108,32 @@ def simulate_until_end_condition(initial_age, initial_money, annual_cost_of_livi
 
     return end_condition, data
 
+
+def simulate_survival(interest_rate, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, likely_death_age):
+    # years survived after retirement, for each retirement age, at one interest rate
+    data = defaultdict(list)
+    for retirement_age in range(initial_age, likely_death_age + 1):
+        end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
+                                                                initial_money = initial_money,
+                                                                annual_cost_of_living = annual_cost_of_living,
+                                                                annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                interest_rate = interest_rate,
+                                                                inflation_rate = inflation_rate,
+                                                                retirement_age = retirement_age,
+                                                                end_num_years_after_retirement = 120,
+                                                                end_after_num_years_sim_time = None, 
+                                                                end_if_out_of_money = True,
+                                                                end_if_breakeven_with_inflation = False,
+                                                                end_at_age = False)
+
+        # log data
+        # print(f'\tretirement_age {retirement_age} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
+        data['retirement_age'].append(retirement_age)
+        data['num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1])
+
+    return data
+
+
 if __name__ == '__main__':
     # params
     initial_age = 28
@@ -165,30 +192,17 @@ if __name__ == '__main__':
 
     # siumulation
     for i_plot, interest_rate in enumerate(interest_rates):
-        data = defaultdict(list)
         # print(f'processing {interest_rate}')
-
-        for retirement_age in range(initial_age, likely_death_age + 1):
-            end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
-                                                                    initial_money = initial_money,
-                                                                    annual_cost_of_living = annual_cost_of_living,
-                                                                    annual_gross_earn_rate = annual_gross_earn_rate,
-                                                                    interest_rate = interest_rate,
-                                                                    inflation_rate = inflation_rate,
-                                                                    retirement_age = retirement_age,
-                                                                    end_num_years_after_retirement = 120,
-                                                                    end_after_num_years_sim_time = None, 
-                                                                    end_if_out_of_money = True,
-                                                                    end_if_breakeven_with_inflation = False,
-                                                                    end_at_age = False)
-
-            # log data
-            # print(f'\tretirement_age {retirement_age} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
-            data['retirement_age'].append(retirement_age)
-            data['num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1])
+        data = simulate_survival(interest_rate = interest_rate,
+                                 initial_age = initial_age,
+                                 initial_money = initial_money,
+                                 annual_cost_of_living = annual_cost_of_living,
+                                 annual_gross_earn_rate = annual_gross_earn_rate,
+                                 inflation_rate = inflation_rate,
+                                 likely_death_age = likely_death_age)
 
         plt.plot(data['retirement_age'], data['num_years_survived_after_retirement'], c=colors[i_plot%len(colors)], marker='x', markersize=2, label=f'years survival, at interest_rate = {(interest_rate - 1.0) * 100 :.3}%')
 
     handles, labels = plt.gca().get_legend_handles_labels()
     plt.legend(loc=1, handles = region_patches + handles)
-    plt.show()
+    figure_output.show(__file__)
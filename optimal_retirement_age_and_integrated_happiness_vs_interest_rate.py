@@ -2,9 +2,12 @@ import math
 import matplotlib
 import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
+import decimation
+
 
 def calc_x_inflation(x_n, n, interest_rate, annual_gross_earn_rate, annual_cost_of_living, inflation_rate, earning=False):
     # x_n+1 = x_n * 1.01 - 70000*1.03^n
@@ -231,6 +234,8 @@ if __name__ == '__main__':
         data_interest_rate_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
         data_interest_rate_meta['death_age'].append(death_age)
 
+    # decimated, keeping every step in age
+    data_interest_rate_meta = decimation.decimate_meta(data_interest_rate_meta)
     plt.plot(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['retirement_age_for_max_happiness'], c='red', marker=None, label=f'optimal retirement age')
     plt.plot(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['death_age'], c='blue', marker=None, label=f'death age, given retirement age and corresponding savings')
     plt.fill_between(data_interest_rate_meta['interest_rate'], data_interest_rate_meta['retirement_age_for_max_happiness'], data_interest_rate_meta['death_age'], facecolor='blue', alpha=0.1)
@@ -254,4 +259,4 @@ if __name__ == '__main__':
 
     # handles, labels = plt.gca().get_legend_handles_labels()
     # plt.legend(loc=1, handles = region_patches + handles)
-    plt.show()
+    figure_output.show(__file__)
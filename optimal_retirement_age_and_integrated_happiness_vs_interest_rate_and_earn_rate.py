@@ -1,114 +1,54 @@
+import os
 import math
+import functools
 import matplotlib
-import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
-from collections import defaultdict
 
+import monte_carlo
+import happiness_curves
+import vectorized_analyses
+from sweep import run_sweep
+
+
+def calc_death_ages(annual_gross_earn_rate, initial_age, initial_money, annual_cost_of_living, inflation_rate, maximum_death_age, interest_rates, retirement_ages):
+    '''(interest rates, retirement ages) death ages and whether each run ran out of money, retiring after the step at retirement_age and ending
+    out of money or at maximum_death_age + 1, with no break even end. Every run is solved at once with monte_carlo's closed form,
+    each interest rate being a path of constant returns. golden_output_equivalence_harness.py checks it against the reference loops.'''
+    num_years_end = maximum_death_age + 1 - initial_age
+    returns = np.broadcast_to(np.asarray(interest_rates, dtype=float)[:, np.newaxis], (len(interest_rates), num_years_end))
+    sums = monte_carlo.calc_discounted_inflation_sums(returns, np.power(float(inflation_rate), np.arange(num_years_end, dtype=float)))
+    # retiring after the step at retirement_age, so working retirement_age - initial_age + 1 years, at most the whole simulation
+    num_years_worked = np.minimum(np.asarray(retirement_ages) - initial_age + 1, num_years_end)
+    death_year, out_of_money = monte_carlo.calc_death_year_indices(sums, initial_money, annual_cost_of_living, annual_gross_earn_rate, num_years_worked,
+                                                                   recheck_out_of_money=False)
+    return initial_age + death_year, out_of_money
+
+
+def simulate_earn_rate_optimal_retirement(annual_gross_earn_rate, initial_age, initial_money, annual_cost_of_living, inflation_rate, maximum_death_age,
+                                          working_happiness, free_happiness, interest_rates):
+    # optimal retirement age, its max happiness and death age at each interest rate, for one earn rate, -1 ages where no run is valid
+    retirement_ages = np.arange(initial_age, maximum_death_age + 1)
+    death_ages, out_of_money = calc_death_ages(annual_gross_earn_rate, initial_age, initial_money, annual_cost_of_living, inflation_rate, maximum_death_age,
+                                               interest_rates, retirement_ages)
+
+    integrate_happiness = happiness_curves.IntegratedHappiness(working_happiness, free_happiness, maximum_death_age + 2)
+    if integrate_happiness.never_retiring:
+        integrated_happiness = integrate_happiness.working(0, death_ages)
+    else:
+        # num_years_after_retirement is death_age - retirement_age - 1, the year of retirement being worked
+        integrated_happiness = integrate_happiness.working(0, retirement_ages) + integrate_happiness.free(retirement_ages + 1, np.maximum(death_ages, retirement_ages + 1))
+    # ran out of money before retiring, not a valid simulation run
+    valid = ~(out_of_money & (death_ages <= retirement_ages))
+
+    max_happiness, i_retirement_age = vectorized_analyses.select_max_happiness_array(integrated_happiness, valid)
+    selected = i_retirement_age >= 0
+    i_retirement_age = np.maximum(i_retirement_age, 0)
+    return {'max_happiness': max_happiness,
+            'retirement_age_for_max_happiness': np.where(selected, retirement_ages[i_retirement_age], -1),
+            'death_age': np.where(selected, np.take_along_axis(death_ages, i_retirement_age[:, np.newaxis], axis=1)[:, 0], -1)}
 
-def calc_x_inflation(x_n, n, interest_rate, annual_gross_earn_rate, annual_cost_of_living, inflation_rate, earning=False):
-    # x_n+1 = x_n * 1.01 - 70000*1.03^n
-    # x(n+1) = x(n) * 1.01 - 70000*1.03^n
-    # x_np1 = x_n * interest_rate - annual_cost_of_living*math.pow(inflation_rate, n)
-    x_np1 = x_n * interest_rate + ((annual_gross_earn_rate if earning else 0.0) - annual_cost_of_living) * (math.pow(inflation_rate, n))
-    return x_np1
-
-
-def calc_instantaneous_cost_of_living(n, annual_cost_of_living, inflation_rate):
-    x = annual_cost_of_living * math.pow(inflation_rate, n)
-    return x
-
-
-def calc_instantaneous_breakeven(n, interest_rate, annual_cost_of_living, inflation_rate):
-    x = calc_instantaneous_cost_of_living(n, annual_cost_of_living, inflation_rate) / (interest_rate - 1)
-    return x
-
-
-def calc_breakeven_with_inflation(n, interest_rate, inflation_rate, annual_cost_of_living):
-    '''have 1.45e8
-    cost of living 3.28e6
-    breakeven 8.17e7
-    age 149
-    retired at 118
-    interest 0.04
-    inflation 0.0323
-
-    earned with interest = 0.04 * 1.45e8 = 5.8e6
-    spent = 3.28e6
-    net earn = 5.8e6 - 3.28e6 = 2.52e6
-    amount net earn to offset inflation = 0.0323 * 1.45e8 = 4.6835e6
-    want: earned with interest = spent + amount net earn to offset inflation
-    x * (interest_rate - 1) = calc_instantaneous_cost_of_living + x * (inflation_rate - 1)
-    => x * (interest_rate - inflation_rate) = calc_instantaneous_cost_of_living
-    => x = calc_instantaneous_cost_of_living / (interest_rate - inflation_rate)'''
-    x = calc_instantaneous_cost_of_living(n, annual_cost_of_living, inflation_rate) / (interest_rate - inflation_rate)
-    return x
-
-
-def simulate_until_end_condition(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, interest_rate, inflation_rate, retirement_age,
-                                 end_num_years_after_retirement=None, end_after_num_years_sim_time=300, 
-                                 end_if_out_of_money=True, end_if_breakeven_with_inflation=True, end_at_age=None):
-    n = 0  # years passed since initial_age. Used to calculate inflation adjusted values
-    x = initial_money  # money at each timestep
-
-    possible_to_breakeven_with_inflation = bool(interest_rate > inflation_rate)
-
-    # earn money until retirement
-    retired = False
-    num_years_after_retirement = None
-    data = defaultdict(list)
-    while True:
-        # calcs
-        age = n + initial_age
-
-        if possible_to_breakeven_with_inflation:
-            x_breakeven_with_inflation = calc_breakeven_with_inflation(n, interest_rate, inflation_rate, annual_cost_of_living)
-            broke_even_with_inflation = (x >= x_breakeven_with_inflation)
-        else:
-            x_breakeven_with_inflation = None
-            broke_even_with_inflation = False
-
-        # log data
-        data['x'].append(x)
-        data['age'].append(age)
-        data['retired'].append(retired)
-        data['num_years_after_retirement'].append(num_years_after_retirement)
-        data['x_breakeven_with_inflation'].append(x_breakeven_with_inflation)
-        data['broke_even_with_inflation'].append(broke_even_with_inflation)
-
-        # end conditions
-        if end_if_out_of_money and x <= 0:
-            end_condition = 'out_of_money'
-            break
-
-        if end_if_breakeven_with_inflation and possible_to_breakeven_with_inflation and broke_even_with_inflation:
-            end_condition = 'breakeven_with_inflation'
-            break
-
-        if end_after_num_years_sim_time is not None and n >= end_after_num_years_sim_time:
-            end_condition = 'num_years_sim_time'
-            break
-
-        if end_at_age is not None and age >= end_at_age:
-            end_condition = 'age'
-            break
-
-        if end_num_years_after_retirement is not None and num_years_after_retirement is not None and num_years_after_retirement >= end_num_years_after_retirement:
-            end_condition = 'num_years_after_retirement'
-            break
-
-        # simulation
-        x = calc_x_inflation(x, n, interest_rate, annual_gross_earn_rate, annual_cost_of_living, inflation_rate, earning = not retired)
-        n += 1
-
-        if age == retirement_age:
-            retired = True
-            num_years_after_retirement = 0
-
-        if age > retirement_age:
-            num_years_after_retirement += 1
-
-    return end_condition, data
 
 if __name__ == '__main__':
     # params
@@ -130,133 +70,50 @@ if __name__ == '__main__':
                   f'initial_age = {initial_age}, maximum_death_age = {maximum_death_age+1}, inflation_rate = {(inflation_rate-1)*100:.3}% (annual), initial_money = {initial_money}, annual_cost_of_living = {annual_cost_of_living}\n' +
                   f'working_happiness = {working_happiness}, free_happiness = {free_happiness} (integrated value for one year, zero centered)')
 
-    plt.figure()
-    # plt.gca().xaxis.set_major_formatter(matplotlib.ticker.PercentFormatter(xmax=1.0))
-    # 'working_happiness (scale out of 10)'
-    plt.xlabel('interest rate (annual)')
-    plt.ylabel('optimal ages, which maximize average happiness over lifetime')
-    plt.title(descriptor)
-    plt.minorticks_on()
-    plt.grid(b=True, which='major', color='black', linestyle='-')
-    plt.grid(b=True, which='minor', color='red', linestyle='--')
-    plt.gca().xaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda val, pos: f'{(val-1)*100:.3}%'))
-    plt.xlim(1.0, 1.1)
-    plt.ylim(initial_age, maximum_death_age + 4)
-
-    # colors = ['red', 'green', 'blue', 'orange', 'yellow', 'black', 'brown', 'gray', 'cyan', 'magenta']
-    colors = ['red', 'green', 'blue', 'orange', 'black', 'brown', 'gray', 'cyan', 'magenta']
-
     # siumulation setup
     # interest_rates = [1.035]
     # interest_rates = np.linspace(1, 1.13, 14)
-    # interest_rates = np.geomspace(1, 1.13, 15)
-    # interest_rates = list(interest_rates) + [inflation_rate, 1.046]
-    # interest_rates = list(np.geomspace(1, inflation_rate, 4, endpoint=False)) + list(np.geomspace(inflation_rate, 1.045, 6, endpoint=False)) + list(np.geomspace(1.045, 1.13, 4))
-    # interest_rates = [1.04 - x for x in np.geomspace(1, 1.04, 11)]
-    # interest_rates = [1.04-(x-1)*10/9.0*0.004 for x in np.geomspace(1,10,20)]
-    # interest_rates = [1.023]
-    interest_rates = list(np.linspace(1, 1.10, 3000))
-    interest_rates = list(reversed(sorted(interest_rates)))
-
-    # working_happinesses = list(np.linspace(0.0, 10.0, 100))
-    # working_happinesses = list(reversed(sorted(working_happinesses)))
-
-    # annual_gross_earn_rates = [20000]
-    annual_gross_earn_rates = list(np.geomspace(20000, 300000, 6))
-    annual_gross_earn_rates = list(reversed(sorted(annual_gross_earn_rates)))
-
-    # siumulation
-    data_annual_gross_earn_rate_meta = defaultdict(list)
-    for annual_gross_earn_rate in annual_gross_earn_rates:
-
-        data_interest_rate_meta = defaultdict(list)
-        for interest_rate in interest_rates:
-
-            data_run_meta = defaultdict(list)
-            for retirement_age in range(initial_age, maximum_death_age + 1):
-                end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
-                                                                        initial_money = initial_money,
-                                                                        annual_cost_of_living = annual_cost_of_living,
-                                                                        annual_gross_earn_rate = annual_gross_earn_rate,
-                                                                        interest_rate = interest_rate,
-                                                                        inflation_rate = inflation_rate,
-                                                                        retirement_age = retirement_age,
-                                                                        end_num_years_after_retirement = None,
-                                                                        end_after_num_years_sim_time = None, 
-                                                                        end_if_out_of_money = True,
-                                                                        end_if_breakeven_with_inflation = False,
-                                                                        end_at_age = maximum_death_age + 1)
-                                                                        # end_at_age = 10000)
-
-                if end_condition == 'out_of_money' and run_data['num_years_after_retirement'][-1] is None:
-                    # ran out of money before retiring, not a valid simulation run, do not keep these results
-                    continue
-
-                # log data
-                # print(f'\tretirement_age {retirement_age} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
-                data_run_meta['retirement_age'].append(retirement_age)
-                data_run_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
-                data_run_meta['death_age'].append(run_data['age'][-1])
-                # data_run_meta['num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1])
-                # data_run_meta['ratio_num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1]/float(retirement_age))
-
-                if working_happiness >= free_happiness:
-                    data_run_meta['integrated_happiness'].append(working_happiness*run_data['age'][-1])
-                # elif run_data['broke_even_with_inflation'][-1]:
-                #     data_run_meta['integrated_happiness'].append(free_happiness)
-                else:
-                    data_run_meta['integrated_happiness'].append(float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness)
-
-            # compute optimal retirement age
-            max_happiness, retirement_age_for_max_happiness = -float('inf'), None
-            death_age = None
-            for i_integrated_happiness, integrated_happiness in enumerate(data_run_meta['integrated_happiness']):
-                if integrated_happiness >= max_happiness or math.isclose(integrated_happiness, max_happiness):  # prefer latest retirement to maximize secondary oppurtunities
-                    max_happiness = integrated_happiness
-                    retirement_age_for_max_happiness = data_run_meta['retirement_age'][i_integrated_happiness]
-                    death_age = data_run_meta['death_age'][i_integrated_happiness]
-
-            data_interest_rate_meta['interest_rate'].append(interest_rate)
-            data_interest_rate_meta['max_happiness'].append(max_happiness)
-            data_interest_rate_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
-            data_interest_rate_meta['death_age'].append(death_age)
-
-        data_annual_gross_earn_rate_meta['annual_gross_earn_rate'].append(annual_gross_earn_rate)
-        data_annual_gross_earn_rate_meta['interest_rates'].append(data_interest_rate_meta['interest_rate'])
-        data_annual_gross_earn_rate_meta['retirement_age_for_max_happinesses'].append(data_interest_rate_meta['retirement_age_for_max_happiness'])
-        data_annual_gross_earn_rate_meta['death_ages'].append(data_interest_rate_meta['death_age'])
-        data_annual_gross_earn_rate_meta['max_happinesses'].append(data_interest_rate_meta['max_happiness'])
-
-    region_patches = []
-    for i_annual_gross_earn_rate, annual_gross_earn_rate in enumerate(data_annual_gross_earn_rate_meta['annual_gross_earn_rate']):
-        # plt.plot(data_annual_gross_earn_rate_meta['interest_rates'][i_annual_gross_earn_rate], data_annual_gross_earn_rate_meta['retirement_age_for_max_happinesses'][i_annual_gross_earn_rate], c=colors[i_annual_gross_earn_rate%len(colors)], marker=None, label=f'optimal retirement age at earn rate = {annual_gross_earn_rate}')
-        # plt.plot(data_annual_gross_earn_rate_meta['interest_rates'][i_annual_gross_earn_rate], data_annual_gross_earn_rate_meta['death_ages'][i_annual_gross_earn_rate], c=colors[i_annual_gross_earn_rate%len(colors)], marker=None, label=f'death age, given retirement age and corresponding savings at earn rate = {annual_gross_earn_rate}')
-
-        plt.plot(data_annual_gross_earn_rate_meta['interest_rates'][i_annual_gross_earn_rate], data_annual_gross_earn_rate_meta['retirement_age_for_max_happinesses'][i_annual_gross_earn_rate], c=colors[i_annual_gross_earn_rate%len(colors)], marker=None)
-        plt.plot(data_annual_gross_earn_rate_meta['interest_rates'][i_annual_gross_earn_rate], data_annual_gross_earn_rate_meta['death_ages'][i_annual_gross_earn_rate], c=colors[i_annual_gross_earn_rate%len(colors)], marker=None)
-
-        plt.fill_between(data_annual_gross_earn_rate_meta['interest_rates'][i_annual_gross_earn_rate], data_annual_gross_earn_rate_meta['retirement_age_for_max_happinesses'][i_annual_gross_earn_rate], data_annual_gross_earn_rate_meta['death_ages'][i_annual_gross_earn_rate], facecolor=colors[i_annual_gross_earn_rate%len(colors)], alpha=0.1)
-        region_patch = matplotlib.patches.Patch(color=colors[i_annual_gross_earn_rate%len(colors)], label=f'optimal retirement and death ages at earn rate = {annual_gross_earn_rate}')
-        region_patches.append(region_patch)
-    plt.plot([inflation_rate, inflation_rate], plt.gca().get_ybound(), c='magenta', linestyle='--', label=f'inflation_rate')
-
-    plt.gca().set_yticks(np.linspace(*plt.gca().get_ybound(), 11))
-    handles, labels = plt.gca().get_legend_handles_labels()
-    plt.legend(loc=2, handles = region_patches + handles)
-    # plt.legend(loc=2)
-
-    plt.twinx()
-    plt.ylabel('maximum integrated happiness (zero centered)')
-    # plt.ylim(-20, 50)
-
-    for i_annual_gross_earn_rate, annual_gross_earn_rate in enumerate(data_annual_gross_earn_rate_meta['annual_gross_earn_rate']):
-        plt.plot(data_annual_gross_earn_rate_meta['interest_rates'][i_annual_gross_earn_rate], data_annual_gross_earn_rate_meta['max_happinesses'][i_annual_gross_earn_rate], c=colors[i_annual_gross_earn_rate%len(colors)], marker=None, linestyle='--', label=f'average happiness over lifetime at earn rate = {annual_gross_earn_rate}')
-    plt.plot(plt.gca().get_xbound(), [0.0, 0.0], c='cyan', linestyle='--', label=f'minimum happiness to count as "worth it"')
-
-    plt.gca().set_yticks(np.linspace(*plt.gca().get_ybound(), 11))
-    plt.legend(loc=1)
-
-    # ', at interest_rate = {(interest_rate-1)*100:.3}%'
-    # colors[i_plot%len(colors)]
-
-    plt.show()
+    # interest_rates = list(np.linspace(1, 1.10, 3000))
+    # annual_gross_earn_rates = list(np.geomspace(20000, 300000, 6))
+    interest_rates = np.linspace(1, 1.10, 3000)
+    annual_gross_earn_rates = np.geomspace(20000, 300000, 500)
+
+    # siumulation, every interest rate and retirement age at once per earn rate, checkpointed and cached per earn rate
+    data_annual_gross_earn_rate_meta = run_sweep(functools.partial(simulate_earn_rate_optimal_retirement,
+                                                                   initial_age = initial_age,
+                                                                   initial_money = initial_money,
+                                                                   annual_cost_of_living = annual_cost_of_living,
+                                                                   inflation_rate = inflation_rate,
+                                                                   maximum_death_age = maximum_death_age,
+                                                                   working_happiness = working_happiness,
+                                                                   free_happiness = free_happiness,
+                                                                   interest_rates = interest_rates),
+                                                 annual_gross_earn_rates.tolist(),
+                                                 checkpoint_path = os.path.splitext(os.path.abspath(__file__))[0] + '.checkpoint',
+                                                 description = 'earn rate sweep',
+                                                 scenarios_per_chunk = len(interest_rates) * (maximum_death_age + 1 - initial_age))
+    # (earn rates, interest rates)
+    retirement_age_for_max_happinesses = np.stack([data_run_meta['retirement_age_for_max_happiness'] for data_run_meta in data_annual_gross_earn_rate_meta])
+    death_ages = np.stack([data_run_meta['death_age'] for data_run_meta in data_annual_gross_earn_rate_meta])
+    max_happinesses = np.stack([data_run_meta['max_happiness'] for data_run_meta in data_annual_gross_earn_rate_meta])
+
+    # earn rates are geometrically spaced, so the rows are evenly spaced on a log axis
+    extent = (interest_rates[0], interest_rates[-1], math.log10(annual_gross_earn_rates[0]), math.log10(annual_gross_earn_rates[-1]))
+    fig, axes = plt.subplots(1, 3, sharey=True)
+    fig.suptitle(descriptor)
+    for ax, values, label in [(axes[0], np.where(retirement_age_for_max_happinesses >= 0, retirement_age_for_max_happinesses, np.nan), 'optimal retirement age, which maximizes integrated happiness'),
+                              (axes[1], np.where(death_ages >= 0, death_ages, np.nan), 'death age, given optimal retirement age and corresponding savings'),
+                              (axes[2], np.where(np.isfinite(max_happinesses), max_happinesses, np.nan), 'maximum integrated happiness (zero centered)')]:
+        image = ax.imshow(values, origin='lower', aspect='auto', extent=extent, interpolation='nearest')
+        fig.colorbar(image, ax=ax, label=label)
+        ax.set_xlabel('interest rate (annual)')
+        ax.xaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda val, pos: f'{(val-1)*100:.3}%'))
+        ax.plot([inflation_rate, inflation_rate], extent[2:], c='magenta', linestyle='--', label=f'inflation_rate')
+    axes[2].contour(interest_rates, np.log10(annual_gross_earn_rates), max_happinesses, levels=[0.0], colors='cyan', linestyles='--')
+    axes[2].plot([], [], c='cyan', linestyle='--', label=f'minimum happiness to count as "worth it"')
+    axes[0].set_ylabel('annual gross earn rate')
+    axes[0].yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda val, pos: f'{10**val:.0f}'))
+    for ax in axes:
+        ax.legend(loc=2, fontsize='small')
+
+    figure_output.show(__file__)
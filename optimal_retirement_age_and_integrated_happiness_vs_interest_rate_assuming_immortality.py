@@ -2,6 +2,7 @@ import math
 import matplotlib
 import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
@@ -256,4 +257,4 @@ if __name__ == '__main__':
 
     # handles, labels = plt.gca().get_legend_handles_labels()
     # plt.legend(loc=1, handles = region_patches + handles)
-    plt.show()
+    figure_output.show(__file__)
@@ -1,10 +1,16 @@
+import os
 import math
-import matplotlib
-import pprint
+import functools
 import numpy as np
-from matplotlib import pyplot as plt
+import figure_output
 from collections import defaultdict
 
+import decimation
+import instrumentation
+import happiness_curves
+import simulation_cache
+from sweep import run_sweep
+
 
 def calc_x_inflation(x_n, n, interest_rate, annual_gross_earn_rate, annual_cost_of_living, inflation_rate, earning=False):
     # x_n+1 = x_n * 1.01 - 70000*1.03^n
@@ -115,87 +121,19 @@ def simulate_until_end_condition(initial_age, initial_money, annual_cost_of_livi
 
     return end_condition, data
 
-if __name__ == '__main__':
-    # params
-    initial_age = 29
-    # retirement_age = initial_age
-    # initial_money = 435000
-    initial_money = 300000
-    annual_cost_of_living = 38000  # at time of initial design, and sustained *times inflation rates*
-    annual_gross_earn_rate = 69000 # while working, and sustained *times inflation rates*
-    # annual_gross_earn_rate = 38000 # while working, and sustained *times inflation rates*
-    # annual_gross_earn_rate = 100000 # while working, and sustained *times inflation rates*
-    inflation_rate = 1.0323
-    # inflation_rate = 1.0
-    maximum_death_age = 124
-    # interest_rate = 1.02  # earned on savings
-    working_happiness = -0.7971938776 # on a 0-10 scale, minus 7 to center scale at 0
-    free_happiness = 0.6653911565
-
-    # plot setup
-    descriptor = (f'Integrated happiness over lifetime and death age as a function of savings interest rate and retirement age. (evaluated at discrete 1-year intervals)\n' +
-                  f'Comparing retirement strategies: immediate retirement, optimal retirement age (maximizes integrated happiness), immediate retirement + run out of money + work again + optimal 2nd retirement (maximizes integrated happiness), and static retirement at age where integrated happiness least squares fits to optimal.\n' +
-                  f'initial_age = {initial_age}, maximum_death_age = {maximum_death_age+1}, inflation_rate = {(inflation_rate-1)*100:.3}% (annual), initial_money = {initial_money}, annual_gross_earn_rate = {annual_gross_earn_rate}, annual_cost_of_living = {annual_cost_of_living}\n' +
-                  f'working_happiness = {working_happiness}, free_happiness = {free_happiness} (integrated value for one year, zero centered)')
-
-    # assuming immediate retirement
-    # maximizing integrated happiness over lifetime
-
-    plt.figure()
-    # plt.gca().xaxis.set_major_formatter(matplotlib.ticker.PercentFormatter(xmax=1.0))
-    # 'working_happiness (scale out of 10)'
-    plt.xlabel('savings annual interest or depreciation')
-    plt.ylabel('age')
-    plt.title(descriptor)
-    plt.minorticks_on()
-    plt.grid(b=True, which='major', color='black', linestyle='-')
-    plt.grid(b=True, which='minor', color='red', linestyle='--')
-    plt.gca().xaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda val, pos: f'{(val-1)*100:.3}%'))
-    plt.xlim(0.7, 1.3)
-    plt.ylim(initial_age - 1, maximum_death_age + 4)
-
-    # colors = ['red', 'green', 'blue', 'orange', 'yellow', 'black', 'brown', 'gray', 'cyan', 'magenta']
-    colors = ['red', 'green', 'blue', 'orange', 'black', 'brown', 'gray', 'cyan', 'magenta']
-
-    # # reference indicating enopugh capital accrued to surive to maximum_death_age
-    region_patches = []
-    # previous_y = None
-    # for i_region, difference in enumerate(np.linspace(0, 80, 5)):
-    #     x, y = [initial_age, maximum_death_age], [maximum_death_age - initial_age - difference, 0 - difference]
-        
-    #     if previous_y is None:
-    #         upper_bound = 100
-    #     else:
-    #         upper_bound = previous_y
-    #     previous_y = y
-        
-    #     plt.fill_between(x, y, upper_bound, facecolor=colors[(i_region)%len(colors)], alpha=0.1)
-    #     region_patch = matplotlib.patches.Patch(color=colors[(i_region)%len(colors)], label=f'enough savings to survive until age {int(maximum_death_age - difference)}')
-    #     region_patches.append(region_patch)
-
-    # # reference slopes indicating ratio of years free to years working
-    # for i_plot, slope in enumerate([2/5.0, 1.0, 1.2, 5/2.0]):
-    #     # slope is years free / years worked
-    #     plt.plot([initial_age, maximum_death_age], [8, 8 + slope * (maximum_death_age - initial_age)], c=colors[(i_plot+1)%len(colors)], marker=None, linestyle='--', label=f'reference slope {slope:.3}')
 
-    # siumulation setup
-    # interest_rates = [1.035]
-    # interest_rates = np.linspace(1, 1.13, 14)
-    # interest_rates = np.geomspace(1, 1.13, 15)
-    # interest_rates = list(interest_rates) + [inflation_rate, 1.046]
-    # interest_rates = list(np.geomspace(1, inflation_rate, 4, endpoint=False)) + list(np.geomspace(inflation_rate, 1.045, 6, endpoint=False)) + list(np.geomspace(1.045, 1.13, 4))
-    # interest_rates = [1.04 - x for x in np.geomspace(1, 1.04, 11)]
-    # interest_rates = [1.04-(x-1)*10/9.0*0.004 for x in np.geomspace(1,10,20)]
-    # interest_rates = [1.023]
-    interest_rates = list(np.linspace(0.7, 1.30, 3000))
-    interest_rates = list(sorted(interest_rates))
+def calc_summed_squared_distance_to_optimal(integrated_happiness, optimal_integrated_happiness):
+    # integrated_happiness may be a single row over the interest rate grid, or a (initial retirement age x interest rate) matrix
+    # both arguments must be evaluated on the same interest rate grid, in the same order
+    return np.sum(np.square(np.asarray(optimal_integrated_happiness, dtype=float) - np.asarray(integrated_happiness, dtype=float)), axis=-1)
 
-    # working_happinesses = list(np.linspace(0.0, 10.0, 100))
-    # working_happinesses = list(reversed(sorted(working_happinesses)))
 
-    # simulation 1 - immediate retirement
+def simulate_immediate_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                                  working_happiness, free_happiness, interest_rates, discount_rate=1.0):
+    # retire immediately, for each interest rate
     data_immediate_retirement_interest_rate_meta = defaultdict(list)
     retirement_age = initial_age
+    integrate_happiness = happiness_curves.IntegratedHappiness(working_happiness, free_happiness, maximum_death_age + 1, discount_rates=discount_rate, initial_age=initial_age)
     for interest_rate in interest_rates:
         end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
                                                                 initial_money = initial_money,
@@ -210,6 +148,8 @@ if __name__ == '__main__':
                                                                 end_if_breakeven_with_inflation = False,
                                                                 end_at_age = maximum_death_age + 1)
                                                                 # end_at_age = 10000)
+        if instrumentation.enabled:
+            instrumentation.count_simulation(end_condition, run_data)
 
         # log data
         # print(f'\tinterest_rate {interest_rate} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
@@ -218,14 +158,20 @@ if __name__ == '__main__':
         data_immediate_retirement_interest_rate_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
         data_immediate_retirement_interest_rate_meta['death_age'].append(run_data['age'][-1])
 
-        if working_happiness >= free_happiness:
-            data_immediate_retirement_interest_rate_meta['integrated_happiness'].append(working_happiness*run_data['age'][-1])
+        if integrate_happiness.never_retiring:
+            data_immediate_retirement_interest_rate_meta['integrated_happiness'].append(integrate_happiness(run_data['age'][-1], run_data['age'][-1]))
         # elif run_data['broke_even_with_inflation'][-1]:
         #     data_immediate_retirement_interest_rate_meta['integrated_happiness'].append(free_happiness)
         else:
-            data_immediate_retirement_interest_rate_meta['integrated_happiness'].append(float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness)
+            data_immediate_retirement_interest_rate_meta['integrated_happiness'].append(integrate_happiness(retirement_age, retirement_age + run_data['num_years_after_retirement'][-1]))
 
-    # simulation 2 - compute optimal retirement age, maximizing integrated happiness
+    return data_immediate_retirement_interest_rate_meta
+
+
+def simulate_optimal_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                                working_happiness, free_happiness, interest_rates, discount_rate=1.0):
+    # compute optimal retirement age, maximizing integrated happiness, for each interest rate
+    integrate_happiness = happiness_curves.IntegratedHappiness(working_happiness, free_happiness, maximum_death_age + 1, discount_rates=discount_rate, initial_age=initial_age)
     data_optimal_retirement_interest_rate_meta = defaultdict(list)
     for interest_rate in interest_rates:
         data_run_meta = defaultdict(list)
@@ -244,29 +190,32 @@ if __name__ == '__main__':
                                                                     end_if_breakeven_with_inflation = False,
                                                                     end_at_age = maximum_death_age + 1)
                                                                     # end_at_age = 10000)
+            if instrumentation.enabled:
+                instrumentation.count_simulation(end_condition, run_data)
 
             # log data
             data_run_meta['retirement_age'].append(retirement_age)
             data_run_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
             data_run_meta['death_age'].append(run_data['age'][-1])
 
-            if working_happiness >= free_happiness:
-                data_run_meta['integrated_happiness'].append(working_happiness*run_data['age'][-1])
+            if integrate_happiness.never_retiring:
+                data_run_meta['integrated_happiness'].append(integrate_happiness(run_data['age'][-1], run_data['age'][-1]))
             # elif run_data['broke_even_with_inflation'][-1]:
             #     data_run_meta['integrated_happiness'].append(free_happiness)
             else:
-                data_run_meta['integrated_happiness'].append(float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness)
+                data_run_meta['integrated_happiness'].append(integrate_happiness(retirement_age, retirement_age + run_data['num_years_after_retirement'][-1]))
 
         # compute optimal retirement age
-        max_happiness, retirement_age_for_max_happiness = -float('inf'), None
-        broke_even_with_inflation = None
-        death_age = None
-        for i_integrated_happiness, integrated_happiness in enumerate(data_run_meta['integrated_happiness']):
-            if integrated_happiness >= max_happiness or math.isclose(integrated_happiness, max_happiness):  # prefer latest retirement to maximize secondary oppurtunities
-                max_happiness = integrated_happiness
-                retirement_age_for_max_happiness = data_run_meta['retirement_age'][i_integrated_happiness]
-                broke_even_with_inflation = data_run_meta['broke_even_with_inflation'][i_integrated_happiness]
-                death_age = data_run_meta['death_age'][i_integrated_happiness]
+        with instrumentation.phase('reduce'):
+            max_happiness, retirement_age_for_max_happiness = -float('inf'), None
+            broke_even_with_inflation = None
+            death_age = None
+            for i_integrated_happiness, integrated_happiness in enumerate(data_run_meta['integrated_happiness']):
+                if integrated_happiness >= max_happiness or math.isclose(integrated_happiness, max_happiness):  # prefer latest retirement to maximize secondary oppurtunities
+                    max_happiness = integrated_happiness
+                    retirement_age_for_max_happiness = data_run_meta['retirement_age'][i_integrated_happiness]
+                    broke_even_with_inflation = data_run_meta['broke_even_with_inflation'][i_integrated_happiness]
+                    death_age = data_run_meta['death_age'][i_integrated_happiness]
 
         data_optimal_retirement_interest_rate_meta['interest_rate'].append(interest_rate)
         data_optimal_retirement_interest_rate_meta['max_happiness'].append(max_happiness)
@@ -274,7 +223,14 @@ if __name__ == '__main__':
         data_optimal_retirement_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
         data_optimal_retirement_interest_rate_meta['death_age'].append(death_age)
 
-    # simulation 3 - immediate retirement, then go back to work once we run out of money computing optimal retirement age from there
+    return data_optimal_retirement_interest_rate_meta
+
+
+def simulate_double_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                               working_happiness, free_happiness, interest_rates, discount_rate=1.0):
+    # immediate retirement, then go back to work once we run out of money computing optimal retirement age from there, for each interest rate
+    # interest rates where immediate retirement already makes it to maximum_death_age are skipped
+    integrate_happiness = happiness_curves.IntegratedHappiness(working_happiness, free_happiness, maximum_death_age + 1, discount_rates=discount_rate, initial_age=initial_age)
     initial_retirement_age = initial_age
     data_double_retirement_interest_rate_meta = defaultdict(list)
     for interest_rate in interest_rates:
@@ -292,6 +248,8 @@ if __name__ == '__main__':
                                                                     end_if_breakeven_with_inflation = False,
                                                                     end_at_age = maximum_death_age + 1)
                                                                     # end_at_age = 10000)
+        if instrumentation.enabled:
+            instrumentation.count_simulation(end_condition_1, run_data_1)
 
 
         # now that we've run out of money, go back to work and compute new optimal retirement age
@@ -315,30 +273,33 @@ if __name__ == '__main__':
                                                                         end_if_breakeven_with_inflation = False,
                                                                         end_at_age = maximum_death_age + 1)
                                                                         # end_at_age = 10000)
+            if instrumentation.enabled:
+                instrumentation.count_simulation(end_condition_2, run_data_2)
 
             # log data
             data_run_meta['retirement_age'].append(retirement_age)
             data_run_meta['broke_even_with_inflation'].append(run_data_2['broke_even_with_inflation'][-1])
             data_run_meta['death_age'].append(run_data_2['age'][-1])
 
-            if working_happiness >= free_happiness:
-                data_run_meta['integrated_happiness'].append(working_happiness*run_data_2['age'][-1])
+            if integrate_happiness.never_retiring:
+                data_run_meta['integrated_happiness'].append(integrate_happiness(run_data_2['age'][-1], run_data_2['age'][-1]))
             # elif run_data_2['broke_even_with_inflation'][-1]:
             #     data_run_meta['integrated_happiness'].append(free_happiness)
             else:
-                data_run_meta['integrated_happiness'].append(float(initial_retirement_age) * working_happiness + run_data_1['num_years_after_retirement'][-1]*free_happiness +
-                                                             float(retirement_age - run_data_1['age'][-1]) * working_happiness + run_data_2['num_years_after_retirement'][-1]*free_happiness)
+                data_run_meta['integrated_happiness'].append(integrate_happiness(initial_retirement_age, initial_retirement_age + run_data_1['num_years_after_retirement'][-1]) +
+                                                             integrate_happiness.working(run_data_1['age'][-1], retirement_age) + integrate_happiness.free(retirement_age, retirement_age + run_data_2['num_years_after_retirement'][-1]))
 
         # compute optimal retirement age
-        max_happiness, retirement_age_for_max_happiness = -float('inf'), None
-        broke_even_with_inflation = None
-        death_age = None
-        for i_integrated_happiness, integrated_happiness in enumerate(data_run_meta['integrated_happiness']):
-            if integrated_happiness >= max_happiness or math.isclose(integrated_happiness, max_happiness):  # prefer latest retirement to maximize secondary oppurtunities
-                max_happiness = integrated_happiness
-                retirement_age_for_max_happiness = data_run_meta['retirement_age'][i_integrated_happiness]
-                broke_even_with_inflation = data_run_meta['broke_even_with_inflation'][i_integrated_happiness]
-                death_age = data_run_meta['death_age'][i_integrated_happiness]
+        with instrumentation.phase('reduce'):
+            max_happiness, retirement_age_for_max_happiness = -float('inf'), None
+            broke_even_with_inflation = None
+            death_age = None
+            for i_integrated_happiness, integrated_happiness in enumerate(data_run_meta['integrated_happiness']):
+                if integrated_happiness >= max_happiness or math.isclose(integrated_happiness, max_happiness):  # prefer latest retirement to maximize secondary oppurtunities
+                    max_happiness = integrated_happiness
+                    retirement_age_for_max_happiness = data_run_meta['retirement_age'][i_integrated_happiness]
+                    broke_even_with_inflation = data_run_meta['broke_even_with_inflation'][i_integrated_happiness]
+                    death_age = data_run_meta['death_age'][i_integrated_happiness]
 
         data_double_retirement_interest_rate_meta['interest_rate'].append(interest_rate)
         data_double_retirement_interest_rate_meta['max_happiness'].append(max_happiness)
@@ -346,78 +307,86 @@ if __name__ == '__main__':
         data_double_retirement_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
         data_double_retirement_interest_rate_meta['death_age'].append(death_age)
 
-    # simulation 4 - late retirement, compute satatic retirement age which is nearest optimal happiness across the whole graph range via least squares regression.
-    #                enable picking a new optimal solution if run out of money from retiring early
-    data_late_retirement_initial_retirement_age_meta = defaultdict(list)
-
-    for initial_retirement_age in range(initial_age, maximum_death_age + 1):
-        data_late_retirement_interest_rate_meta = defaultdict(list)
-        for interest_rate in interest_rates:
-            # retire immediately and simulate until run out of money or maximum_death_age
-            end_condition_1, run_data_1  = simulate_until_end_condition(initial_age = initial_age,
-                                                                        initial_money = initial_money,
-                                                                        annual_cost_of_living = annual_cost_of_living,
-                                                                        annual_gross_earn_rate = annual_gross_earn_rate,
-                                                                        interest_rate = interest_rate,
-                                                                        inflation_rate = inflation_rate,
-                                                                        retirement_age = initial_retirement_age,
-                                                                        end_num_years_after_retirement = None,
-                                                                        end_after_num_years_sim_time = None, 
-                                                                        end_if_out_of_money = True,
-                                                                        end_if_breakeven_with_inflation = False,
-                                                                        end_at_age = maximum_death_age + 1)
-                                                                        # end_at_age = 10000)
+    return data_double_retirement_interest_rate_meta
 
-            data_late_retirement_interest_rate_meta['interest_rate'].append(interest_rate)
-            data_late_retirement_interest_rate_meta['initial_retirement_age'].append(initial_retirement_age)
-            data_late_retirement_interest_rate_meta['initial_retirement_end'].append(run_data_1['age'][-1])
-
-            # if we made it to maximum_death_age, then log that as the end state of the simulation
-            # Otherwise, now that we've run out of money, go back to work and compute new optimal retirement age
-            if end_condition_1 == 'age':
-                data_late_retirement_interest_rate_meta['2nd_retirement_age'].append(None)
-                data_late_retirement_interest_rate_meta['broke_even_with_inflation'].append(run_data_1['broke_even_with_inflation'][-1])
-                data_late_retirement_interest_rate_meta['death_age'].append(run_data_1['age'][-1])
-
-                if working_happiness >= free_happiness:
-                    data_late_retirement_interest_rate_meta['integrated_happiness'].append(working_happiness*run_data_1['age'][-1])
-                # elif run_data_1['broke_even_with_inflation'][-1]:
-                #     data_late_retirement_interest_rate_meta['integrated_happiness'].append(free_happiness)
-                else:
-                    data_late_retirement_interest_rate_meta['integrated_happiness'].append(float(initial_retirement_age) * working_happiness + run_data_1['num_years_after_retirement'][-1]*free_happiness)
 
+def simulate_late_retirement(initial_retirement_age, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                             working_happiness, free_happiness, interest_rates, discount_rate=1.0):
+    # retire at initial_retirement_age and simulate until run out of money or maximum_death_age, for each interest rate
+    # if we run out of money, go back to work and pick the 2nd retirement age which maximizes integrated happiness
+    integrate_happiness = happiness_curves.IntegratedHappiness(working_happiness, free_happiness, maximum_death_age + 1, discount_rates=discount_rate, initial_age=initial_age)
+    data_late_retirement_interest_rate_meta = defaultdict(list)
+    for interest_rate in interest_rates:
+        # retire immediately and simulate until run out of money or maximum_death_age
+        end_condition_1, run_data_1  = simulate_until_end_condition(initial_age = initial_age,
+                                                                    initial_money = initial_money,
+                                                                    annual_cost_of_living = annual_cost_of_living,
+                                                                    annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                    interest_rate = interest_rate,
+                                                                    inflation_rate = inflation_rate,
+                                                                    retirement_age = initial_retirement_age,
+                                                                    end_num_years_after_retirement = None,
+                                                                    end_after_num_years_sim_time = None, 
+                                                                    end_if_out_of_money = True,
+                                                                    end_if_breakeven_with_inflation = False,
+                                                                    end_at_age = maximum_death_age + 1)
+                                                                    # end_at_age = 10000)
+        if instrumentation.enabled:
+            instrumentation.count_simulation(end_condition_1, run_data_1)
+
+        data_late_retirement_interest_rate_meta['interest_rate'].append(interest_rate)
+        data_late_retirement_interest_rate_meta['initial_retirement_age'].append(initial_retirement_age)
+        data_late_retirement_interest_rate_meta['initial_retirement_end'].append(run_data_1['age'][-1])
+
+        # if we made it to maximum_death_age, then log that as the end state of the simulation
+        # Otherwise, now that we've run out of money, go back to work and compute new optimal retirement age
+        if end_condition_1 == 'age':
+            data_late_retirement_interest_rate_meta['2nd_retirement_age'].append(None)
+            data_late_retirement_interest_rate_meta['broke_even_with_inflation'].append(run_data_1['broke_even_with_inflation'][-1])
+            data_late_retirement_interest_rate_meta['death_age'].append(run_data_1['age'][-1])
+
+            if integrate_happiness.never_retiring:
+                data_late_retirement_interest_rate_meta['integrated_happiness'].append(integrate_happiness(run_data_1['age'][-1], run_data_1['age'][-1]))
+            # elif run_data_1['broke_even_with_inflation'][-1]:
+            #     data_late_retirement_interest_rate_meta['integrated_happiness'].append(free_happiness)
             else:
-                data_run_meta = defaultdict(list)
-                for retirement_age in range(run_data_1['age'][-1], maximum_death_age + 1):
-                    end_condition_2, run_data_2  = simulate_until_end_condition(initial_age = initial_age,
-                                                                                n = run_data_1['n'][-1],
-                                                                                initial_money = run_data_1['x'][-1],
-                                                                                annual_cost_of_living = annual_cost_of_living,
-                                                                                annual_gross_earn_rate = annual_gross_earn_rate,
-                                                                                interest_rate = interest_rate,
-                                                                                inflation_rate = inflation_rate,
-                                                                                retirement_age = retirement_age,
-                                                                                end_num_years_after_retirement = None,
-                                                                                end_after_num_years_sim_time = None, 
-                                                                                end_if_out_of_money = True,
-                                                                                end_if_breakeven_with_inflation = False,
-                                                                                end_at_age = maximum_death_age + 1)
-                                                                                # end_at_age = 10000)
-
-                    # log data
-                    data_run_meta['retirement_age'].append(retirement_age)
-                    data_run_meta['broke_even_with_inflation'].append(run_data_2['broke_even_with_inflation'][-1])
-                    data_run_meta['death_age'].append(run_data_2['age'][-1])
-
-                    if working_happiness >= free_happiness:
-                        data_run_meta['integrated_happiness'].append(working_happiness*run_data_2['age'][-1])
-                    # elif run_data_2['broke_even_with_inflation'][-1]:
-                    #     data_run_meta['integrated_happiness'].append(free_happiness)
-                    else:
-                        data_run_meta['integrated_happiness'].append(float(initial_retirement_age) * working_happiness + run_data_1['num_years_after_retirement'][-1]*free_happiness +
-                                                                     float(retirement_age - run_data_1['age'][-1]) * working_happiness + run_data_2['num_years_after_retirement'][-1]*free_happiness)
-
-                # compute optimal retirement age
+                data_late_retirement_interest_rate_meta['integrated_happiness'].append(integrate_happiness(initial_retirement_age, initial_retirement_age + run_data_1['num_years_after_retirement'][-1]))
+
+        else:
+            data_run_meta = defaultdict(list)
+            for retirement_age in range(run_data_1['age'][-1], maximum_death_age + 1):
+                end_condition_2, run_data_2  = simulate_until_end_condition(initial_age = initial_age,
+                                                                            n = run_data_1['n'][-1],
+                                                                            initial_money = run_data_1['x'][-1],
+                                                                            annual_cost_of_living = annual_cost_of_living,
+                                                                            annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                            interest_rate = interest_rate,
+                                                                            inflation_rate = inflation_rate,
+                                                                            retirement_age = retirement_age,
+                                                                            end_num_years_after_retirement = None,
+                                                                            end_after_num_years_sim_time = None, 
+                                                                            end_if_out_of_money = True,
+                                                                            end_if_breakeven_with_inflation = False,
+                                                                            end_at_age = maximum_death_age + 1)
+                                                                            # end_at_age = 10000)
+                if instrumentation.enabled:
+                    instrumentation.count_simulation(end_condition_2, run_data_2)
+
+                # log data
+                data_run_meta['retirement_age'].append(retirement_age)
+                data_run_meta['broke_even_with_inflation'].append(run_data_2['broke_even_with_inflation'][-1])
+                data_run_meta['death_age'].append(run_data_2['age'][-1])
+
+                if integrate_happiness.never_retiring:
+                    data_run_meta['integrated_happiness'].append(integrate_happiness(run_data_2['age'][-1], run_data_2['age'][-1]))
+                # elif run_data_2['broke_even_with_inflation'][-1]:
+                #     data_run_meta['integrated_happiness'].append(free_happiness)
+                else:
+                    data_run_meta['integrated_happiness'].append(integrate_happiness(initial_retirement_age, initial_retirement_age + run_data_1['num_years_after_retirement'][-1]) +
+                                                                 integrate_happiness.working(run_data_1['age'][-1], retirement_age) + integrate_happiness.free(retirement_age, retirement_age + run_data_2['num_years_after_retirement'][-1]))
+
+            # compute optimal retirement age
+            with instrumentation.phase('reduce'):
                 max_happiness, retirement_age_for_max_happiness = -float('inf'), None
                 broke_even_with_inflation = None
                 death_age = None
@@ -428,31 +397,93 @@ if __name__ == '__main__':
                         broke_even_with_inflation = data_run_meta['broke_even_with_inflation'][i_integrated_happiness]
                         death_age = data_run_meta['death_age'][i_integrated_happiness]
 
-                data_late_retirement_interest_rate_meta['integrated_happiness'].append(max_happiness)
-                data_late_retirement_interest_rate_meta['2nd_retirement_age'].append(retirement_age_for_max_happiness)
-                data_late_retirement_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
-                data_late_retirement_interest_rate_meta['death_age'].append(death_age)
+            data_late_retirement_interest_rate_meta['integrated_happiness'].append(max_happiness)
+            data_late_retirement_interest_rate_meta['2nd_retirement_age'].append(retirement_age_for_max_happiness)
+            data_late_retirement_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
+            data_late_retirement_interest_rate_meta['death_age'].append(death_age)
+
+    return data_late_retirement_interest_rate_meta
+
 
-        data_late_retirement_initial_retirement_age_meta['initial_retirement_age'].append(initial_retirement_age)
-        data_late_retirement_initial_retirement_age_meta['interest_rate_meta'].append(data_late_retirement_interest_rate_meta)
+def reduce_late_retirement_least_squares(state, initial_retirement_age, data_late_retirement_interest_rate_meta, optimal_max_happiness):
+    # streaming least squares reduction over initial retirement ages
+    # only the running least squares solution is retained, alongside the per-age distance vector
+    state['initial_retirement_age_meta']['initial_retirement_age'].append(initial_retirement_age)
 
-        # compute summed squared distance to optimal
-        summed_squared_distance_to_optimal = 0.0
-        for i, _ in enumerate(data_late_retirement_interest_rate_meta['interest_rate']):
-            assert math.isclose(data_late_retirement_interest_rate_meta['interest_rate'][i], data_optimal_retirement_interest_rate_meta['interest_rate'][i])  # verify parse order matches
-            summed_squared_distance_to_optimal += math.pow(data_optimal_retirement_interest_rate_meta['max_happiness'][i] - data_late_retirement_interest_rate_meta['integrated_happiness'][i], 2)
-        data_late_retirement_initial_retirement_age_meta['summed_squared_distance_to_optimal'].append(summed_squared_distance_to_optimal)
+    # compute summed squared distance to optimal
+    with instrumentation.phase('reduce'):
+        summed_squared_distance_to_optimal = float(calc_summed_squared_distance_to_optimal(data_late_retirement_interest_rate_meta['integrated_happiness'], optimal_max_happiness))
+    state['initial_retirement_age_meta']['summed_squared_distance_to_optimal'].append(summed_squared_distance_to_optimal)
 
-    # find the least squares solution
-    data_optimal_late_retirement_interest_rate_meta = None
-    optimal_late_retirement_age = None
-    least_squared_distance_to_optimal = float('inf')
-    for i, squared_distance_to_optimal in enumerate(data_late_retirement_initial_retirement_age_meta['summed_squared_distance_to_optimal']):
-        if squared_distance_to_optimal <= least_squared_distance_to_optimal or math.isclose(squared_distance_to_optimal, least_squared_distance_to_optimal):  # prefer latest retirement to maximize secondary oppurtunities
-            least_squared_distance_to_optimal = squared_distance_to_optimal
-            data_optimal_late_retirement_interest_rate_meta = data_late_retirement_initial_retirement_age_meta['interest_rate_meta'][i]
-            optimal_late_retirement_age = data_late_retirement_initial_retirement_age_meta['initial_retirement_age'][i]
+    # update the least squares solution, dropping this candidate's data unless it is the new best
+    if summed_squared_distance_to_optimal <= state['least_squared_distance_to_optimal'] or math.isclose(summed_squared_distance_to_optimal, state['least_squared_distance_to_optimal']):  # prefer latest retirement to maximize secondary oppurtunities
+        state['least_squared_distance_to_optimal'] = summed_squared_distance_to_optimal
+        state['data_optimal_late_retirement_interest_rate_meta'] = data_late_retirement_interest_rate_meta
+        state['optimal_late_retirement_age'] = initial_retirement_age
+
+    return state
+
+
+def plot_retirement_strategies(data_immediate_retirement_interest_rate_meta, data_optimal_retirement_interest_rate_meta, data_double_retirement_interest_rate_meta,
+                                data_optimal_late_retirement_interest_rate_meta, optimal_late_retirement_age,
+                                data_double_retirement_difference_meta, data_late_retirement_difference_meta,
+                                initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age, working_happiness, free_happiness):
+    # plotting imports are deferred to here, so importing this module for its engine (e.g. from a batch job) doesn't load matplotlib
+    import matplotlib.patches
+    from matplotlib import pyplot as plt
+
+    # integrated happiness and free life of each retirement strategy, as a function of interest rate
+    # drawn decimated, keeping every step in age, the difference datasets too, which were computed from the full datasets
+    data_immediate_retirement_interest_rate_meta = decimation.decimate_meta(data_immediate_retirement_interest_rate_meta)
+    data_optimal_retirement_interest_rate_meta = decimation.decimate_meta(data_optimal_retirement_interest_rate_meta)
+    data_double_retirement_interest_rate_meta = decimation.decimate_meta(data_double_retirement_interest_rate_meta)
+    data_optimal_late_retirement_interest_rate_meta = decimation.decimate_meta(data_optimal_late_retirement_interest_rate_meta)
+
+    # plot setup
+    descriptor = (f'Integrated happiness over lifetime and death age as a function of savings interest rate and retirement age. (evaluated at discrete 1-year intervals)\n' +
+                  f'Comparing retirement strategies: immediate retirement, optimal retirement age (maximizes integrated happiness), immediate retirement + run out of money + work again + optimal 2nd retirement (maximizes integrated happiness), and static retirement at age where integrated happiness least squares fits to optimal.\n' +
+                  f'initial_age = {initial_age}, maximum_death_age = {maximum_death_age+1}, inflation_rate = {(inflation_rate-1)*100:.3}% (annual), initial_money = {initial_money}, annual_gross_earn_rate = {annual_gross_earn_rate}, annual_cost_of_living = {annual_cost_of_living}\n' +
+                  f'working_happiness = {working_happiness}, free_happiness = {free_happiness} (integrated value for one year, zero centered)')
+
+    # assuming immediate retirement
+    # maximizing integrated happiness over lifetime
+
+    plt.figure()
+    # plt.gca().xaxis.set_major_formatter(matplotlib.ticker.PercentFormatter(xmax=1.0))
+    # 'working_happiness (scale out of 10)'
+    plt.xlabel('savings annual interest or depreciation')
+    plt.ylabel('age')
+    plt.title(descriptor)
+    plt.minorticks_on()
+    plt.grid(b=True, which='major', color='black', linestyle='-')
+    plt.grid(b=True, which='minor', color='red', linestyle='--')
+    plt.gca().xaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda val, pos: f'{(val-1)*100:.3}%'))
+    plt.xlim(0.7, 1.3)
+    plt.ylim(initial_age - 1, maximum_death_age + 4)
+
+    # colors = ['red', 'green', 'blue', 'orange', 'yellow', 'black', 'brown', 'gray', 'cyan', 'magenta']
+    colors = ['red', 'green', 'blue', 'orange', 'black', 'brown', 'gray', 'cyan', 'magenta']
+
+    # # reference indicating enopugh capital accrued to surive to maximum_death_age
+    region_patches = []
+    # previous_y = None
+    # for i_region, difference in enumerate(np.linspace(0, 80, 5)):
+    #     x, y = [initial_age, maximum_death_age], [maximum_death_age - initial_age - difference, 0 - difference]
+        
+    #     if previous_y is None:
+    #         upper_bound = 100
+    #     else:
+    #         upper_bound = previous_y
+    #     previous_y = y
+        
+    #     plt.fill_between(x, y, upper_bound, facecolor=colors[(i_region)%len(colors)], alpha=0.1)
+    #     region_patch = matplotlib.patches.Patch(color=colors[(i_region)%len(colors)], label=f'enough savings to survive until age {int(maximum_death_age - difference)}')
+    #     region_patches.append(region_patch)
 
+    # # reference slopes indicating ratio of years free to years working
+    # for i_plot, slope in enumerate([2/5.0, 1.0, 1.2, 5/2.0]):
+    #     # slope is years free / years worked
+    #     plt.plot([initial_age, maximum_death_age], [8, 8 + slope * (maximum_death_age - initial_age)], c=colors[(i_plot+1)%len(colors)], marker=None, linestyle='--', label=f'reference slope {slope:.3}')
 
     # plot data
     plt.plot([inflation_rate, inflation_rate], plt.gca().get_ybound(), c='magenta', linestyle='--', linewidth=3, label=f'inflation_rate')
@@ -540,20 +571,10 @@ if __name__ == '__main__':
     plt.plot(data_double_retirement_interest_rate_meta['interest_rate'], data_double_retirement_interest_rate_meta['max_happiness'], c='green', marker=None, label=f'integrated happiness over lifetime, 2nd retirement')
     plt.plot(data_optimal_late_retirement_interest_rate_meta['interest_rate'], data_optimal_late_retirement_interest_rate_meta['integrated_happiness'], c='black', marker=None, label=f'integrated happiness over lifetime, retirement at age {optimal_late_retirement_age}')
 
-    # compute difference datasets
-    difference_data = defaultdict(list)
-    for i, _ in enumerate(data_double_retirement_interest_rate_meta['interest_rate']):  # data_double_retirement_interest_rate_meta is shorter, but matches parse order until it ends
-        assert math.isclose(data_double_retirement_interest_rate_meta['interest_rate'][i], data_optimal_retirement_interest_rate_meta['interest_rate'][i])  # verify parse order matches
-        if not math.isclose(data_double_retirement_interest_rate_meta['max_happiness'][i], data_optimal_retirement_interest_rate_meta['max_happiness'][i]):
-            difference_data['interest_rate'].append(data_double_retirement_interest_rate_meta['interest_rate'][i])
-            difference_data['difference'].append(data_optimal_retirement_interest_rate_meta['max_happiness'][i] - data_double_retirement_interest_rate_meta['max_happiness'][i])
+    difference_data = decimation.decimate_meta(data_double_retirement_difference_meta)
     plt.plot(difference_data['interest_rate'], difference_data['difference'], c='orange', marker=None, label=f'difference between optimal and 2nd retirement integrated happinesses over lifetime')
 
-    difference_data = defaultdict(list)
-    for i, _ in enumerate(data_optimal_late_retirement_interest_rate_meta['interest_rate']):
-        assert math.isclose(data_optimal_late_retirement_interest_rate_meta['interest_rate'][i], data_optimal_retirement_interest_rate_meta['interest_rate'][i])  # verify parse order matches
-        difference_data['interest_rate'].append(data_optimal_late_retirement_interest_rate_meta['interest_rate'][i])
-        difference_data['difference'].append(data_optimal_retirement_interest_rate_meta['max_happiness'][i] - data_optimal_late_retirement_interest_rate_meta['integrated_happiness'][i])
+    difference_data = decimation.decimate_meta(data_late_retirement_difference_meta)
     plt.plot(difference_data['interest_rate'], difference_data['difference'], c='yellow', marker=None, label=f'difference between optimal and retirement at {optimal_late_retirement_age} integrated happinesses over lifetime')
 
     plt.plot(plt.gca().get_xbound(), [0.0, 0.0], c='cyan', linestyle='--', linewidth=3, label=f'minimum happiness to count as "worth it"')
@@ -564,7 +585,11 @@ if __name__ == '__main__':
     # ', at interest_rate = {(interest_rate-1)*100:.3}%'
     # colors[i_plot%len(colors)]
 
-    # plot least squares distance vs retirement age to sanity check
+
+def plot_least_squares_distance(data_late_retirement_initial_retirement_age_meta):
+    from matplotlib import pyplot as plt  # deferred, like in plot_retirement_strategies
+
+    # least squares distance vs retirement age to sanity check
     plt.figure()
     plt.title('least squares distance to optimal integrated happiness over the domain of interest rates between -30% and +30%')
     plt.xlabel('initial_retirement_age')
@@ -572,4 +597,152 @@ if __name__ == '__main__':
     plt.plot(data_late_retirement_initial_retirement_age_meta['initial_retirement_age'], data_late_retirement_initial_retirement_age_meta['summed_squared_distance_to_optimal'], c='blue', marker=None)
 
 
-    plt.show()
+if __name__ == '__main__':
+    instrumentation_json_path = instrumentation.enable_from_environment()
+
+    # params
+    initial_age = 29
+    # retirement_age = initial_age
+    # initial_money = 435000
+    initial_money = 300000
+    annual_cost_of_living = 38000  # at time of initial design, and sustained *times inflation rates*
+    annual_gross_earn_rate = 69000 # while working, and sustained *times inflation rates*
+    # annual_gross_earn_rate = 38000 # while working, and sustained *times inflation rates*
+    # annual_gross_earn_rate = 100000 # while working, and sustained *times inflation rates*
+    inflation_rate = 1.0323
+    # inflation_rate = 1.0
+    maximum_death_age = 124
+    # interest_rate = 1.02  # earned on savings
+    working_happiness = -0.7971938776 # on a 0-10 scale, minus 7 to center scale at 0
+    free_happiness = 0.6653911565
+    discount_rate = 1.0  # of happiness, per year after initial_age, e.g. 1.03 values a happy year 3% less than the year before it
+
+    # siumulation setup
+    # interest_rates = [1.035]
+    # interest_rates = np.linspace(1, 1.13, 14)
+    # interest_rates = np.geomspace(1, 1.13, 15)
+    # interest_rates = list(interest_rates) + [inflation_rate, 1.046]
+    # interest_rates = list(np.geomspace(1, inflation_rate, 4, endpoint=False)) + list(np.geomspace(inflation_rate, 1.045, 6, endpoint=False)) + list(np.geomspace(1.045, 1.13, 4))
+    # interest_rates = [1.04 - x for x in np.geomspace(1, 1.04, 11)]
+    # interest_rates = [1.04-(x-1)*10/9.0*0.004 for x in np.geomspace(1,10,20)]
+    # interest_rates = [1.023]
+    interest_rates = list(np.linspace(0.7, 1.30, 3000))
+    interest_rates = list(sorted(interest_rates))
+
+    # working_happinesses = list(np.linspace(0.0, 10.0, 100))
+    # working_happinesses = list(reversed(sorted(working_happinesses)))
+
+    # simulation 1 - immediate retirement
+    with instrumentation.phase('simulate'):
+        data_immediate_retirement_interest_rate_meta = simulation_cache.call(simulate_immediate_retirement,
+                                                                             initial_age = initial_age,
+                                                                             initial_money = initial_money,
+                                                                             annual_cost_of_living = annual_cost_of_living,
+                                                                             annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                             inflation_rate = inflation_rate,
+                                                                             maximum_death_age = maximum_death_age,
+                                                                             working_happiness = working_happiness,
+                                                                             free_happiness = free_happiness,
+                                                                             interest_rates = interest_rates,
+                                                                             discount_rate = discount_rate)
+
+    # simulation 2 - compute optimal retirement age, maximizing integrated happiness
+    with instrumentation.phase('simulate'):
+        data_optimal_retirement_interest_rate_meta = simulation_cache.call(simulate_optimal_retirement,
+                                                                           initial_age = initial_age,
+                                                                           initial_money = initial_money,
+                                                                           annual_cost_of_living = annual_cost_of_living,
+                                                                           annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                           inflation_rate = inflation_rate,
+                                                                           maximum_death_age = maximum_death_age,
+                                                                           working_happiness = working_happiness,
+                                                                           free_happiness = free_happiness,
+                                                                           interest_rates = interest_rates,
+                                                                           discount_rate = discount_rate)
+
+    # simulation 3 - immediate retirement, then go back to work once we run out of money computing optimal retirement age from there
+    with instrumentation.phase('simulate'):
+        data_double_retirement_interest_rate_meta = simulation_cache.call(simulate_double_retirement,
+                                                                          initial_age = initial_age,
+                                                                          initial_money = initial_money,
+                                                                          annual_cost_of_living = annual_cost_of_living,
+                                                                          annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                          inflation_rate = inflation_rate,
+                                                                          maximum_death_age = maximum_death_age,
+                                                                          working_happiness = working_happiness,
+                                                                          free_happiness = free_happiness,
+                                                                          interest_rates = interest_rates,
+                                                                          discount_rate = discount_rate)
+
+    # simulation 4 - late retirement, compute satatic retirement age which is nearest optimal happiness across the whole graph range via least squares regression.
+    #                enable picking a new optimal solution if run out of money from retiring early
+    #                checkpointed per initial retirement age, rerunning after a crash or Ctrl-C resumes from the first incomplete age
+
+    # every sweep iterates the same interest_rates grid, so alignment is verified once here rather than per element
+    assert data_optimal_retirement_interest_rate_meta['interest_rate'] == interest_rates
+    optimal_max_happiness = np.array(data_optimal_retirement_interest_rate_meta['max_happiness'])
+
+    with instrumentation.phase('simulate'):
+        late_retirement_state = run_sweep(functools.partial(simulate_late_retirement,
+                                                            initial_age = initial_age,
+                                                            initial_money = initial_money,
+                                                            annual_cost_of_living = annual_cost_of_living,
+                                                            annual_gross_earn_rate = annual_gross_earn_rate,
+                                                            inflation_rate = inflation_rate,
+                                                            maximum_death_age = maximum_death_age,
+                                                            working_happiness = working_happiness,
+                                                            free_happiness = free_happiness,
+                                                            interest_rates = interest_rates,
+                                                            discount_rate = discount_rate),
+                                          range(initial_age, maximum_death_age + 1),
+                                          reduce_chunk = functools.partial(reduce_late_retirement_least_squares, optimal_max_happiness = optimal_max_happiness),
+                                          state = {'initial_retirement_age_meta': defaultdict(list),
+                                                   'data_optimal_late_retirement_interest_rate_meta': None,
+                                                   'optimal_late_retirement_age': None,
+                                                   'least_squared_distance_to_optimal': float('inf')},
+                                          checkpoint_path = os.path.splitext(os.path.abspath(__file__))[0] + '.late_retirement.checkpoint',
+                                          description = 'late retirement least squares',
+                                          scenarios_per_chunk = len(interest_rates))
+    data_late_retirement_initial_retirement_age_meta = late_retirement_state['initial_retirement_age_meta']
+    data_optimal_late_retirement_interest_rate_meta = late_retirement_state['data_optimal_late_retirement_interest_rate_meta']
+    optimal_late_retirement_age = late_retirement_state['optimal_late_retirement_age']
+
+    # compute difference datasets, here rather than in the plotting, which runs in a worker process when headless, so the phase is instrumented
+    with instrumentation.phase('difference_datasets'):
+        data_double_retirement_difference_meta = defaultdict(list)
+        for i, _ in enumerate(data_double_retirement_interest_rate_meta['interest_rate']):  # data_double_retirement_interest_rate_meta is shorter, but matches parse order until it ends
+            assert math.isclose(data_double_retirement_interest_rate_meta['interest_rate'][i], data_optimal_retirement_interest_rate_meta['interest_rate'][i])  # verify parse order matches
+            if not math.isclose(data_double_retirement_interest_rate_meta['max_happiness'][i], data_optimal_retirement_interest_rate_meta['max_happiness'][i]):
+                data_double_retirement_difference_meta['interest_rate'].append(data_double_retirement_interest_rate_meta['interest_rate'][i])
+                data_double_retirement_difference_meta['difference'].append(data_optimal_retirement_interest_rate_meta['max_happiness'][i] - data_double_retirement_interest_rate_meta['max_happiness'][i])
+
+        data_late_retirement_difference_meta = defaultdict(list)
+        for i, _ in enumerate(data_optimal_late_retirement_interest_rate_meta['interest_rate']):
+            assert math.isclose(data_optimal_late_retirement_interest_rate_meta['interest_rate'][i], data_optimal_retirement_interest_rate_meta['interest_rate'][i])  # verify parse order matches
+            data_late_retirement_difference_meta['interest_rate'].append(data_optimal_late_retirement_interest_rate_meta['interest_rate'][i])
+            data_late_retirement_difference_meta['difference'].append(data_optimal_retirement_interest_rate_meta['max_happiness'][i] - data_optimal_late_retirement_interest_rate_meta['integrated_happiness'][i])
+
+    # plot data, each figure is rendered in its own process when headless
+    with instrumentation.phase('plot'):
+        figure_output.render(__file__, [functools.partial(plot_retirement_strategies,
+                                                          data_immediate_retirement_interest_rate_meta = data_immediate_retirement_interest_rate_meta,
+                                                          data_optimal_retirement_interest_rate_meta = data_optimal_retirement_interest_rate_meta,
+                                                          data_double_retirement_interest_rate_meta = data_double_retirement_interest_rate_meta,
+                                                          data_optimal_late_retirement_interest_rate_meta = data_optimal_late_retirement_interest_rate_meta,
+                                                          optimal_late_retirement_age = optimal_late_retirement_age,
+                                                          data_double_retirement_difference_meta = data_double_retirement_difference_meta,
+                                                          data_late_retirement_difference_meta = data_late_retirement_difference_meta,
+                                                          initial_age = initial_age,
+                                                          initial_money = initial_money,
+                                                          annual_cost_of_living = annual_cost_of_living,
+                                                          annual_gross_earn_rate = annual_gross_earn_rate,
+                                                          inflation_rate = inflation_rate,
+                                                          maximum_death_age = maximum_death_age,
+                                                          working_happiness = working_happiness,
+                                                          free_happiness = free_happiness),
+                                        functools.partial(plot_least_squares_distance, data_late_retirement_initial_retirement_age_meta = data_late_retirement_initial_retirement_age_meta)])
+
+    if instrumentation_json_path is not None:
+        instrumentation.export_json(instrumentation_json_path)
+
+    figure_output.show(__file__)
@@ -1,10 +1,16 @@
+import os
 import math
+import functools
 import matplotlib
 import pprint
 import numpy as np
+import figure_output  # before pyplot, so headless mode can select the Agg backend
 from matplotlib import pyplot as plt
 from collections import defaultdict
 
+import instrumentation
+from sweep import run_sweep
+
 
 def calc_x_inflation(x_n, n, interest_rate, annual_gross_earn_rate, annual_cost_of_living, inflation_rate, earning=False):
     # x_n+1 = x_n * 1.01 - 70000*1.03^n
@@ -110,6 +116,61 @@ def simulate_until_end_condition(initial_age, initial_money, annual_cost_of_livi
 
     return end_condition, data
 
+
+def simulate_working_happiness_sweep(interest_rate, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, likely_death_age,
+                                    free_happiness, working_happinesses):
+    # optimal retirement age as a function of working happiness, at one interest rate
+    data_working_happiness_meta = defaultdict(list)
+
+    for i_working_happiness, working_happiness in enumerate(working_happinesses):
+        data_run_meta = defaultdict(list)
+
+        for retirement_age in range(initial_age, likely_death_age + 1):
+            end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
+                                                                    initial_money = initial_money,
+                                                                    annual_cost_of_living = annual_cost_of_living,
+                                                                    annual_gross_earn_rate = annual_gross_earn_rate,
+                                                                    interest_rate = interest_rate,
+                                                                    inflation_rate = inflation_rate,
+                                                                    retirement_age = retirement_age,
+                                                                    end_num_years_after_retirement = None,
+                                                                    end_after_num_years_sim_time = None, 
+                                                                    end_if_out_of_money = True,
+                                                                    end_if_breakeven_with_inflation = False,
+                                                                    end_at_age = likely_death_age + 1)
+                                                                    # end_at_age = 10000)
+            if instrumentation.enabled:
+                instrumentation.count_simulation(end_condition, run_data)
+
+            # log data
+            # print(f'\tretirement_age {retirement_age} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
+            data_run_meta['retirement_age'].append(retirement_age)
+            data_run_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
+            # data_run_meta['num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1])
+            # data_run_meta['ratio_num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1]/float(retirement_age))
+
+            if working_happiness >= free_happiness:
+                data_run_meta['average_happiness'].append(working_happiness*run_data['age'][-1])
+            # elif run_data['broke_even_with_inflation'][-1]:
+            #     data_run_meta['average_happiness'].append(free_happiness)
+            else:
+                data_run_meta['average_happiness'].append((float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness))
+
+        # compute optimal retirement age
+        with instrumentation.phase('reduce'):
+            max_happpiness, retirement_age_for_max_happiness = -float('inf'), None
+            for i_average_happiness, average_happiness in enumerate(data_run_meta['average_happiness']):
+                if average_happiness >= max_happpiness or math.isclose(average_happiness, max_happpiness):  # prefer latest retirement to maximize secondary oppurtunities
+                    max_happpiness = average_happiness
+                    retirement_age_for_max_happiness = data_run_meta['retirement_age'][i_average_happiness]
+                
+        data_working_happiness_meta['working_happiness'].append(working_happiness)
+        data_working_happiness_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
+        # plt.plot(data_run_meta['retirement_age'], data_run_meta['average_happiness'], c=colors[i_working_happiness%len(colors)], marker='x', markersize=2, label=f'average happiness, at working_happiness = {working_happiness}')
+
+    return data_working_happiness_meta
+
+
 if __name__ == '__main__':
     # params
     initial_age = 28
@@ -180,56 +241,25 @@ if __name__ == '__main__':
     working_happinesses = list(np.linspace(0.0, 10.0, 100))
     working_happinesses = list(reversed(sorted(working_happinesses)))
 
-    # siumulation
-    for i_plot, interest_rate in enumerate(interest_rates):
-        data_working_happiness_meta = defaultdict(list)
-
-        for i_working_happiness, working_happiness in enumerate(working_happinesses):
-            data_run_meta = defaultdict(list)
-
-            for retirement_age in range(initial_age, likely_death_age + 1):
-                end_condition, run_data  = simulate_until_end_condition(initial_age = initial_age,
-                                                                        initial_money = initial_money,
-                                                                        annual_cost_of_living = annual_cost_of_living,
-                                                                        annual_gross_earn_rate = annual_gross_earn_rate,
-                                                                        interest_rate = interest_rate,
-                                                                        inflation_rate = inflation_rate,
-                                                                        retirement_age = retirement_age,
-                                                                        end_num_years_after_retirement = None,
-                                                                        end_after_num_years_sim_time = None, 
-                                                                        end_if_out_of_money = True,
-                                                                        end_if_breakeven_with_inflation = False,
-                                                                        end_at_age = likely_death_age + 1)
-                                                                        # end_at_age = 10000)
-
-                # log data
-                # print(f'\tretirement_age {retirement_age} -> end_condition {end_condition}, {run_data["num_years_after_retirement"][-1]}')
-                data_run_meta['retirement_age'].append(retirement_age)
-                data_run_meta['broke_even_with_inflation'].append(run_data['broke_even_with_inflation'][-1])
-                # data_run_meta['num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1])
-                # data_run_meta['ratio_num_years_survived_after_retirement'].append(run_data['num_years_after_retirement'][-1]/float(retirement_age))
-
-                if working_happiness >= free_happiness:
-                    data_run_meta['average_happiness'].append(working_happiness*run_data['age'][-1])
-                # elif run_data['broke_even_with_inflation'][-1]:
-                #     data_run_meta['average_happiness'].append(free_happiness)
-                else:
-                    data_run_meta['average_happiness'].append((float(retirement_age)*working_happiness + run_data['num_years_after_retirement'][-1]*free_happiness))
-
-            # compute optimal retirement age
-            max_happpiness, retirement_age_for_max_happiness = -float('inf'), None
-            for i_average_happiness, average_happiness in enumerate(data_run_meta['average_happiness']):
-                if average_happiness >= max_happpiness or math.isclose(average_happiness, max_happpiness):  # prefer latest retirement to maximize secondary oppurtunities
-                    max_happpiness = average_happiness
-                    retirement_age_for_max_happiness = data_run_meta['retirement_age'][i_average_happiness]
-                
-            data_working_happiness_meta['working_happiness'].append(working_happiness)
-            data_working_happiness_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
-            # plt.plot(data_run_meta['retirement_age'], data_run_meta['average_happiness'], c=colors[i_working_happiness%len(colors)], marker='x', markersize=2, label=f'average happiness, at working_happiness = {working_happiness}')
-
+    # siumulation, checkpointed per interest rate, rerunning after a crash or Ctrl-C resumes from the first incomplete interest rate
+    data_interest_rate_meta = run_sweep(functools.partial(simulate_working_happiness_sweep,
+                                                          initial_age = initial_age,
+                                                          initial_money = initial_money,
+                                                          annual_cost_of_living = annual_cost_of_living,
+                                                          annual_gross_earn_rate = annual_gross_earn_rate,
+                                                          inflation_rate = inflation_rate,
+                                                          likely_death_age = likely_death_age,
+                                                          free_happiness = free_happiness,
+                                                          working_happinesses = working_happinesses),
+                                        interest_rates,
+                                        checkpoint_path = os.path.splitext(os.path.abspath(__file__))[0] + '.checkpoint',
+                                        description = 'working happiness sweep',
+                                        scenarios_per_chunk = len(working_happinesses) * (likely_death_age - initial_age + 1))
+
+    for i_plot, (interest_rate, data_working_happiness_meta) in enumerate(zip(interest_rates, data_interest_rate_meta)):
         plt.plot(data_working_happiness_meta['working_happiness'], data_working_happiness_meta['retirement_age_for_max_happiness'], c=colors[i_plot%len(colors)], marker='x', markersize=2, label=f'optimal retirement age, at interest_rate = {(interest_rate-1)*100:.3}%')
 
     # handles, labels = plt.gca().get_legend_handles_labels()
     # plt.legend(loc=1, handles = region_patches + handles)
     plt.legend(loc=1)
-    plt.show()
+    figure_output.show(__file__)
@@ -0,0 +1,516 @@
+'''Runs an analysis's computation from the command line, with its parameters and interest rate grid given as flags instead of edited into a script.
+
+Each subcommand computes the same datasets as the script it's named after, without plotting, and writes them as JSON or CSV.
+Parameters default to the values in that script's __main__. Interest rate grids are given as one or more specs, concatenated in order:
+
+    linspace:START:STOP:NUM     np.linspace(START, STOP, NUM)
+    geomspace:START:STOP:NUM    np.geomspace(START, STOP, NUM)
+    arange:START:STOP:STEP      np.arange(START, STOP, STEP)
+    1.035                       a single rate
+
+    python retirement_cli.py optimal-retirement --interest-rates linspace:0.7:1.3:3000 --engine vectorized --format csv --output optimal.csv
+    python retirement_cli.py survival --interest-rates geomspace:1:1.13:15 1.0323 --annual-gross-earn-rate 100000
+    python retirement_cli.py least-squares --workers 4 --cache-dir .simulation_cache
+
+    goal-ages            age_to_achieve_various_financial_goals_as_a_function_of_savings_interest_rate.py
+    survival             num_years_survive_vs_age_of_retirement_and_interest_rate.py
+    optimal-retirement   immediate and optimal retirement age, from optimal_retirement_strategy_via_integrated_happiness_least_squares_regression.py
+    double-retirement    immediate retirement, then back to work and an optimal 2nd retirement, from the same script
+    least-squares        the static initial retirement age least squares fitting optimal, from the same script
+    discount-sweep       optimal retirement age for every (discount rate, interest rate) pair, discounting happiness after initial_age
+    inflation-sweep      optimal retirement age for every (inflation rate, interest rate) pair
+    monte-carlo          death age distribution and probability of running out of money per retirement age, with random annual returns, see monte_carlo.py
+    expected-retirement  optimal retirement age maximizing expected integrated happiness over a life table's death ages, see mortality.py
+    backtest             death age per retirement age and historical start year, with a CSV of actual annual returns, see historical_backtest.py
+    required-savings     initial_money needed to retire at each age and have savings last until assumed_death_age, see inverse_solvers.py
+    minimum-rate         interest rate needed to retire at each age and have initial_money last until assumed_death_age, see inverse_solvers.py
+    batch                a file of scenarios through the vectorized engine, one result row per scenario, see scenario_batch.py
+
+The vectorized engine (vectorized_analyses.py) computes identical datasets, except for goal-ages, which only has the reference engine.
+--discount-rate discounts the optimal retirement analyses' happiness, e.g. 1.03 values a happy year 3% less than the year before it.'''
+import sys
+import csv
+import json
+import argparse
+import functools
+import importlib
+import numpy as np
+from collections import defaultdict
+
+import instrumentation
+import monte_carlo
+import historical_backtest
+import inverse_solvers
+import mortality
+import scenario_batch
+import simulation_cache
+import vectorized_engine
+import vectorized_analyses
+from sweep import run_sweep
+
+
+least_squares_script = 'optimal_retirement_strategy_via_integrated_happiness_least_squares_regression'
+engine_modules = {'reference': least_squares_script, 'vectorized': 'vectorized_analyses'}
+
+# parameters of each analysis's script's __main__, checked against the scripts by golden_output_equivalence_harness.py
+least_squares_parameters = {'initial_age': 29,
+                            'initial_money': 300000,
+                            'annual_cost_of_living': 38000,
+                            'annual_gross_earn_rate': 69000,
+                            'inflation_rate': 1.0323,
+                            'maximum_death_age': 124,
+                            'working_happiness': -0.7971938776,
+                            'free_happiness': 0.6653911565,
+                            'discount_rate': 1.0,
+                            'interest_rates': ['linspace:0.7:1.30:3000']}
+
+analysis_parameters = {'goal-ages': {'initial_age': 28,
+                                     'initial_money': 300000,
+                                     'annual_cost_of_living': 38000,
+                                     'annual_gross_earn_rate': 75000,
+                                     'inflation_rate': 1.0323,
+                                     'assumed_death_age': 120,
+                                     'interest_rates': ['linspace:1.00001:1.2:1001']},
+                       'survival': {'initial_age': 28,
+                                    'initial_money': 300000,
+                                    'annual_cost_of_living': 38000,
+                                    'annual_gross_earn_rate': 75000,
+                                    'inflation_rate': 1.0323,
+                                    'likely_death_age': 120,
+                                    'interest_rates': ['geomspace:1:1.13:15', '1.0323']},
+                       'optimal-retirement': least_squares_parameters,
+                       'double-retirement': least_squares_parameters,
+                       'least-squares': least_squares_parameters,
+                       'expected-retirement': {**least_squares_parameters, 'life_table': None},
+                       'discount-sweep': {**{name: value for name, value in least_squares_parameters.items() if name != 'discount_rate'},
+                                          'interest_rates': ['linspace:0.7:1.30:300'],
+                                          'discount_rates': ['linspace:1:1.1:11']},
+                       'inflation-sweep': {**{name: value for name, value in least_squares_parameters.items() if name not in ('inflation_rate', 'interest_rates')},
+                                           'interest_rates': ['linspace:0.7:1.30:3000'],
+                                           'inflation_rates': ['linspace:1:1.06:7']},
+                       'monte-carlo': {'initial_age': 29,
+                                       'initial_money': 300000,
+                                       'annual_cost_of_living': 38000,
+                                       'annual_gross_earn_rate': 69000,
+                                       'interest_rate': 1.05,
+                                       'inflation_rate': 1.0323,
+                                       'maximum_death_age': 124,
+                                       'volatility': 0.15,
+                                       'distribution': 'lognormal',
+                                       'num_paths': 100000,
+                                       'seed': 0},
+                       'backtest': {'initial_age': 29,
+                                    'initial_money': 300000,
+                                    'annual_cost_of_living': 38000,
+                                    'annual_gross_earn_rate': 69000,
+                                    'inflation_rate': 1.0323,
+                                    'maximum_death_age': 124,
+                                    'returns': None,
+                                    'wrap': False},
+                       'required-savings': {'initial_age': 28,
+                                            'annual_cost_of_living': 38000,
+                                            'annual_gross_earn_rate': 75000,
+                                            'inflation_rate': 1.0323,
+                                            'assumed_death_age': 120,
+                                            'interest_rates': ['linspace:1.00001:1.2:1001']},
+                       'minimum-rate': {'initial_age': 28,
+                                        'initial_money': 300000,
+                                        'annual_cost_of_living': 38000,
+                                        'annual_gross_earn_rate': 75000,
+                                        'inflation_rate': 1.0323,
+                                        'assumed_death_age': 120}}
+
+# engines each analysis has, the first is the default
+analysis_engines = {'goal-ages': ['reference'], 'expected-retirement': ['vectorized'], 'discount-sweep': ['vectorized'], 'inflation-sweep': ['vectorized'], 'monte-carlo': ['vectorized'], 'backtest': ['vectorized'],
+                    'required-savings': ['vectorized'], 'minimum-rate': ['vectorized']}
+
+
+def parse_number(text):
+    # ints stay ints, like the scripts' parameters, so results and cache keys match theirs
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+parameter_types = {'initial_age': int,
+                   'initial_money': parse_number,
+                   'annual_cost_of_living': parse_number,
+                   'annual_gross_earn_rate': parse_number,
+                   'inflation_rate': float,
+                   'maximum_death_age': int,
+                   'assumed_death_age': int,
+                   'likely_death_age': int,
+                   'working_happiness': float,
+                   'free_happiness': float,
+                   'discount_rate': float,
+                   'interest_rate': float,
+                   'volatility': float,
+                   'distribution': str,
+                   'num_paths': int,
+                   'seed': int,
+                   'returns': str,
+                   'life_table': str}
+
+# grids of a parameter swept alongside the interest rates, given as grid specs like --interest-rates
+grid_parameters = {'discount_rates': 'discount rate', 'inflation_rates': 'inflation rate'}
+
+parameter_choices = {'distribution': monte_carlo.DISTRIBUTIONS}
+
+parameter_help = {'initial_age': 'age at the start of the simulation',
+                  'initial_money': 'savings at initial_age',
+                  'annual_cost_of_living': 'at initial_age, and sustained times inflation',
+                  'annual_gross_earn_rate': 'while working, at initial_age, and sustained times inflation',
+                  'inflation_rate': 'annual, e.g. 1.0323 for 3.23%%',
+                  'maximum_death_age': 'simulations end at this age',
+                  'assumed_death_age': 'savings must last until this age',
+                  'likely_death_age': 'last retirement age simulated',
+                  'working_happiness': 'integrated happiness of a year working',
+                  'free_happiness': 'integrated happiness of a year retired',
+                  'discount_rate': 'of happiness, per year after initial_age, 1 for none',
+                  'interest_rate': 'mean annual return',
+                  'volatility': 'standard deviation of the annual return',
+                  'distribution': 'of the annual returns',
+                  'num_paths': 'number of return paths',
+                  'seed': 'random seed, the same seed gives the same results',
+                  'returns': 'CSV of year, interest_rate and optionally inflation_rate columns, see historical_backtest.py',
+                  'life_table': 'CSV of age and survival or death_probability columns, see mortality.py',
+                  'wrap': 'continue windows running past the last year from the first, so every year is a start year'}
+
+
+def parse_grid(specs):
+    # the concatenation of the grid specs, see the module docstring
+    grid = []
+    for spec in specs:
+        kind, _, arguments = spec.partition(':')
+        try:
+            if not arguments:
+                grid.append(float(spec))
+            elif kind in ('linspace', 'geomspace'):
+                start, stop, num = arguments.split(':')
+                grid.extend(getattr(np, kind)(float(start), float(stop), int(num)))
+            elif kind == 'arange':
+                start, stop, step = arguments.split(':')
+                grid.extend(np.arange(float(start), float(stop), float(step)))
+            else:
+                raise ValueError(f'unknown grid kind {kind!r}')
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(f'bad grid spec {spec!r}: {e}')
+    return grid
+
+
+def import_engine(engine):
+    return importlib.import_module(engine_modules[engine])
+
+
+def run_goal_ages(args, parameters, interest_rates, inputs):
+    goal_ages = importlib.import_module('age_to_achieve_various_financial_goals_as_a_function_of_savings_interest_rate')
+    data_interest_rate_meta = run_sweep(functools.partial(goal_ages.simulate_goal_ages, **parameters),
+                                        interest_rates,
+                                        workers = args.workers,
+                                        description = 'goal ages',
+                                        scenarios_per_chunk = parameters['assumed_death_age'] - parameters['initial_age'] + 1,
+                                        progress = args.progress)
+    zd_interest_rate_meta = list(zip(*data_interest_rate_meta))
+    return {'goal_ages': {'interest_rate': list(interest_rates),
+                          'age_breakeven_with_inflation': list(zd_interest_rate_meta[1]),
+                          'retirement_age_for_survival_to_assumed_death_age': list(zd_interest_rate_meta[2])}}
+
+
+def append_survival(state, interest_rate, data):
+    for retirement_age, num_years_survived_after_retirement in zip(data['retirement_age'], data['num_years_survived_after_retirement']):
+        state['interest_rate'].append(interest_rate)
+        state['retirement_age'].append(retirement_age)
+        state['num_years_survived_after_retirement'].append(num_years_survived_after_retirement)
+    return state
+
+
+def run_survival(args, parameters, interest_rates, inputs):
+    if args.engine == 'vectorized':
+        simulate_survival = import_engine('vectorized').simulate_survival
+    else:
+        simulate_survival = importlib.import_module('num_years_survive_vs_age_of_retirement_and_interest_rate').simulate_survival
+    data_survival_meta = run_sweep(functools.partial(simulate_survival, **parameters),
+                                   interest_rates,
+                                   reduce_chunk = append_survival,
+                                   state = defaultdict(list),
+                                   workers = args.workers,
+                                   description = 'survival',
+                                   scenarios_per_chunk = parameters['likely_death_age'] - parameters['initial_age'] + 1,
+                                   progress = args.progress)
+    return {'survival': data_survival_meta}
+
+
+def run_optimal_retirement(args, parameters, interest_rates, inputs):
+    engine = import_engine(args.engine)
+    return {'immediate_retirement': simulation_cache.call(engine.simulate_immediate_retirement, interest_rates = interest_rates, **parameters),
+            'optimal_retirement': simulation_cache.call(engine.simulate_optimal_retirement, interest_rates = interest_rates, **parameters)}
+
+
+def run_double_retirement(args, parameters, interest_rates, inputs):
+    engine = import_engine(args.engine)
+    return {'double_retirement': simulation_cache.call(engine.simulate_double_retirement, interest_rates = interest_rates, **parameters)}
+
+
+def run_least_squares(args, parameters, interest_rates, inputs):
+    engine = import_engine(args.engine)
+    # the least squares reduction is the reference's, whichever engine simulates
+    reduce_late_retirement_least_squares = importlib.import_module(least_squares_script).reduce_late_retirement_least_squares
+
+    data_optimal_retirement_interest_rate_meta = simulation_cache.call(engine.simulate_optimal_retirement, interest_rates = interest_rates, **parameters)
+    optimal_max_happiness = np.array(data_optimal_retirement_interest_rate_meta['max_happiness'])
+    late_retirement_state = run_sweep(functools.partial(engine.simulate_late_retirement, interest_rates = interest_rates, **parameters),
+                                      range(parameters['initial_age'], parameters['maximum_death_age'] + 1),
+                                      reduce_chunk = functools.partial(reduce_late_retirement_least_squares, optimal_max_happiness = optimal_max_happiness),
+                                      state = {'initial_retirement_age_meta': defaultdict(list),
+                                               'data_optimal_late_retirement_interest_rate_meta': None,
+                                               'optimal_late_retirement_age': None,
+                                               'least_squared_distance_to_optimal': float('inf')},
+                                      workers = args.workers,
+                                      description = 'late retirement least squares',
+                                      scenarios_per_chunk = len(interest_rates),
+                                      progress = args.progress)
+    return {'least_squares_distance': late_retirement_state['initial_retirement_age_meta'],
+            'optimal_late_retirement': late_retirement_state['data_optimal_late_retirement_interest_rate_meta'],
+            'optimal_retirement': data_optimal_retirement_interest_rate_meta}
+
+
+def run_discount_sweep(args, parameters, interest_rates, inputs):
+    return {'discounted_optimal_retirement': simulation_cache.call(vectorized_analyses.simulate_discounted_optimal_retirement, interest_rates = interest_rates, **parameters)}
+
+
+def run_inflation_sweep(args, parameters, interest_rates, inputs):
+    return {'inflation_optimal_retirement': simulation_cache.call(vectorized_analyses.simulate_inflation_optimal_retirement, interest_rates = interest_rates, **parameters)}
+
+
+def run_expected_retirement(args, parameters, interest_rates, inputs):
+    return {'expected_retirement': simulation_cache.call(mortality.simulate_expected_optimal_retirement,
+                                                         interest_rates = interest_rates,
+                                                         life_table_ages = inputs['life_table_ages'],
+                                                         survival = inputs['survival'],
+                                                         **{name: value for name, value in parameters.items() if name != 'life_table'})}
+
+
+def run_monte_carlo(args, parameters, interest_rates, inputs):
+    # each block of paths is cached by the sweep
+    result = monte_carlo.simulate_monte_carlo(workers = args.workers, progress = args.progress, **parameters)
+    death_age_percentiles = monte_carlo.calc_death_age_percentiles(result)
+    return {'retirement_age': {'retirement_age': result['retirement_age'].tolist(),
+                               'probability_out_of_money': result['probability_out_of_money'].tolist(),
+                               'mean_death_age': monte_carlo.calc_mean_death_age(result).tolist(),
+                               **{f'death_age_p{percentile}': death_ages.tolist() for percentile, death_ages in death_age_percentiles.items()}},
+            'death_age_counts': {'death_age': result['death_age'].tolist(),
+                                 **{f'retirement_age_{retirement_age}': counts.tolist() for retirement_age, counts in zip(result['retirement_age'], result['death_age_counts'])}}}
+
+
+def run_backtest(args, parameters, interest_rates, inputs):
+    result = historical_backtest.backtest(years = inputs['years'],
+                                          interest_rates = inputs['interest_rates'],
+                                          inflation_rates = inputs['inflation_rates'],
+                                          **{name: value for name, value in parameters.items() if name != 'returns'})
+    return {'retirement_age': {'retirement_age': result['retirement_age'].tolist(),
+                               'probability_out_of_money': result['probability_out_of_money'].tolist(),
+                               'worst_death_age': result['death_age'].min(axis=0).tolist(),
+                               'median_death_age': np.median(result['death_age'], axis=0).tolist()},
+            'death_age': {'start_year': result['start_year'].tolist(),
+                          **{f'retirement_age_{retirement_age}': death_ages.tolist() for retirement_age, death_ages in zip(result['retirement_age'], result['death_age'].T)}}}
+
+
+def run_required_savings(args, parameters, interest_rates, inputs):
+    retirement_ages = np.arange(parameters['initial_age'], parameters['assumed_death_age'] + 1)
+    required_initial_money = simulation_cache.call(inverse_solvers.calc_required_initial_money,
+                                                   interest_rates = interest_rates,
+                                                   retirement_ages = retirement_ages,
+                                                   death_ages = parameters['assumed_death_age'],
+                                                   **{name: value for name, value in parameters.items() if name != 'assumed_death_age'})
+    return {'required_savings': {'interest_rate': np.repeat(interest_rates, len(retirement_ages)).tolist(),
+                                 'retirement_age': np.tile(retirement_ages, len(interest_rates)).tolist(),
+                                 'required_initial_money': required_initial_money.ravel().tolist()}}
+
+
+def run_minimum_rate(args, parameters, interest_rates, inputs):
+    retirement_ages = np.arange(parameters['initial_age'], parameters['assumed_death_age'] + 1)
+    minimum_interest_rate = simulation_cache.call(inverse_solvers.calc_minimum_interest_rate,
+                                                  retirement_ages = retirement_ages,
+                                                  death_ages = parameters['assumed_death_age'],
+                                                  **{name: value for name, value in parameters.items() if name != 'assumed_death_age'})
+    return {'minimum_rate': {'retirement_age': retirement_ages.tolist(),
+                             'minimum_interest_rate': minimum_interest_rate.tolist()}}
+
+
+def load_inputs(parameters):
+    '''Reads the input files an analysis's parameters name, and checks the parameters are ones it can run with,
+    raising ValueError for the user to correct before anything is computed. Returns the files' contents.'''
+    inputs = {}
+    death_age_name = next((name for name in ('maximum_death_age', 'assumed_death_age', 'likely_death_age') if name in parameters), None)
+    if death_age_name is not None and parameters[death_age_name] < parameters['initial_age']:
+        raise ValueError(f'{death_age_name} {parameters[death_age_name]} is before initial_age {parameters["initial_age"]}')
+    if death_age_name == 'assumed_death_age' and parameters['assumed_death_age'] == parameters['initial_age']:
+        raise ValueError(f'assumed_death_age must be after initial_age {parameters["initial_age"]}')
+    try:
+        if 'life_table' in parameters:
+            inputs['life_table_ages'], inputs['survival'] = mortality.read_life_table(parameters['life_table'])
+            if not inputs['life_table_ages'][0] <= parameters['initial_age'] <= inputs['life_table_ages'][-1]:
+                raise ValueError(f'initial_age {parameters["initial_age"]} outside the life table\'s ages {inputs["life_table_ages"][0]} to {inputs["life_table_ages"][-1]}')
+        if 'returns' in parameters:
+            inputs['years'], inputs['interest_rates'], inputs['inflation_rates'] = historical_backtest.read_annual_returns(parameters['returns'])
+            num_years = parameters['maximum_death_age'] + 1 - parameters['initial_age']
+            if not parameters['wrap'] and len(inputs['years']) < num_years:
+                raise ValueError(f'{len(inputs["years"])} years of returns can\'t cover the {num_years} year horizon, use --wrap')
+    except KeyError as e:
+        raise ValueError(f'missing column {e}')
+    except OSError as e:
+        raise ValueError(str(e))
+    return inputs
+
+
+analyses = {'goal-ages': run_goal_ages,
+            'survival': run_survival,
+            'optimal-retirement': run_optimal_retirement,
+            'double-retirement': run_double_retirement,
+            'least-squares': run_least_squares,
+            'expected-retirement': run_expected_retirement,
+            'discount-sweep': run_discount_sweep,
+            'inflation-sweep': run_inflation_sweep,
+            'monte-carlo': run_monte_carlo,
+            'backtest': run_backtest,
+            'required-savings': run_required_savings,
+            'minimum-rate': run_minimum_rate}
+
+
+def to_builtin(value):
+    # numpy scalars to the python values json and csv write
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def write_json(f, analysis, engine, parameters, interest_rates, tables):
+    json.dump({'analysis': analysis,
+               'engine': engine,
+               'parameters': parameters,
+               'interest_rates': None if interest_rates is None else [to_builtin(interest_rate) for interest_rate in interest_rates],
+               'tables': {table_name: {key: [to_builtin(value) for value in values] for key, values in table.items()} for table_name, table in tables.items()}},
+              f, indent=4)
+    f.write('\n')
+
+
+def write_csv(f, table):
+    writer = csv.writer(f)
+    writer.writerow(list(table))
+    for row in zip(*table.values()):
+        writer.writerow([to_builtin(value) for value in row])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='analysis', required=True)
+    for analysis, defaults in analysis_parameters.items():
+        subparser = subparsers.add_parser(analysis)
+        for name, default in defaults.items():
+            if name == 'interest_rates':
+                subparser.add_argument('--interest-rates', nargs='+', default=default, metavar='SPEC', help=f'interest rate grid specs, default {" ".join(default)}')
+            elif name in grid_parameters:
+                subparser.add_argument('--' + name.replace('_', '-'), nargs='+', default=default, metavar='SPEC',
+                                       help=f'{grid_parameters[name]} grid specs, default {" ".join(default)}')
+            elif isinstance(default, bool):
+                subparser.add_argument('--' + name.replace('_', '-'), action='store_true', help=parameter_help[name])
+            elif default is None:
+                subparser.add_argument('--' + name.replace('_', '-'), type=parameter_types[name], required=True, help=parameter_help[name])
+            else:
+                subparser.add_argument('--' + name.replace('_', '-'), type=parameter_types[name], choices=parameter_choices.get(name), default=default,
+                                       help=f'{parameter_help[name]}, default {default}')
+        engines = analysis_engines.get(analysis, list(engine_modules))
+        subparser.add_argument('--engine', choices=engines, default=engines[0], help='reference loops, or the bitwise identical vectorized engine')
+        subparser.add_argument('--workers', type=int, default=None, help='process pool workers for sweeps, default in process')
+        subparser.add_argument('--cache-dir', default=None, help='simulation result cache, default no caching (or SIMULATION_CACHE_DIR)')
+        subparser.add_argument('--format', choices=['json', 'csv'], default='json', help='json writes every table, csv one')
+        subparser.add_argument('--table', default=None, help='the table written as csv, default the first')
+        subparser.add_argument('--output', default='-', help='output file, default stdout')
+        subparser.add_argument('--no-progress', dest='progress', action='store_false', help='don\'t report sweep progress to stderr')
+
+    subparser = subparsers.add_parser('batch', description=scenario_batch.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+                                      help='one result row per scenario of a CSV or JSON Lines file')
+    subparser.add_argument('scenarios', help='CSV or JSON Lines scenario file, - for stdin')
+    subparser.add_argument('--input-format', choices=list(scenario_batch.result_writers), default=None, help='default from the file extension, else csv')
+    subparser.add_argument('--format', choices=list(scenario_batch.result_writers), default=None, help='default from the output file extension, else csv')
+    subparser.add_argument('--output', default='-', help='output file, default stdout')
+    subparser.add_argument('--variant', choices=vectorized_engine.VARIANTS, default='retire_before_step_recheck_out_of_money', help='reference loop variant to reproduce')
+    subparser.add_argument('--chunk-size', type=int, default=scenario_batch.DEFAULT_CHUNK_SIZE, help='scenarios simulated at once, bounds memory use')
+    subparser.add_argument('--fast-inflation-powers', dest='exact_inflation_powers', action='store_false',
+                           help='np.power instead of math.pow for many distinct inflation rates, not bitwise identical to the reference')
+    return parser
+
+
+def open_output(path):
+    return sys.stdout if path == '-' else open(path, 'w', newline='')
+
+
+def run_analysis(parser, args):
+    interest_rates = None
+    if 'interest_rates' in analysis_parameters[args.analysis]:
+        try:
+            interest_rates = parse_grid(args.interest_rates)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+    parameters = {name: getattr(args, name) for name in analysis_parameters[args.analysis] if name != 'interest_rates'}
+    for name in grid_parameters:
+        if name in parameters:
+            try:
+                parameters[name] = parse_grid(parameters[name])
+            except argparse.ArgumentTypeError as e:
+                parser.error(str(e))
+    try:
+        inputs = load_inputs(parameters)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.cache_dir is not None:
+        simulation_cache.cache_dir = args.cache_dir
+
+    with instrumentation.phase('simulate'):
+        tables = analyses[args.analysis](args, parameters, interest_rates, inputs)
+
+    if args.format == 'csv':
+        table_name = args.table or next(iter(tables))
+        if table_name not in tables:
+            parser.error(f'unknown table {table_name!r}, {args.analysis} writes {", ".join(tables)}')
+
+    f = open_output(args.output)
+    try:
+        if args.format == 'json':
+            write_json(f, args.analysis, args.engine, parameters, interest_rates, tables)
+        else:
+            write_csv(f, tables[table_name])
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+def run_scenario_batch(parser, args):
+    input_format = args.input_format or scenario_batch.detect_format(args.scenarios)
+    output_format = args.format or scenario_batch.detect_format(args.output)
+    input_file = sys.stdin if args.scenarios == '-' else open(args.scenarios, newline='')
+    output_file = open_output(args.output)
+    try:
+        with instrumentation.phase('simulate'):
+            num_scenarios = scenario_batch.run_batch(input_file, input_format, output_file, output_format, variant=args.variant, chunk_size=args.chunk_size,
+                                                     exact_inflation_powers=args.exact_inflation_powers)
+    except scenario_batch.ScenarioError as e:
+        parser.error(str(e))
+    finally:
+        for f in (input_file, output_file):
+            if f not in (sys.stdin, sys.stdout):
+                f.close()
+    print(f'{num_scenarios} scenarios', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    instrumentation_json_path = instrumentation.enable_from_environment()
+
+    if args.analysis == 'batch':
+        run_scenario_batch(parser, args)
+    else:
+        run_analysis(parser, args)
+
+    if instrumentation_json_path is not None:
+        instrumentation.export_json(instrumentation_json_path)
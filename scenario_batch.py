@@ -0,0 +1,171 @@
+'''Batch mode, running a file of scenarios (e.g. one per household) through the vectorized engine and writing one result row per scenario.
+
+Scenarios are read from CSV (with a header row) or JSON Lines (one object per line), a chunk at a time, and each chunk's results are
+written before the next chunk is read, so memory use depends on the chunk size rather than the number of scenarios.
+
+Each scenario gives the parameters of vectorized_engine.simulate_until_end_condition as columns:
+    initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, interest_rate, inflation_rate, retirement_age   required
+    end_num_years_after_retirement, end_after_num_years_sim_time, end_at_age    optional, empty (or null) disables, missing takes the engine's default
+    end_if_out_of_money, end_if_breakeven_with_inflation                        optional, true/false or 1/0
+    n                                                                           optional starting year, retire_before_step_recheck_out_of_money only
+Any other columns (e.g. a household id) are copied to the scenario's result row, ahead of the engine's results.
+JSON Lines scenarios may each have different extra columns. Written as CSV, whose header is fixed by the first result row,
+only the first scenario's extra columns are kept, empty where a later scenario doesn't have them, and any other extra columns are dropped.
+Every parameter may differ between scenarios. With a distinct inflation rate per household, --fast-inflation-powers about halves the run time,
+at the cost of last place differences from the reference's math.pow.
+
+    python retirement_cli.py batch households.csv --output results.csv'''
+import csv
+import json
+import math
+import inspect
+import itertools
+import numpy as np
+
+import vectorized_engine
+
+
+required_parameters = ('initial_age', 'initial_money', 'annual_cost_of_living', 'annual_gross_earn_rate', 'interest_rate', 'inflation_rate', 'retirement_age')
+end_thresholds = ('end_num_years_after_retirement', 'end_after_num_years_sim_time', 'end_at_age')
+end_flags = ('end_if_out_of_money', 'end_if_breakeven_with_inflation')
+parameters = required_parameters + end_thresholds + end_flags + ('n',)
+engine_defaults = {name: parameter.default for name, parameter in inspect.signature(vectorized_engine.simulate_until_end_condition).parameters.items()
+                   if parameter.default is not inspect.Parameter.empty}
+
+result_fields = ('end_condition', 'num_years', 'num_years_retired', 'n', 'x', 'age', 'retired',
+                 'num_years_after_retirement', 'x_breakeven_with_inflation', 'broke_even_with_inflation')
+# the engine's float results that the reference logs as ints, given integral parameters
+integral_result_fields = ('n', 'age', 'num_years_after_retirement')
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class ScenarioError(ValueError):
+    # a scenario file that can't be run as given, e.g. a missing or unparseable parameter, rather than an error in the engine
+    pass
+
+
+def read_scenarios(f, file_format):
+    # yields each scenario as a dict, CSV values as strings
+    if file_format == 'csv':
+        yield from csv.DictReader(f)
+    else:
+        for i_line, line in enumerate(f, start=1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ScenarioError(f'line {i_line} isn\'t JSON: {e}')
+
+
+def is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_flag(value):
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in ('true', '1', 'yes'):
+            return True
+        if value in ('false', '0', 'no'):
+            return False
+        raise ScenarioError(f'expected true or false, got {value!r}')
+    return bool(value)
+
+
+def calc_parameter_arrays(scenarios):
+    # keyword arguments of vectorized_engine.simulate_until_end_condition, one array element per scenario
+    kwargs = {}
+    for name in parameters:
+        if all(name not in scenario for scenario in scenarios):
+            continue  # the engine's default
+        # a scenario without the column takes the engine's default, an empty value disables the end condition
+        values = [scenario.get(name, engine_defaults.get(name)) for scenario in scenarios]
+        try:
+            if name in required_parameters:
+                num_missing = sum(is_empty(value) for value in values)
+                if num_missing:
+                    raise ScenarioError(f'{name} missing from {num_missing} scenarios')
+                kwargs[name] = np.array(values, dtype=float)
+            elif name in end_thresholds:
+                kwargs[name] = np.array([math.inf if is_empty(value) else float(value) for value in values])
+            elif name in end_flags:
+                kwargs[name] = np.array([engine_defaults[name] if is_empty(value) else parse_flag(value) for value in values])
+            else:
+                kwargs[name] = np.array([0 if is_empty(value) else int(value) for value in values], dtype=np.int64)
+        except (TypeError, ValueError) as e:
+            if isinstance(e, ScenarioError):
+                raise
+            raise ScenarioError(f'bad {name}: {e}')
+    return kwargs
+
+
+def to_output_value(value, integral=False):
+    # numpy scalars to python values, with None where the engine gives NaN (the reference's None), and ints for integral whole numbers
+    value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if integral and isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def simulate_scenarios(scenarios, variant, exact_inflation_powers=True):
+    # one result row per scenario, each scenario's extra columns followed by the engine's results
+    kwargs = calc_parameter_arrays(scenarios)
+    if 'n' in kwargs and variant != 'retire_before_step_recheck_out_of_money':
+        raise ScenarioError(f'a starting n is not supported by the {variant} variant')
+    result = vectorized_engine.simulate_until_end_condition(variant=variant, exact_inflation_powers=exact_inflation_powers, **kwargs)
+    for i_scenario, scenario in enumerate(scenarios):
+        row = {key: value for key, value in scenario.items() if key not in parameters}
+        row['end_condition'] = vectorized_engine.END_CONDITIONS[result['end_condition'][i_scenario]]
+        for field in result_fields[1:]:
+            row[field] = to_output_value(result[field][i_scenario], integral=field in integral_result_fields)
+        yield row
+
+
+class CsvResultWriter:
+    def __init__(self, f):
+        self.f = f
+        self.writer = None
+
+    def write(self, row):
+        if self.writer is None:
+            # the header is the first row's columns, later rows' other extra columns are dropped and missing ones left empty
+            self.writer = csv.DictWriter(self.f, fieldnames=list(row), restval='', extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerow({key: '' if value is None else value for key, value in row.items()})
+
+
+class JsonLinesResultWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, row):
+        self.f.write(json.dumps(row) + '\n')
+
+
+result_writers = {'csv': CsvResultWriter, 'jsonl': JsonLinesResultWriter}
+
+
+def run_batch(input_file, input_format, output_file, output_format, variant='retire_before_step_recheck_out_of_money', chunk_size=DEFAULT_CHUNK_SIZE,
+              exact_inflation_powers=True):
+    # returns the number of scenarios run
+    writer = result_writers[output_format](output_file)
+    scenarios = read_scenarios(input_file, input_format)
+    num_scenarios = 0
+    while True:
+        chunk = list(itertools.islice(scenarios, chunk_size))
+        if not chunk:
+            return num_scenarios
+        for row in simulate_scenarios(chunk, variant, exact_inflation_powers):
+            writer.write(row)
+        num_scenarios += len(chunk)
+
+
+def detect_format(path, default='csv'):
+    if path.endswith(('.jsonl', '.json', '.ndjson')):
+        return 'jsonl'
+    if path.endswith('.csv'):
+        return 'csv'
+    return default
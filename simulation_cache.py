@@ -0,0 +1,96 @@
+'''On-disk cache of simulation results, so rebuilding a figure whose numeric inputs haven't changed skips the simulation.
+
+Disabled unless SIMULATION_CACHE_DIR names the cache directory (build_figures.py sets it for the scripts it runs).
+A result is keyed by the computing function and its arguments, ENGINE_VERSION, and the source of every module level function, class and assignment
+in that function's module (the compute code the scripts keep outside of their __main__ plotting) and in every local module it imports, directly or
+through other local modules. Editing only a script's plotting reuses its cached results, editing anything it computes with doesn't.'''
+import os
+import ast
+import pickle
+import hashlib
+import inspect
+import functools
+
+import instrumentation
+from vectorized_engine import ENGINE_VERSION
+
+
+cache_dir = os.environ.get('SIMULATION_CACHE_DIR') or None
+
+repository_dir = os.path.dirname(os.path.abspath(__file__))
+
+# top level statements that are compute code, rather than imports, docstrings or a __main__ block
+code_node_types = (ast.FunctionDef, ast.ClassDef, ast.Assign, ast.AnnAssign)
+
+
+def find_local_dependencies(module_file_name, dependencies=None):
+    # file names of the repository's own modules imported by the module, directly or through other local modules
+    if dependencies is None:
+        dependencies = set()
+    with open(os.path.join(repository_dir, module_file_name)) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            module_names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module is not None and node.level == 0:
+            module_names = [node.module]
+        else:
+            continue
+        for module_name in module_names:
+            dependency_file_name = module_name.split('.')[0] + '.py'
+            if dependency_file_name not in dependencies and os.path.exists(os.path.join(repository_dir, dependency_file_name)):
+                dependencies.add(dependency_file_name)
+                find_local_dependencies(dependency_file_name, dependencies)
+    return dependencies
+
+
+@functools.lru_cache(maxsize=None)
+def calc_module_code_hash(module_path):
+    # hash of the module's top level functions, classes and assignments, ignoring everything else in it
+    with open(module_path) as f:
+        source = f.read()
+    code_sources = [ast.get_source_segment(source, node) for node in ast.parse(source).body if isinstance(node, code_node_types)]
+    return hashlib.sha256('\n'.join(code_sources).encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def calc_code_hash(module_path):
+    # the module's code hash and those of the local modules it imports
+    module_path = os.path.abspath(module_path)
+    if os.path.dirname(module_path) != repository_dir:
+        return calc_module_code_hash(module_path)
+    dependencies = sorted(find_local_dependencies(os.path.basename(module_path)) - {os.path.basename(module_path)})
+    code_hashes = [calc_module_code_hash(module_path)] + [calc_module_code_hash(os.path.join(repository_dir, dependency)) for dependency in dependencies]
+    return hashlib.sha256('\n'.join(code_hashes).encode()).hexdigest()
+
+
+def calc_function_code_hash(function):
+    # code hash of the module defining function, or the function a functools.partial wraps
+    while isinstance(function, functools.partial):
+        function = function.func
+    return calc_code_hash(inspect.getsourcefile(function))
+
+
+def calc_key(function, args, kwargs):
+    return hashlib.sha256(pickle.dumps((ENGINE_VERSION, calc_function_code_hash(function), function, args, sorted(kwargs.items())))).hexdigest()
+
+
+def call(function, *args, **kwargs):
+    # function(*args, **kwargs), from the cache when possible. function and its arguments must be picklable
+    if cache_dir is None:
+        return function(*args, **kwargs)
+
+    path = os.path.join(cache_dir, calc_key(function, args, kwargs) + '.pickle')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            result = pickle.load(f)
+        instrumentation.count('cache_hits')
+        return result
+
+    result = function(*args, **kwargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+    return result
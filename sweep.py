@@ -0,0 +1,171 @@
+import os
+import sys
+import time
+import pickle
+import hashlib
+import datetime
+import concurrent.futures
+
+import instrumentation
+import simulation_cache
+from vectorized_engine import ENGINE_VERSION
+
+
+class ProgressReporter:
+    '''Reports scenarios per second, percent done, and ETA to stderr, at most once every report_interval seconds.
+    update() only adds and compares numbers until a report is due, so it is cheap enough to call from inside a sweep's hot loop.
+    Holds only plain values, so it can also be pickled into process pool workers, which then report their own share of a sweep.'''
+    def __init__(self, num_scenarios_total, description='sweep', report_interval=5.0):
+        self.num_scenarios_total = num_scenarios_total
+        self.description = description
+        self.report_interval = report_interval
+        self.num_scenarios_done = 0
+        self.time_start = time.monotonic()
+        self.time_next_report = self.time_start + report_interval
+
+    def __setstate__(self, state):
+        # restart the clock when unpickled in a worker process, monotonic times aren't comparable across processes
+        self.__dict__.update(state)
+        self.num_scenarios_done = 0
+        self.time_start = time.monotonic()
+        self.time_next_report = self.time_start + self.report_interval
+
+    def update(self, num_scenarios=1):
+        self.num_scenarios_done += num_scenarios
+        if self.num_scenarios_done >= self.num_scenarios_total or time.monotonic() >= self.time_next_report:
+            self.report()
+
+    def report(self):
+        now = time.monotonic()
+        self.time_next_report = now + self.report_interval
+
+        time_elapsed = max(now - self.time_start, 1e-9)
+        scenarios_per_second = self.num_scenarios_done / time_elapsed
+        percent_done = 100.0 * self.num_scenarios_done / self.num_scenarios_total if self.num_scenarios_total else 100.0
+        if scenarios_per_second > 0:
+            eta = datetime.timedelta(seconds=round((self.num_scenarios_total - self.num_scenarios_done) / scenarios_per_second))
+        else:
+            eta = 'unknown'
+        print(f'{self.description}: {percent_done:5.1f}% ({self.num_scenarios_done}/{self.num_scenarios_total} scenarios), {scenarios_per_second:.1f} scenarios/s, ETA {eta}', file=sys.stderr, flush=True)
+
+
+def calc_sweep_key(compute_chunk, chunks, reduce_chunk, state):
+    # identifies a sweep by the chunk and reduction functions, their bound parameters (when functools.partials), the code they run,
+    # the chunk grid and the initial state. a checkpoint written for any other sweep, or by code since edited, is ignored rather than resumed
+    code_hashes = [simulation_cache.calc_function_code_hash(function) for function in (compute_chunk, reduce_chunk)]
+    return hashlib.sha256(pickle.dumps((ENGINE_VERSION, code_hashes, compute_chunk, reduce_chunk, list(chunks), state))).hexdigest()
+
+
+def append_chunk_result(state, chunk, result):
+    # default reduction, keeps every chunk's result in chunk order
+    state.append(result)
+    return state
+
+
+def load_checkpoint(checkpoint_path, sweep_key):
+    if checkpoint_path is None or not os.path.exists(checkpoint_path):
+        return None
+
+    with open(checkpoint_path, 'rb') as f:
+        checkpoint = pickle.load(f)
+
+    if checkpoint['sweep_key'] != sweep_key:
+        print(f'ignoring checkpoint {checkpoint_path}, it was written by a different sweep', file=sys.stderr)
+        return None
+
+    return checkpoint
+
+
+def save_checkpoint(checkpoint_path, sweep_key, num_chunks_completed, state):
+    # write to a temporary file first, so a crash mid-write never corrupts the previous checkpoint
+    checkpoint = {'sweep_key': sweep_key, 'num_chunks_completed': num_chunks_completed, 'state': state}
+    temporary_path = checkpoint_path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, checkpoint_path)
+
+
+def calc_num_scenarios(scenarios_per_chunk, chunk):
+    if callable(scenarios_per_chunk):
+        return scenarios_per_chunk(chunk)
+    return scenarios_per_chunk
+
+
+def compute_chunks(compute_chunk, chunks, workers):
+    # yields results in chunk order, whether computed in this process or in a process pool
+    # each chunk's result comes from the simulation cache when one is enabled
+    if workers is None or workers <= 1:
+        for chunk in chunks:
+            yield simulation_cache.call(compute_chunk, chunk)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(simulation_cache.call, compute_chunk, chunk) for chunk in chunks]
+            try:
+                for future in futures:
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+
+def run_sweep(compute_chunk, chunks, reduce_chunk=append_chunk_result, state=None,
+              checkpoint_path=None, checkpoint_interval=60.0,
+              workers=None, description='sweep', scenarios_per_chunk=1, progress=True):
+    '''Evaluate compute_chunk(chunk) for each chunk in order, folding results with state = reduce_chunk(state, chunk, result).
+    state defaults to an empty list, so by default the sweep returns every chunk's result in chunk order.
+
+    If checkpoint_path is given, the reduced state is written there at most every checkpoint_interval seconds, and whenever the sweep is interrupted.
+    A later run of the same sweep, with the same code and initial state, resumes from the first incomplete chunk, and returns exactly what an uninterrupted run would.
+    The checkpoint is removed once the sweep completes.
+
+    If workers is more than 1, chunks are computed in a process pool, so compute_chunk must be picklable, e.g. a module level function or a functools.partial of one.
+    Results are still reduced in chunk order, so the result doesn't depend on the number of workers.
+
+    Unless progress is False, progress is reported as chunks complete, counting scenarios_per_chunk scenarios per chunk (an int, or a function of the chunk).'''
+    chunks = list(chunks)
+    if state is None:
+        state = []
+
+    num_chunks_completed = 0
+    sweep_key = None
+    if checkpoint_path is not None:
+        sweep_key = calc_sweep_key(compute_chunk, chunks, reduce_chunk, state)
+        checkpoint = load_checkpoint(checkpoint_path, sweep_key)
+        if checkpoint is not None:
+            num_chunks_completed = checkpoint['num_chunks_completed']
+            state = checkpoint['state']
+            print(f'resuming sweep from checkpoint {checkpoint_path}, {num_chunks_completed} of {len(chunks)} chunks already complete', file=sys.stderr)
+            instrumentation.count('checkpoint_resumed_chunks', num_chunks_completed)
+
+    remaining_chunks = chunks[num_chunks_completed:]
+    progress_reporter = None
+    if progress:
+        progress_reporter = ProgressReporter(sum(calc_num_scenarios(scenarios_per_chunk, chunk) for chunk in remaining_chunks), description=description)
+
+    time_last_checkpoint = time.monotonic()
+    num_chunks_checkpointed = num_chunks_completed
+    results = compute_chunks(compute_chunk, remaining_chunks, workers)
+    try:
+        for chunk, result in zip(remaining_chunks, results):
+            state = reduce_chunk(state, chunk, result)
+            num_chunks_completed += 1
+
+            if progress_reporter is not None:
+                progress_reporter.update(calc_num_scenarios(scenarios_per_chunk, chunk))
+
+            if checkpoint_path is not None and time.monotonic() - time_last_checkpoint >= checkpoint_interval:
+                save_checkpoint(checkpoint_path, sweep_key, num_chunks_completed, state)
+                time_last_checkpoint = time.monotonic()
+                num_chunks_checkpointed = num_chunks_completed
+    except BaseException:
+        # includes KeyboardInterrupt, stop any pool workers and keep whatever has completed so far
+        results.close()
+        if checkpoint_path is not None and num_chunks_completed > num_chunks_checkpointed:
+            save_checkpoint(checkpoint_path, sweep_key, num_chunks_completed, state)
+            print(f'saved checkpoint {checkpoint_path}, {num_chunks_completed} of {len(chunks)} chunks complete', file=sys.stderr)
+        raise
+
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return state
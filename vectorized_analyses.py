@@ -0,0 +1,328 @@
+'''Drop-in vectorized counterparts of the scripts' analysis functions, taking the same arguments and returning the same datasets.
+
+Each function runs all of its simulations through vectorized_engine at once, instead of one reference loop per scenario,
+then reduces them exactly as the reference does (including its tie-break towards later retirement), so the datasets are identical.
+
+    simulate_immediate_retirement, simulate_optimal_retirement,
+    simulate_double_retirement, simulate_late_retirement      optimal_retirement_strategy_via_integrated_happiness_least_squares_regression.py
+    simulate_survival                                         num_years_survive_vs_age_of_retirement_and_interest_rate.py
+
+The optimal retirement analyses take an optional discount_rate on happiness. simulate_discounted_optimal_retirement and
+simulate_inflation_optimal_retirement, which have no reference counterparts, sweep several discount or inflation rates at once.'''
+import math
+import numpy as np
+from collections import defaultdict
+
+import happiness_curves
+import vectorized_engine
+
+
+AGE = vectorized_engine.END_CONDITIONS.index('age')
+
+
+def simulate_without_breakeven_end(**kwargs):
+    # the end conditions shared by the least squares script's analyses, simulating until out of money or maximum_death_age
+    return vectorized_engine.simulate_until_end_condition(end_num_years_after_retirement=None,
+                                                          end_after_num_years_sim_time=None,
+                                                          end_if_out_of_money=True,
+                                                          end_if_breakeven_with_inflation=False,
+                                                          variant='retire_before_step_recheck_out_of_money',
+                                                          **kwargs)
+
+
+def calc_integrate_happiness(initial_age, maximum_death_age, working_happiness, free_happiness, discount_rate):
+    # the reference's integrated happiness, as a function of (retirement age, death age), discounted over a leading axis per discount rate
+    return happiness_curves.IntegratedHappiness(working_happiness, free_happiness, maximum_death_age + 1, discount_rates=discount_rate, initial_age=initial_age)
+
+
+def select_max_happiness(retirement_ages, integrated_happinesses, broke_even_with_inflation, death_ages):
+    # the reference's reduction, returns (max_happiness, retirement_age_for_max_happiness, broke_even_with_inflation, death_age)
+    max_happiness, i_max_happiness = -float('inf'), None
+    for i_integrated_happiness, integrated_happiness in enumerate(integrated_happinesses):
+        if integrated_happiness >= max_happiness or math.isclose(integrated_happiness, max_happiness):  # prefer latest retirement to maximize secondary oppurtunities
+            max_happiness, i_max_happiness = integrated_happiness, i_integrated_happiness
+    if i_max_happiness is None:
+        return max_happiness, None, None, None
+    return max_happiness, retirement_ages[i_max_happiness], broke_even_with_inflation[i_max_happiness], death_ages[i_max_happiness]
+
+
+def select_max_happiness_array(integrated_happiness, valid):
+    '''select_max_happiness along the last axis of an array, for every index of the leading axes at once, skipping runs that aren't valid.
+    Steps through the runs with the reference's running comparison, so chains of near-ties select exactly what it does.
+    Returns (max_happiness, index), -inf and -1 where no run is valid.'''
+    max_happiness = np.full(integrated_happiness.shape[:-1], -np.inf)
+    index = np.full(integrated_happiness.shape[:-1], -1)
+    for i_run in range(integrated_happiness.shape[-1]):
+        run_happiness = integrated_happiness[..., i_run]
+        with np.errstate(invalid='ignore'):
+            # math.isclose's relative tolerance, once a max is set, the first valid run always being selected by >=
+            selected = valid[..., i_run] & ((run_happiness >= max_happiness) |
+                                             (np.abs(run_happiness - max_happiness) <= 1e-9 * np.maximum(np.abs(run_happiness), np.abs(max_happiness))))
+        max_happiness = np.where(selected, run_happiness, max_happiness)
+        index = np.where(selected, i_run, index)
+    return max_happiness, index
+
+
+def calc_second_retirement_runs(run_1, i_rates, initial_retirement_age, initial_age, annual_cost_of_living, annual_gross_earn_rate, inflation_rate,
+                                maximum_death_age, integrate_happiness, interest_rates):
+    '''Back to work once out of money, for the interest rates i_rates whose first run (retiring at initial_retirement_age) ran out of money,
+    simulating every 2nd retirement age from running out of money to maximum_death_age.
+    Returns the runs' interest rate indices, 2nd retirement ages, and their reference datasets' fields.'''
+    end_ages = run_1['age'][i_rates].astype(np.int64)
+    num_retirement_ages = maximum_death_age + 1 - end_ages
+    i_run_rates = np.repeat(i_rates, num_retirement_ages)
+    run_end_ages = np.repeat(end_ages, num_retirement_ages)
+    retirement_ages = np.concatenate([np.arange(end_age, maximum_death_age + 1) for end_age in end_ages.tolist()] + [np.empty(0, dtype=np.int64)])
+
+    run_2 = simulate_without_breakeven_end(initial_age=initial_age,
+                                           n=run_1['n'][i_run_rates],
+                                           initial_money=run_1['x'][i_run_rates],
+                                           annual_cost_of_living=annual_cost_of_living,
+                                           annual_gross_earn_rate=annual_gross_earn_rate,
+                                           interest_rate=np.asarray(interest_rates, dtype=float)[i_run_rates],
+                                           inflation_rate=inflation_rate,
+                                           retirement_age=retirement_ages,
+                                           end_at_age=maximum_death_age + 1)
+
+    if integrate_happiness.never_retiring:
+        integrated_happiness = integrate_happiness(run_2['age'], run_2['age'])
+    else:
+        integrated_happiness = (integrate_happiness(initial_retirement_age, initial_retirement_age + run_1['num_years_after_retirement'][i_run_rates]) +
+                                integrate_happiness.working(run_end_ages, retirement_ages) + integrate_happiness.free(retirement_ages, retirement_ages + run_2['num_years_after_retirement']))
+    return i_run_rates, retirement_ages, integrated_happiness, run_2['broke_even_with_inflation'], run_2['age'].astype(np.int64)
+
+
+def select_max_happiness_per_rate(i_rates, i_run_rates, retirement_ages, integrated_happiness, broke_even_with_inflation, death_ages):
+    # select_max_happiness over each interest rate's runs, which calc_second_retirement_runs returns contiguously in i_rates order
+    run_starts = np.searchsorted(i_run_rates, i_rates)
+    run_ends = np.searchsorted(i_run_rates, i_rates, side='right')
+    retirement_ages, integrated_happiness = retirement_ages.tolist(), integrated_happiness.tolist()
+    broke_even_with_inflation, death_ages = broke_even_with_inflation.tolist(), death_ages.tolist()
+    return [select_max_happiness(retirement_ages[start:end], integrated_happiness[start:end], broke_even_with_inflation[start:end], death_ages[start:end])
+            for start, end in zip(run_starts, run_ends)]
+
+
+def simulate_immediate_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                                  working_happiness, free_happiness, interest_rates, discount_rate=1.0):
+    retirement_age = initial_age
+    integrate_happiness = calc_integrate_happiness(initial_age, maximum_death_age, working_happiness, free_happiness, discount_rate)
+    run = simulate_without_breakeven_end(initial_age=initial_age,
+                                         initial_money=initial_money,
+                                         annual_cost_of_living=annual_cost_of_living,
+                                         annual_gross_earn_rate=annual_gross_earn_rate,
+                                         interest_rate=np.asarray(interest_rates, dtype=float),
+                                         inflation_rate=inflation_rate,
+                                         retirement_age=retirement_age,
+                                         end_at_age=maximum_death_age + 1)
+    if integrate_happiness.never_retiring:
+        integrated_happiness = integrate_happiness(run['age'].astype(np.int64), run['age'].astype(np.int64))
+    else:
+        integrated_happiness = integrate_happiness(retirement_age, retirement_age + run['num_years_after_retirement'])
+
+    data_immediate_retirement_interest_rate_meta = defaultdict(list)
+    data_immediate_retirement_interest_rate_meta['interest_rate'] = list(interest_rates)
+    data_immediate_retirement_interest_rate_meta['retirement_age'] = [retirement_age] * len(interest_rates)
+    data_immediate_retirement_interest_rate_meta['broke_even_with_inflation'] = run['broke_even_with_inflation'].tolist()
+    data_immediate_retirement_interest_rate_meta['death_age'] = run['age'].astype(np.int64).tolist()
+    data_immediate_retirement_interest_rate_meta['integrated_happiness'] = integrated_happiness.tolist()
+    return data_immediate_retirement_interest_rate_meta
+
+
+def simulate_optimal_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                                working_happiness, free_happiness, interest_rates, discount_rate=1.0):
+    # every (interest rate, retirement age) pair at once, as an interest rate x retirement age grid
+    retirement_ages = np.arange(initial_age, maximum_death_age + 1)
+    integrate_happiness = calc_integrate_happiness(initial_age, maximum_death_age, working_happiness, free_happiness, discount_rate)
+    run = simulate_without_breakeven_end(initial_age=initial_age,
+                                         initial_money=initial_money,
+                                         annual_cost_of_living=annual_cost_of_living,
+                                         annual_gross_earn_rate=annual_gross_earn_rate,
+                                         interest_rate=np.asarray(interest_rates, dtype=float)[:, np.newaxis],
+                                         inflation_rate=inflation_rate,
+                                         retirement_age=retirement_ages[np.newaxis, :],
+                                         end_at_age=maximum_death_age + 1)
+    death_ages = run['age'].astype(np.int64)
+    if integrate_happiness.never_retiring:
+        integrated_happiness = integrate_happiness(death_ages, death_ages)
+    else:
+        integrated_happiness = integrate_happiness(retirement_ages, retirement_ages + run['num_years_after_retirement'])
+
+    data_optimal_retirement_interest_rate_meta = defaultdict(list)
+    for i_rate, interest_rate in enumerate(interest_rates):
+        max_happiness, retirement_age_for_max_happiness, broke_even_with_inflation, death_age = select_max_happiness(
+            retirement_ages.tolist(), integrated_happiness[i_rate].tolist(), run['broke_even_with_inflation'][i_rate].tolist(), death_ages[i_rate].tolist())
+        data_optimal_retirement_interest_rate_meta['interest_rate'].append(interest_rate)
+        data_optimal_retirement_interest_rate_meta['max_happiness'].append(max_happiness)
+        data_optimal_retirement_interest_rate_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
+        data_optimal_retirement_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
+        data_optimal_retirement_interest_rate_meta['death_age'].append(death_age)
+    return data_optimal_retirement_interest_rate_meta
+
+
+def simulate_discounted_optimal_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                                           working_happiness, free_happiness, interest_rates, discount_rates):
+    '''simulate_optimal_retirement for every discount rate at once, one row per (discount rate, interest rate), discount rates outermost.
+    The simulations don't depend on the discount rate, so they're run once, and the discount rates other than 1 are another axis of the integrated happiness lookups.
+    A discount rate of 1 is integrated without discounting, as simulate_optimal_retirement does, so its rows are identical to simulate_optimal_retirement's.'''
+    retirement_ages = np.arange(initial_age, maximum_death_age + 1)
+    discount_rates = np.asarray(discount_rates, dtype=float)
+    run = simulate_without_breakeven_end(initial_age=initial_age,
+                                         initial_money=initial_money,
+                                         annual_cost_of_living=annual_cost_of_living,
+                                         annual_gross_earn_rate=annual_gross_earn_rate,
+                                         interest_rate=np.asarray(interest_rates, dtype=float)[:, np.newaxis],
+                                         inflation_rate=inflation_rate,
+                                         retirement_age=retirement_ages[np.newaxis, :],
+                                         end_at_age=maximum_death_age + 1)
+    death_ages = run['age'].astype(np.int64)
+    integrated_happiness = np.empty((len(discount_rates),) + death_ages.shape)
+    for discounted in (False, True):
+        i_discount_rates = np.flatnonzero((discount_rates != 1.0) == discounted)
+        if len(i_discount_rates) == 0:
+            continue
+        integrate_happiness = calc_integrate_happiness(initial_age, maximum_death_age, working_happiness, free_happiness,
+                                                       discount_rates[i_discount_rates] if discounted else 1.0)
+        if integrate_happiness.never_retiring:
+            integrated_happiness[i_discount_rates] = integrate_happiness(death_ages, death_ages)
+        else:
+            integrated_happiness[i_discount_rates] = integrate_happiness(retirement_ages, retirement_ages + run['num_years_after_retirement'])
+
+    data_discounted_optimal_retirement_meta = defaultdict(list)
+    for i_discount_rate, discount_rate in enumerate(discount_rates.tolist()):
+        for i_rate, interest_rate in enumerate(interest_rates):
+            max_happiness, retirement_age_for_max_happiness, broke_even_with_inflation, death_age = select_max_happiness(
+                retirement_ages.tolist(), integrated_happiness[i_discount_rate, i_rate].tolist(), run['broke_even_with_inflation'][i_rate].tolist(), death_ages[i_rate].tolist())
+            data_discounted_optimal_retirement_meta['discount_rate'].append(discount_rate)
+            data_discounted_optimal_retirement_meta['interest_rate'].append(interest_rate)
+            data_discounted_optimal_retirement_meta['max_happiness'].append(max_happiness)
+            data_discounted_optimal_retirement_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
+            data_discounted_optimal_retirement_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
+            data_discounted_optimal_retirement_meta['death_age'].append(death_age)
+    return data_discounted_optimal_retirement_meta
+
+
+def simulate_inflation_optimal_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rates, maximum_death_age,
+                                          working_happiness, free_happiness, interest_rates, discount_rate=1.0):
+    '''simulate_optimal_retirement for every inflation rate at once, one row per (inflation rate, interest rate), inflation rates outermost.
+    All (inflation rate, interest rate, retirement age) scenarios are simulated together, as an inflation x interest x retirement age grid,
+    sharing each inflation rate's table of powers. The rows for each inflation rate are identical to simulate_optimal_retirement's.'''
+    retirement_ages = np.arange(initial_age, maximum_death_age + 1)
+    integrate_happiness = calc_integrate_happiness(initial_age, maximum_death_age, working_happiness, free_happiness, discount_rate)
+    run = simulate_without_breakeven_end(initial_age=initial_age,
+                                         initial_money=initial_money,
+                                         annual_cost_of_living=annual_cost_of_living,
+                                         annual_gross_earn_rate=annual_gross_earn_rate,
+                                         interest_rate=np.asarray(interest_rates, dtype=float)[np.newaxis, :, np.newaxis],
+                                         inflation_rate=np.asarray(inflation_rates, dtype=float)[:, np.newaxis, np.newaxis],
+                                         retirement_age=retirement_ages[np.newaxis, np.newaxis, :],
+                                         end_at_age=maximum_death_age + 1)
+    death_ages = run['age'].astype(np.int64)
+    if integrate_happiness.never_retiring:
+        integrated_happiness = integrate_happiness(death_ages, death_ages)
+    else:
+        integrated_happiness = integrate_happiness(retirement_ages, retirement_ages + run['num_years_after_retirement'])
+
+    data_inflation_optimal_retirement_meta = defaultdict(list)
+    for i_inflation_rate, inflation_rate in enumerate(inflation_rates):
+        for i_rate, interest_rate in enumerate(interest_rates):
+            max_happiness, retirement_age_for_max_happiness, broke_even_with_inflation, death_age = select_max_happiness(
+                retirement_ages.tolist(), integrated_happiness[i_inflation_rate, i_rate].tolist(), run['broke_even_with_inflation'][i_inflation_rate, i_rate].tolist(),
+                death_ages[i_inflation_rate, i_rate].tolist())
+            data_inflation_optimal_retirement_meta['inflation_rate'].append(inflation_rate)
+            data_inflation_optimal_retirement_meta['interest_rate'].append(interest_rate)
+            data_inflation_optimal_retirement_meta['max_happiness'].append(max_happiness)
+            data_inflation_optimal_retirement_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
+            data_inflation_optimal_retirement_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
+            data_inflation_optimal_retirement_meta['death_age'].append(death_age)
+    return data_inflation_optimal_retirement_meta
+
+
+def simulate_double_retirement(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                               working_happiness, free_happiness, interest_rates, discount_rate=1.0):
+    # interest rates where immediate retirement already makes it to maximum_death_age are skipped, like the reference
+    initial_retirement_age = initial_age
+    integrate_happiness = calc_integrate_happiness(initial_age, maximum_death_age, working_happiness, free_happiness, discount_rate)
+    run_1 = simulate_without_breakeven_end(initial_age=initial_age,
+                                           initial_money=initial_money,
+                                           annual_cost_of_living=annual_cost_of_living,
+                                           annual_gross_earn_rate=annual_gross_earn_rate,
+                                           interest_rate=np.asarray(interest_rates, dtype=float),
+                                           inflation_rate=inflation_rate,
+                                           retirement_age=initial_retirement_age,
+                                           end_at_age=maximum_death_age + 1)
+    i_rates = np.flatnonzero(run_1['end_condition'] != AGE)
+    runs_2 = calc_second_retirement_runs(run_1, i_rates, initial_retirement_age, initial_age, annual_cost_of_living, annual_gross_earn_rate, inflation_rate,
+                                         maximum_death_age, integrate_happiness, interest_rates)
+
+    data_double_retirement_interest_rate_meta = defaultdict(list)
+    for i_rate, (max_happiness, retirement_age_for_max_happiness, broke_even_with_inflation, death_age) in zip(i_rates, select_max_happiness_per_rate(i_rates, *runs_2)):
+        data_double_retirement_interest_rate_meta['interest_rate'].append(interest_rates[i_rate])
+        data_double_retirement_interest_rate_meta['max_happiness'].append(max_happiness)
+        data_double_retirement_interest_rate_meta['retirement_age_for_max_happiness'].append(retirement_age_for_max_happiness)
+        data_double_retirement_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
+        data_double_retirement_interest_rate_meta['death_age'].append(death_age)
+    return data_double_retirement_interest_rate_meta
+
+
+def simulate_late_retirement(initial_retirement_age, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, maximum_death_age,
+                             working_happiness, free_happiness, interest_rates, discount_rate=1.0):
+    integrate_happiness = calc_integrate_happiness(initial_age, maximum_death_age, working_happiness, free_happiness, discount_rate)
+    run_1 = simulate_without_breakeven_end(initial_age=initial_age,
+                                           initial_money=initial_money,
+                                           annual_cost_of_living=annual_cost_of_living,
+                                           annual_gross_earn_rate=annual_gross_earn_rate,
+                                           interest_rate=np.asarray(interest_rates, dtype=float),
+                                           inflation_rate=inflation_rate,
+                                           retirement_age=initial_retirement_age,
+                                           end_at_age=maximum_death_age + 1)
+    made_it = run_1['end_condition'] == AGE
+    i_rates = np.flatnonzero(~made_it)
+    second_retirements = dict(zip(i_rates.tolist(), select_max_happiness_per_rate(
+        i_rates, *calc_second_retirement_runs(run_1, i_rates, initial_retirement_age, initial_age, annual_cost_of_living, annual_gross_earn_rate, inflation_rate,
+                                              maximum_death_age, integrate_happiness, interest_rates))))
+
+    end_ages = run_1['age'].astype(np.int64)
+    if integrate_happiness.never_retiring:
+        integrated_happiness_1 = integrate_happiness(end_ages, end_ages)
+    else:
+        integrated_happiness_1 = integrate_happiness(initial_retirement_age, initial_retirement_age + run_1['num_years_after_retirement'])
+
+    data_late_retirement_interest_rate_meta = defaultdict(list)
+    for i_rate, interest_rate in enumerate(interest_rates):
+        data_late_retirement_interest_rate_meta['interest_rate'].append(interest_rate)
+        data_late_retirement_interest_rate_meta['initial_retirement_age'].append(initial_retirement_age)
+        data_late_retirement_interest_rate_meta['initial_retirement_end'].append(int(end_ages[i_rate]))
+        if made_it[i_rate]:
+            data_late_retirement_interest_rate_meta['2nd_retirement_age'].append(None)
+            data_late_retirement_interest_rate_meta['broke_even_with_inflation'].append(bool(run_1['broke_even_with_inflation'][i_rate]))
+            data_late_retirement_interest_rate_meta['death_age'].append(int(end_ages[i_rate]))
+            data_late_retirement_interest_rate_meta['integrated_happiness'].append(float(integrated_happiness_1[i_rate]))
+        else:
+            max_happiness, retirement_age_for_max_happiness, broke_even_with_inflation, death_age = second_retirements[i_rate]
+            data_late_retirement_interest_rate_meta['integrated_happiness'].append(max_happiness)
+            data_late_retirement_interest_rate_meta['2nd_retirement_age'].append(retirement_age_for_max_happiness)
+            data_late_retirement_interest_rate_meta['broke_even_with_inflation'].append(broke_even_with_inflation)
+            data_late_retirement_interest_rate_meta['death_age'].append(death_age)
+    return data_late_retirement_interest_rate_meta
+
+
+def simulate_survival(interest_rate, initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, inflation_rate, likely_death_age):
+    retirement_ages = np.arange(initial_age, likely_death_age + 1)
+    run = vectorized_engine.simulate_until_end_condition(initial_age=initial_age,
+                                                         initial_money=initial_money,
+                                                         annual_cost_of_living=annual_cost_of_living,
+                                                         annual_gross_earn_rate=annual_gross_earn_rate,
+                                                         interest_rate=interest_rate,
+                                                         inflation_rate=inflation_rate,
+                                                         retirement_age=retirement_ages,
+                                                         end_num_years_after_retirement=120,
+                                                         end_after_num_years_sim_time=None,
+                                                         end_if_out_of_money=True,
+                                                         end_if_breakeven_with_inflation=False,
+                                                         end_at_age=False,
+                                                         variant='retire_after_step_truthy_ends')
+
+    data = defaultdict(list)
+    data['retirement_age'] = retirement_ages.tolist()
+    data['num_years_survived_after_retirement'] = [None if math.isnan(num_years) else int(num_years) for num_years in run['num_years_after_retirement'].tolist()]
+    return data
@@ -0,0 +1,217 @@
+'''Vectorized counterpart of the scripts' simulate_until_end_condition, for sweeping many scenarios at once.
+
+The scripts carry four variants of the reference loop, which differ in when the retirement counter is updated and how end conditions are checked:
+
+    retire_after_step_truthy_ends            retired / num_years_after_retirement updated after each year's step, and end conditions
+                                             disabled by any falsy value (0 as well as None). The *_over_lifetime and *_remaining_lifetime scripts,
+                                             num_years_survive_vs_age_of_retirement_and_interest_rate.py and ratio_..._interest_rate.py
+    retire_after_step                        as above, but end conditions are only disabled by None. ratio_..._interest_rate2 to 4 and the optimal_retirement_age_* scripts
+    retire_before_step                       retired / num_years_after_retirement set from the age before each year's step,
+                                             compare_..._optimal_retirement_age.py and immediate_retirement_multiplot.py
+    retire_before_step_recheck_out_of_money  as above, plus a starting n and a second out of money check right after each step, which ends the run
+                                             without logging the stepped year. The late and double retirement scripts, and the least squares regression
+
+Every year is computed with the same floating point operations, in the same order, as the reference loop, so results are bitwise identical
+(golden_output_equivalence_harness.py checks this). Inflation powers come from math.pow rather than np.power, whose SIMD implementations
+don't always round the last place the same way.'''
+import math
+import numpy as np
+
+
+ENGINE_VERSION = 2  # bumped whenever the engine's results change, invalidating cached results and built figures
+
+VARIANTS = ('retire_after_step_truthy_ends', 'retire_after_step', 'retire_before_step', 'retire_before_step_recheck_out_of_money')
+
+# index of each end condition in the 'end_condition' array returned by simulate_until_end_condition
+END_CONDITIONS = ('out_of_money', 'breakeven_with_inflation', 'num_years_sim_time', 'age', 'num_years_after_retirement')
+
+MAX_TABULATED_INFLATION_RATES = 4096  # distinct inflation rates InflationPowers tabulates by default
+
+
+def pow_or_inf(inflation_rate, n):
+    try:
+        return math.pow(inflation_rate, n)
+    except OverflowError:
+        return math.inf
+
+
+exact_powers = np.frompyfunc(pow_or_inf, 2, 1)
+
+
+class InflationPowers:
+    '''math.pow(inflation_rate, n) for each distinct inflation rate, tabulated once and extended as n grows.
+    Where math.pow would overflow (and the reference loop raise OverflowError) the table holds inf.
+
+    A population with more than max_tabulated_rates distinct inflation rates (e.g. a rate per household) isn't tabulated,
+    the table would have a row per scenario. Powers are then computed for just the scenarios asked for, by math.pow if exact,
+    otherwise by np.power, which is several times faster but may differ from math.pow in the last place.'''
+    def __init__(self, inflation_rates, exact=True, max_tabulated_rates=MAX_TABULATED_INFLATION_RATES):
+        self.exact = exact
+        self.inflation_rates, self.index = np.unique(inflation_rates, return_inverse=True)
+        self.index = self.index.ravel()
+        self.tabulated = len(self.inflation_rates) <= max_tabulated_rates
+        self.table = np.empty((len(self.inflation_rates), 0))
+
+    def extend(self, num_n):
+        num_n_old = self.table.shape[1]
+        columns = np.empty((len(self.inflation_rates), num_n - num_n_old))
+        for i_rate, inflation_rate in enumerate(self.inflation_rates):
+            for n in range(num_n_old, num_n):
+                columns[i_rate, n - num_n_old] = pow_or_inf(inflation_rate, n)
+        self.table = np.concatenate([self.table, columns], axis=1)
+
+    def __call__(self, i_scenario, n):
+        # powers for scenarios i_scenario (indices into the flattened inflation_rates) at years n
+        if not self.tabulated:
+            inflation_rates = self.inflation_rates[self.index[i_scenario]]
+            if self.exact:
+                return exact_powers(inflation_rates, n).astype(float)
+            return np.power(inflation_rates, n.astype(float))
+
+        n_max = n.max(initial=-1)
+        if n_max >= self.table.shape[1]:
+            self.extend(max(n_max + 1, 2 * self.table.shape[1], 128))
+        return self.table[self.index[i_scenario], n]
+
+
+def calc_end_threshold(value, disabled_by_falsy):
+    # None (and 0 when disabled_by_falsy) disables an end condition, represented as a threshold of inf that's never reached
+    if value is None:
+        return np.array(math.inf)
+    value = np.asarray(value, dtype=float)
+    if disabled_by_falsy:
+        value = np.where(value == 0, math.inf, value)
+    return value
+
+
+def simulate_until_end_condition(initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, interest_rate, inflation_rate, retirement_age,
+                                 end_num_years_after_retirement=None, end_after_num_years_sim_time=300,
+                                 end_if_out_of_money=True, end_if_breakeven_with_inflation=True, end_at_age=None,
+                                 n=None, variant='retire_before_step_recheck_out_of_money', exact_inflation_powers=True,
+                                 max_tabulated_inflation_rates=MAX_TABULATED_INFLATION_RATES):
+    '''Runs the reference loop for every scenario in the broadcast of the parameters, which may each be scalars or arrays.
+    Every parameter may vary per scenario, e.g. a population of households each with their own initial_age, cost of living and end_at_age.
+    End conditions may be None to disable them for every scenario, or arrays with inf where disabled.
+    Scenarios end after different numbers of years, each is dropped from the arrays being stepped once it ends.
+    n (the starting year, default 0) is only supported by the retire_before_step_recheck_out_of_money variant, like the reference.
+    exact_inflation_powers=False trades bitwise identity with the reference for speed, when there are many distinct inflation rates (see InflationPowers).
+    max_tabulated_inflation_rates is InflationPowers' max_tabulated_rates, 0 computing every power per scenario (golden_output_equivalence_harness.py checks both paths).
+
+    Returns a dict of arrays shaped like the broadcast parameters, rather than the per-year data:
+        end_condition               index into END_CONDITIONS
+        num_years                   number of years logged, len(data['age']) of the reference
+        num_years_retired           number of logged years with retired True, sum(data['retired'])
+    and the last logged value of each of the reference's per-year fields, with NaN where the reference logs None:
+        n, x, age, retired, num_years_after_retirement, x_breakeven_with_inflation, broke_even_with_inflation'''
+    if variant not in VARIANTS:
+        raise ValueError(f'unknown variant {variant!r}, expected one of {VARIANTS}')
+    if n is not None and variant != 'retire_before_step_recheck_out_of_money':
+        raise ValueError(f'a starting n is not supported by the {variant} variant')
+    retire_before_step = variant.startswith('retire_before_step')
+    recheck_out_of_money = variant == 'retire_before_step_recheck_out_of_money'
+    disabled_by_falsy = variant == 'retire_after_step_truthy_ends'
+
+    parameters = np.broadcast_arrays(np.asarray(initial_age, dtype=float),
+                                     np.asarray(initial_money, dtype=float),
+                                     np.asarray(annual_cost_of_living, dtype=float),
+                                     np.asarray(annual_gross_earn_rate, dtype=float),
+                                     np.asarray(interest_rate, dtype=float),
+                                     np.asarray(inflation_rate, dtype=float),
+                                     np.asarray(retirement_age, dtype=float),
+                                     calc_end_threshold(end_num_years_after_retirement, disabled_by_falsy),
+                                     calc_end_threshold(end_after_num_years_sim_time, disabled_by_falsy),
+                                     np.asarray(end_if_out_of_money, dtype=bool),
+                                     np.asarray(end_if_breakeven_with_inflation, dtype=bool),
+                                     calc_end_threshold(end_at_age, disabled_by_falsy),
+                                     np.asarray(0 if n is None else n, dtype=np.int64))
+    shape = parameters[0].shape
+    (initial_age, initial_money, annual_cost_of_living, annual_gross_earn_rate, interest_rate, inflation_rate, retirement_age,
+     end_num_years_after_retirement, end_after_num_years_sim_time, end_if_out_of_money, end_if_breakeven_with_inflation, end_at_age,
+     n_initial) = [parameter.ravel() for parameter in parameters]
+    num_scenarios = initial_age.size
+
+    inflation_powers = InflationPowers(inflation_rate, exact=exact_inflation_powers, max_tabulated_rates=max_tabulated_inflation_rates)
+    possible_to_breakeven_with_inflation = interest_rate > inflation_rate
+
+    result = {'end_condition': np.empty(num_scenarios, dtype=np.int8),
+              'num_years': np.empty(num_scenarios, dtype=np.int64),
+              'num_years_retired': np.empty(num_scenarios, dtype=np.int64),
+              'n': np.empty(num_scenarios, dtype=np.int64),
+              'x': np.empty(num_scenarios),
+              'age': np.empty(num_scenarios),
+              'retired': np.empty(num_scenarios, dtype=bool),
+              'num_years_after_retirement': np.empty(num_scenarios),
+              'x_breakeven_with_inflation': np.empty(num_scenarios),
+              'broke_even_with_inflation': np.empty(num_scenarios, dtype=bool)}
+
+    # state of the scenarios still running, i indexes into the flattened parameters
+    i = np.arange(num_scenarios)
+    n = n_initial.copy()
+    x = initial_money.copy()
+    retired = np.zeros(num_scenarios, dtype=bool)
+    num_years_after_retirement = np.full(num_scenarios, math.nan)
+    num_years_retired = np.zeros(num_scenarios, dtype=np.int64)
+
+    def log_end(ended, end_condition, logged):
+        i_ended = i[ended]
+        result['end_condition'][i_ended] = end_condition[ended]
+        result['num_years'][i_ended] = n[ended] - n_initial[i_ended] + 1
+        result['num_years_retired'][i_ended] = num_years_retired[ended]
+        for key, value in logged.items():
+            result[key][i_ended] = value[ended]
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        while i.size:
+            # calcs
+            age = n + initial_age[i]
+
+            if retire_before_step:
+                retiring = age >= retirement_age[i]
+                retired = retired | retiring
+                num_years_after_retirement = np.where(retiring, age - retirement_age[i], num_years_after_retirement)
+
+            power = inflation_powers(i, n)
+            possible = possible_to_breakeven_with_inflation[i]
+            x_breakeven_with_inflation = np.where(possible, annual_cost_of_living[i] * power / (interest_rate[i] - inflation_rate[i]), math.nan)
+            broke_even_with_inflation = possible & (x >= x_breakeven_with_inflation)
+
+            # log data
+            num_years_retired = num_years_retired + retired
+            logged = {'n': n, 'x': x, 'age': age, 'retired': retired,
+                      'num_years_after_retirement': num_years_after_retirement,
+                      'x_breakeven_with_inflation': x_breakeven_with_inflation,
+                      'broke_even_with_inflation': broke_even_with_inflation}
+
+            # end conditions, the first one met is the end condition
+            end_conditions = [end_if_out_of_money[i] & (x <= 0),
+                              end_if_breakeven_with_inflation[i] & broke_even_with_inflation,
+                              n >= end_after_num_years_sim_time[i],
+                              age >= end_at_age[i],
+                              num_years_after_retirement >= end_num_years_after_retirement[i]]
+            ended = np.logical_or.reduce(end_conditions)
+            if ended.any():
+                log_end(ended, np.argmax(end_conditions, axis=0), logged)
+
+            # simulation
+            x = x * interest_rate[i] + (np.where(retired, 0.0, annual_gross_earn_rate[i]) - annual_cost_of_living[i]) * power
+            running = ~ended
+
+            if recheck_out_of_money:
+                # repeated end condition, ends the run on the year already logged
+                out_of_money = running & end_if_out_of_money[i] & (x <= 0)
+                if out_of_money.any():
+                    log_end(out_of_money, np.zeros(i.size, dtype=np.int8), logged)
+                    running &= ~out_of_money
+
+            n = n + 1
+
+            if not retire_before_step:
+                retiring = age == retirement_age[i]
+                retired = retired | retiring
+                num_years_after_retirement = np.where(retiring, 0.0, num_years_after_retirement)
+                num_years_after_retirement = np.where(age > retirement_age[i], num_years_after_retirement + 1, num_years_after_retirement)
+
+            i, n, x, retired, num_years_after_retirement, num_years_retired = (
+                i[running], n[running], x[running], retired[running], num_years_after_retirement[running], num_years_retired[running])
+
+    return {key: value.reshape(shape) for key, value in result.items()}